@@ -0,0 +1,234 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ==========================================
+# INGESTION / EMBEDDING
+# ==========================================
+# Number of chunks sent to the embedder in one embed_documents() call
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# How many batches may be embedded/upserted at the same time
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+# Retries per batch (embedding and upsert) before the upload fails
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "3"))
+# Base delay (seconds) for exponential backoff between retries
+EMBED_RETRY_BACKOFF = float(os.getenv("EMBED_RETRY_BACKOFF", "0.5"))
+# Embedding cache keyed by (model, chunk hash): unchanged/duplicate chunks are never re-embedded
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "true").lower() == "true"
+# Least recently used vectors beyond this many are evicted (~3 KB each at 768 dims)
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "100000"))
+# Embedding model (the embedding cache is keyed by this name)
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-004")
+# Vector deletion: ids per delete call (Pinecone max 1000) and calls in flight
+VECTOR_DELETE_BATCH_SIZE = int(os.getenv("VECTOR_DELETE_BATCH_SIZE", "1000"))
+VECTOR_DELETE_CONCURRENCY = int(os.getenv("VECTOR_DELETE_CONCURRENCY", "4"))
+
+# ==========================================
+# VECTOR STORE
+# ==========================================
+# "pinecone" (hosted index) or "local" (per-thread files on disk, searched in-process)
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone").lower()
+# Directory of the local store
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", "vector_store")
+# Threads with at least this many vectors are searched through an IVF index instead of brute force
+LOCAL_ANN_THRESHOLD = int(os.getenv("LOCAL_ANN_THRESHOLD", "20000"))
+# IVF partitions scanned per query (higher = better recall, slower)
+LOCAL_ANN_NPROBE = int(os.getenv("LOCAL_ANN_NPROBE", "8"))
+# Thread partitions kept loaded in memory
+LOCAL_MAX_OPEN_THREADS = int(os.getenv("LOCAL_MAX_OPEN_THREADS", "64"))
+
+# ==========================================
+# DOCUMENT RETRIEVAL
+# ==========================================
+# Fuse keyword (BM25) and vector results; off = vector search only
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+# Candidates taken from each retriever before fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+# Reciprocal rank fusion constant: score = sum(1 / (RRF_K + rank))
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Short keyword / identifier queries up to this many terms skip the embedding when BM25 finds matches
+KEYWORD_QUERY_MAX_TERMS = int(os.getenv("KEYWORD_QUERY_MAX_TERMS", "4"))
+# Query embeddings kept in memory (LRU, float32: ~3 KB each at 768 dimensions) and for how long (seconds)
+QUERY_EMBED_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "1024"))
+QUERY_EMBED_CACHE_TTL = float(os.getenv("QUERY_EMBED_CACHE_TTL", "3600"))
+
+# ==========================================
+# INGESTION JOBS
+# ==========================================
+# Files processed at the same time (across all uploads)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+# Processes used for PDF parsing + chunking
+INGEST_PROCESS_POOL_SIZE = int(os.getenv("INGEST_PROCESS_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+# Finished jobs are kept this long (seconds) so clients can read the final status
+INGEST_JOB_TTL = int(os.getenv("INGEST_JOB_TTL", "3600"))
+# Upload limits: bytes per file (checked while the upload is copied) and pages per PDF
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "50"))
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "2000"))
+# Pages extracted per parse call; with the embedding queue this bounds memory per file
+INGEST_PAGE_WINDOW = int(os.getenv("INGEST_PAGE_WINDOW", "16"))
+
+# ==========================================
+# SQLITE
+# ==========================================
+# Application database (threads, messages, manifests, caches). Relative paths are
+# resolved against the working directory; give every worker the same absolute path.
+DATABASE_PATH = os.getenv("DATABASE_PATH", "chatbot.db")
+# Agent checkpoints (LangGraph memory); a separate file splits write traffic across two locks
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", DATABASE_PATH)
+# How long (ms) a connection waits for another process's write lock before failing
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Read connections kept open in the async pool (writes use one dedicated connection)
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "4"))
+# Page cache per connection in KiB (negative PRAGMA cache_size value)
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000"))
+# Bytes of the database file to memory-map
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+# Prepared statements cached per connection
+SQLITE_STATEMENT_CACHE = int(os.getenv("SQLITE_STATEMENT_CACHE", "256"))
+
+# ==========================================
+# LLM / CONTEXT WINDOW
+# ==========================================
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+# Optional overrides of the per-model budget in app/graph/context_manager.py
+CONTEXT_MAX_PROMPT_TOKENS = int(os.getenv("CONTEXT_MAX_PROMPT_TOKENS", "0")) or None
+CONTEXT_MAX_TOOL_OUTPUT_TOKENS = int(os.getenv("CONTEXT_MAX_TOOL_OUTPUT_TOKENS", "0")) or None
+# Deadline (seconds) for one whole agent run (LLM calls + tools)
+CHAT_REQUEST_TIMEOUT = float(os.getenv("CHAT_REQUEST_TIMEOUT", "120"))
+
+# ==========================================
+# PER-THREAD TURN ORDERING
+# ==========================================
+# Turns on one thread run one at a time (different threads run in parallel).
+# "sqlite": a lease row in the database, so it holds across uvicorn workers;
+# "local": an in-process lock only (single worker).
+THREAD_LOCKS = os.getenv("THREAD_LOCKS", "sqlite").lower()
+# How long a turn waits for the previous one on its thread before failing (seconds)
+THREAD_LOCK_WAIT = float(os.getenv("THREAD_LOCK_WAIT", str(CHAT_REQUEST_TIMEOUT + 30)))
+# Lease lifetime past the run deadline, so a crashed worker's lease expires on its own
+THREAD_LEASE_GRACE = float(os.getenv("THREAD_LEASE_GRACE", "30"))
+# Seconds between attempts while another worker holds the lease
+THREAD_LOCK_POLL = float(os.getenv("THREAD_LOCK_POLL", "0.05"))
+
+# ==========================================
+# SHARED RUN STATE
+# ==========================================
+# "sqlite": ingestion job progress and chat run events are written to the database,
+# so any uvicorn worker can answer /documents/jobs/{id} and /chat/stream/{run_id};
+# "local": kept in the worker's memory only (single worker).
+RUN_STATE = os.getenv("RUN_STATE", "sqlite").lower()
+# Seconds between writes of buffered chat events (a reconnect to another worker lags by this much)
+RUN_STATE_FLUSH_INTERVAL = float(os.getenv("RUN_STATE_FLUSH_INTERVAL", "0.1"))
+# Seconds between reads by a client following a run that executes in another worker
+RUN_STATE_POLL_INTERVAL = float(os.getenv("RUN_STATE_POLL_INTERVAL", "0.1"))
+
+# ==========================================
+# ADMISSION CONTROL (per worker process)
+# ==========================================
+# Agent runs executing at once; further turns wait in a FIFO queue
+CHAT_MAX_CONCURRENT_RUNS = int(os.getenv("CHAT_MAX_CONCURRENT_RUNS", "16"))
+# Turns allowed to wait; beyond this /chat/send answers 429 right away
+CHAT_MAX_QUEUED = int(os.getenv("CHAT_MAX_QUEUED", "64"))
+# Longest queue wait (seconds) before the turn fails with {"code": "overloaded"}
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "30"))
+# Token buckets: sustained messages per minute and burst size (rate 0 = no limit)
+CHAT_CLIENT_RATE_PER_MIN = float(os.getenv("CHAT_CLIENT_RATE_PER_MIN", "30"))
+CHAT_CLIENT_BURST = int(os.getenv("CHAT_CLIENT_BURST", "10"))
+CHAT_THREAD_RATE_PER_MIN = float(os.getenv("CHAT_THREAD_RATE_PER_MIN", "12"))
+CHAT_THREAD_BURST = int(os.getenv("CHAT_THREAD_BURST", "3"))
+# Request header identifying the client (e.g. X-API-Key behind a gateway); empty = client IP
+RATE_LIMIT_CLIENT_HEADER = os.getenv("RATE_LIMIT_CLIENT_HEADER", "")
+# Token buckets kept in memory (least recently used are dropped first)
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+
+# ==========================================
+# CONVERSATION SUMMARIZATION
+# ==========================================
+# Fold older turns into a running summary once the history passes the threshold
+SUMMARY_ENABLED = os.getenv("SUMMARY_ENABLED", "true").lower() == "true"
+# History size (tokens) that triggers summarization
+SUMMARY_TRIGGER_TOKENS = int(os.getenv("SUMMARY_TRIGGER_TOKENS", "6000"))
+# Most recent messages always kept verbatim
+SUMMARY_KEEP_RECENT_MESSAGES = int(os.getenv("SUMMARY_KEEP_RECENT_MESSAGES", "6"))
+# Model used to write the summary (defaults to the chat model)
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", LLM_MODEL)
+
+# ==========================================
+# RESPONSE CACHE
+# ==========================================
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+# Embedding-similarity tier (costs one embedding call per lookup)
+RESPONSE_CACHE_SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "false").lower() == "true"
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# TTL (seconds) per tool category; an answer lives as long as its shortest-lived source
+RESPONSE_CACHE_TTLS = {
+    "stock": int(os.getenv("RESPONSE_CACHE_TTL_STOCK", "30")),
+    "weather": int(os.getenv("RESPONSE_CACHE_TTL_WEATHER", "600")),
+    "search": int(os.getenv("RESPONSE_CACHE_TTL_SEARCH", "3600")),
+    "documents": int(os.getenv("RESPONSE_CACHE_TTL_DOCUMENTS", "3600")),
+    "static": int(os.getenv("RESPONSE_CACHE_TTL_STATIC", "86400")),
+}
+
+# ==========================================
+# TOOLS
+# ==========================================
+WEATHER_API_BASE = os.getenv("WEATHER_API_BASE", "https://wttr.in")
+# Result cache TTL (seconds) per tool
+TOOL_CACHE_TTLS = {
+    "get_weather": int(os.getenv("TOOL_TTL_WEATHER", "600")),
+    "get_stock_price": int(os.getenv("TOOL_TTL_STOCK", "30")),
+    "duckduckgo_search": int(os.getenv("TOOL_TTL_SEARCH", "3600")),
+}
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1024"))
+# Hard deadline (seconds) per tool call; the upstream call is cancelled on expiry
+TOOL_TIMEOUTS = {
+    "get_weather": float(os.getenv("TOOL_TIMEOUT_WEATHER", "5")),
+    "get_stock_price": float(os.getenv("TOOL_TIMEOUT_STOCK", "8")),
+    "duckduckgo_search": float(os.getenv("TOOL_TIMEOUT_SEARCH", "10")),
+    "search_documents": float(os.getenv("TOOL_TIMEOUT_DOCUMENTS", "10")),
+}
+# Keep-alive connections in the shared async HTTP client
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+
+# ==========================================
+# CHAT STREAMING (SSE)
+# ==========================================
+# Seconds between keep-alive comments while no event is sent
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+# Client reconnect delay advertised in the stream (milliseconds)
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", "2000"))
+# Events kept per run for Last-Event-ID replay
+SSE_REPLAY_BUFFER = int(os.getenv("SSE_REPLAY_BUFFER", "2000"))
+# How long a finished run stays resumable (seconds)
+SSE_RUN_TTL = float(os.getenv("SSE_RUN_TTL", "60"))
+# How long a run keeps going with no client attached before it is cancelled (seconds)
+SSE_RESUME_GRACE = float(os.getenv("SSE_RESUME_GRACE", "15"))
+# Token coalescing: flush at this many characters, or after this many seconds
+SSE_COALESCE_CHARS = int(os.getenv("SSE_COALESCE_CHARS", "64"))
+SSE_COALESCE_INTERVAL = float(os.getenv("SSE_COALESCE_INTERVAL", "0.05"))
+
+# ==========================================
+# METRICS
+# ==========================================
+# Add per-turn phase timings (ms) to the final "done" event: {"timings": {...}}
+CHAT_TIMING_BREAKDOWN = os.getenv("CHAT_TIMING_BREAKDOWN", "false").lower() == "true"
+
+# ==========================================
+# CHECKPOINT STORAGE
+# ==========================================
+# "delta": messages stored once and referenced by checkpoints; "full": stock saver
+CHECKPOINT_STORAGE = os.getenv("CHECKPOINT_STORAGE", "delta").lower()
+# Checkpoints kept per thread by the compaction job (the newest is the live state)
+CHECKPOINT_KEEP_PER_THREAD = int(os.getenv("CHECKPOINT_KEEP_PER_THREAD", "5"))
+# Seconds between compaction passes (0 disables the job); one worker at a time runs it
+CHECKPOINT_COMPACT_INTERVAL = float(os.getenv("CHECKPOINT_COMPACT_INTERVAL", "300"))
+
+# ==========================================
+# STARTUP
+# ==========================================
+# Clients (chat_llm, summary_llm, embeddings, vector_store) are created on first use.
+# Comma-separated names to create in the background right after startup instead
+WARM_SERVICES = [name.strip() for name in os.getenv("WARM_SERVICES", "").split(",") if name.strip()]
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import aiosqlite
+
+from app.config import SQLITE_POOL_SIZE, SQLITE_STATEMENT_CACHE
+from app.db.sqlite_conn import DB_PATH, CONNECTION_PRAGMAS
+from app.utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+SQLITE_WAIT_SECONDS = Histogram(
+    "sqlite_wait_seconds", "Wait for a pooled connection (read) or the writer lock (write)", ("op",)
+)
+SQLITE_HOLD_SECONDS = Histogram("sqlite_hold_seconds", "Time a pooled connection is held, commit included", ("op",))
+
+
+async def _open_connection(path) -> aiosqlite.Connection:
+    """Open one aiosqlite connection and apply the pragmas once."""
+    conn = await aiosqlite.connect(path, cached_statements=SQLITE_STATEMENT_CACHE)
+    for pragma in CONNECTION_PRAGMAS:
+        await conn.execute(pragma)
+    conn.row_factory = aiosqlite.Row  # Access columns by name
+    return conn
+
+
+class AsyncSQLitePool:
+    """
+    Small pool of long-lived aiosqlite connections.
+
+    - `read()` hands out one of `size` reader connections (WAL allows concurrent readers).
+    - `write()` hands out the single writer connection, serialized by a lock,
+      and commits (or rolls back) when the block exits.
+
+    Connections keep their prepared-statement cache, so the fixed SQL strings
+    used by the services are compiled once per connection, not once per call.
+    """
+
+    def __init__(self, path=DB_PATH, size: int = SQLITE_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._readers: Optional[asyncio.Queue] = None
+        self._all = []
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock = asyncio.Lock()
+
+    async def open(self):
+        self._writer = await _open_connection(self.path)
+        self._readers = asyncio.Queue()
+        self._all = [self._writer]
+        for _ in range(self.size):
+            conn = await _open_connection(self.path)
+            self._all.append(conn)
+            self._readers.put_nowait(conn)
+        logger.info(f"SQLite pool opened at {self.path} ({self.size} readers + 1 writer)")
+
+    async def close(self):
+        for conn in self._all:
+            await conn.close()
+        self._all = []
+        self._writer = None
+        self._readers = None
+
+    @asynccontextmanager
+    async def read(self):
+        started = time.perf_counter()
+        conn = await self._readers.get()
+        acquired = time.perf_counter()
+        SQLITE_WAIT_SECONDS.observe(acquired - started, op="read")
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+            SQLITE_HOLD_SECONDS.observe(time.perf_counter() - acquired, op="read")
+
+    @asynccontextmanager
+    async def write(self):
+        started = time.perf_counter()
+        async with self._write_lock:
+            acquired = time.perf_counter()
+            SQLITE_WAIT_SECONDS.observe(acquired - started, op="write")
+            try:
+                yield self._writer
+                await self._writer.commit()
+            except BaseException:
+                await self._writer.rollback()
+                raise
+            finally:
+                SQLITE_HOLD_SECONDS.observe(time.perf_counter() - acquired, op="write")
+
+
+_pool: Optional[AsyncSQLitePool] = None
+_pool_lock = asyncio.Lock()
+
+
+async def get_pool() -> AsyncSQLitePool:
+    """Return the process-wide pool, opening it on first use."""
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                pool = AsyncSQLitePool()
+                await pool.open()
+                _pool = pool
+    return _pool
+
+
+async def close_pool():
+    """Close the process-wide pool (called on application shutdown)."""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
@@ -0,0 +1,310 @@
+"""
+Versioned schema migrations for chatbot.db.
+
+Each migration is (version, description, function). Pending ones run in order,
+each inside its own transaction, and the applied version is recorded in
+`schema_version`. Existing databases are upgraded in place on startup.
+Add new migrations to the end of MIGRATIONS - never edit an applied one.
+"""
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+# Characters of the last message kept on the thread row for the sidebar
+PREVIEW_LENGTH = 120
+
+
+def _v1_base_schema(conn: sqlite3.Connection):
+    # Threads table
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS threads (
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+    # Messages table
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        thread_id TEXT,
+        role TEXT,
+        content TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(thread_id) REFERENCES threads(id)
+    )
+    """)
+
+
+def _v2_indexes_and_cascade(conn: sqlite3.Connection):
+    # Messages written for threads that were never created would violate the FK
+    conn.execute("""
+    INSERT OR IGNORE INTO threads (id, name)
+    SELECT DISTINCT thread_id, 'Recovered Chat' FROM messages
+    WHERE thread_id IS NOT NULL AND thread_id NOT IN (SELECT id FROM threads)
+    """)
+
+    # SQLite cannot alter a foreign key: rebuild messages with ON DELETE CASCADE
+    conn.execute("""
+    CREATE TABLE messages_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        thread_id TEXT NOT NULL REFERENCES threads(id) ON DELETE CASCADE,
+        role TEXT,
+        content TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    conn.execute("""
+    INSERT INTO messages_new (id, thread_id, role, content, created_at)
+    SELECT id, thread_id, role, content, created_at FROM messages
+    WHERE thread_id IS NOT NULL
+    """)
+    conn.execute("DROP TABLE messages")
+    conn.execute("ALTER TABLE messages_new RENAME TO messages")
+
+    violations = conn.execute("PRAGMA foreign_key_check(messages)").fetchall()
+    if violations:
+        raise RuntimeError(f"messages rebuild left {len(violations)} foreign key violations")
+
+    # History load: WHERE thread_id=? ORDER BY created_at, id -> index range scan, no sort
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_messages_thread_created "
+        "ON messages (thread_id, created_at, id)"
+    )
+    # Thread list: ORDER BY created_at DESC
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_threads_created ON threads (created_at)")
+
+
+def _v3_thread_summary(conn: sqlite3.Connection):
+    # Denormalized sidebar summary, so listing threads needs no per-thread queries
+    conn.execute("ALTER TABLE threads ADD COLUMN last_message_preview TEXT")
+    conn.execute("ALTER TABLE threads ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE threads ADD COLUMN last_activity_at TIMESTAMP")
+
+    conn.execute(f"""
+    UPDATE threads SET
+        message_count = (SELECT COUNT(*) FROM messages m WHERE m.thread_id = threads.id),
+        last_activity_at = COALESCE(
+            (SELECT MAX(m.created_at) FROM messages m WHERE m.thread_id = threads.id),
+            created_at
+        ),
+        last_message_preview = (
+            SELECT substr(m.content, 1, {PREVIEW_LENGTH}) FROM messages m
+            WHERE m.thread_id = threads.id
+            ORDER BY m.created_at DESC, m.id DESC LIMIT 1
+        )
+    """)
+
+    # Keep the summary current on every write path (sync and async)
+    conn.execute(f"""
+    CREATE TRIGGER trg_messages_summary_insert AFTER INSERT ON messages
+    BEGIN
+        UPDATE threads SET
+            message_count = message_count + 1,
+            last_activity_at = NEW.created_at,
+            last_message_preview = substr(NEW.content, 1, {PREVIEW_LENGTH})
+        WHERE id = NEW.thread_id;
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_messages_summary_delete AFTER DELETE ON messages
+    BEGIN
+        UPDATE threads SET message_count = message_count - 1 WHERE id = OLD.thread_id;
+    END
+    """)
+
+    # Keyset pagination over (created_at, id)
+    conn.execute("DROP INDEX IF EXISTS idx_threads_created")
+    conn.execute("CREATE INDEX idx_threads_created ON threads (created_at, id)")
+
+
+def _v4_document_manifest(conn: sqlite3.Connection):
+    # Documents indexed per thread. Chunk ids are "{thread_id}_{filename}_{i}",
+    # so (filename, chunk_count) is enough to rebuild every vector id.
+    # No FK to threads: rows outlive the thread until its vectors are deleted.
+    conn.execute("""
+    CREATE TABLE document_manifest (
+        thread_id TEXT NOT NULL,
+        filename TEXT NOT NULL,
+        chunk_count INTEGER NOT NULL,
+        indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (thread_id, filename)
+    ) WITHOUT ROWID
+    """)
+
+
+def _v5_embedding_cache(conn: sqlite3.Connection):
+    # Vectors by (embedding model, chunk text hash), shared by every thread
+    conn.execute("""
+    CREATE TABLE embedding_cache (
+        model TEXT NOT NULL,
+        chunk_hash BLOB NOT NULL,
+        vector BLOB NOT NULL,
+        last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (model, chunk_hash)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX idx_embedding_cache_used ON embedding_cache (last_used_at)")
+
+    # What was indexed, so a re-upload can skip unchanged files and chunks:
+    # file digest + one 16-byte digest per chunk, in chunk order
+    conn.execute("ALTER TABLE document_manifest ADD COLUMN content_hash TEXT")
+    conn.execute("ALTER TABLE document_manifest ADD COLUMN chunk_hashes BLOB")
+
+
+def _v6_keyword_index(conn: sqlite3.Connection):
+    # Chunk text per thread for keyword (BM25) retrieval next to the vector index
+    conn.execute("""
+    CREATE TABLE document_chunks (
+        id INTEGER PRIMARY KEY,
+        chunk_id TEXT NOT NULL UNIQUE,
+        thread_id TEXT NOT NULL,
+        source TEXT,
+        page INTEGER,
+        text TEXT NOT NULL
+    )
+    """)
+    conn.execute("CREATE INDEX idx_document_chunks_thread ON document_chunks (thread_id)")
+
+    # Full-text index over the table above; thread_id is indexed so a MATCH can be
+    # restricted to one thread. '_' is a token character so identifiers stay whole.
+    conn.execute("""
+    CREATE VIRTUAL TABLE document_chunks_fts USING fts5(
+        text, thread_id,
+        content='document_chunks', content_rowid='id',
+        tokenize="unicode61 tokenchars '_'"
+    )
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_document_chunks_insert AFTER INSERT ON document_chunks
+    BEGIN
+        INSERT INTO document_chunks_fts (rowid, text, thread_id) VALUES (NEW.id, NEW.text, NEW.thread_id);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_document_chunks_delete AFTER DELETE ON document_chunks
+    BEGIN
+        INSERT INTO document_chunks_fts (document_chunks_fts, rowid, text, thread_id)
+        VALUES ('delete', OLD.id, OLD.text, OLD.thread_id);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER trg_document_chunks_update AFTER UPDATE ON document_chunks
+    BEGIN
+        INSERT INTO document_chunks_fts (document_chunks_fts, rowid, text, thread_id)
+        VALUES ('delete', OLD.id, OLD.text, OLD.thread_id);
+        INSERT INTO document_chunks_fts (rowid, text, thread_id) VALUES (NEW.id, NEW.text, NEW.thread_id);
+    END
+    """)
+
+
+def _v7_thread_leases(conn: sqlite3.Connection):
+    # Thread currently running a chat turn, shared by every worker process.
+    # Rows are deleted when the turn ends; an expired row may be taken over.
+    conn.execute("""
+    CREATE TABLE thread_leases (
+        thread_id TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    ) WITHOUT ROWID
+    """)
+
+
+def _v8_shared_run_state(conn: sqlite3.Connection):
+    # Ingestion job progress and chat run events, written by the worker doing the
+    # work so any worker can answer /documents/jobs/{id} and /chat/stream/{run_id}
+    conn.execute("""
+    CREATE TABLE ingestion_jobs (
+        id TEXT PRIMARY KEY,
+        thread_id TEXT NOT NULL,
+        state TEXT NOT NULL,
+        updated_at REAL NOT NULL,
+        finished_at REAL
+    ) WITHOUT ROWID
+    """)
+    conn.execute("""
+    CREATE TABLE chat_runs (
+        id TEXT PRIMARY KEY,
+        thread_id TEXT NOT NULL,
+        updated_at REAL NOT NULL,
+        finished_at REAL,
+        remote_seen_at REAL
+    ) WITHOUT ROWID
+    """)
+    conn.execute("""
+    CREATE TABLE chat_run_events (
+        run_id TEXT NOT NULL REFERENCES chat_runs(id) ON DELETE CASCADE,
+        seq INTEGER NOT NULL,
+        event TEXT NOT NULL,
+        data TEXT NOT NULL,
+        PRIMARY KEY (run_id, seq)
+    ) WITHOUT ROWID
+    """)
+
+
+MIGRATIONS = [
+    (1, "base threads/messages schema", _v1_base_schema),
+    (2, "message/thread indexes + ON DELETE CASCADE", _v2_indexes_and_cascade),
+    (3, "thread summary columns + keyset index", _v3_thread_summary),
+    (4, "per-thread document manifest (vector ids)", _v4_document_manifest),
+    (5, "embedding cache + manifest content hashes", _v5_embedding_cache),
+    (6, "document chunk keyword index (FTS5)", _v6_keyword_index),
+    (7, "per-thread chat turn leases", _v7_thread_leases),
+    (8, "ingestion jobs + chat run events shared by workers", _v8_shared_run_state),
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def run_migrations(conn: sqlite3.Connection, target: int = None) -> int:
+    """
+    Apply every pending migration (up to `target`, default latest).
+    Returns the resulting schema version.
+    """
+    # Manage transactions explicitly so DDL + data copy commit atomically
+    previous_isolation = conn.isolation_level
+    conn.isolation_level = None
+    # Table rebuilds must not trigger FK actions; this pragma is a no-op inside a transaction
+    conn.execute("PRAGMA foreign_keys=OFF")
+
+    try:
+        current = get_schema_version(conn)
+        for version, description, migrate in MIGRATIONS:
+            if version <= current or (target is not None and version > target):
+                continue
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Another worker may have applied it while this one waited for the write lock
+                if get_schema_version(conn) >= version:
+                    conn.execute("ROLLBACK")
+                    current = version
+                    continue
+                logger.info(f"Applying migration {version}: {description}")
+                migrate(conn)
+                conn.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                    (version, description)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            current = version
+    finally:
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.isolation_level = previous_isolation
+
+    return current
@@ -2,51 +2,61 @@ import sqlite3
 from pathlib import Path
 import os
 
-# Define the database path
-DB_PATH = Path("chatbot.db")
+from app.config import (
+    DATABASE_PATH,
+    CHECKPOINT_DB_PATH,
+    SQLITE_CACHE_SIZE_KB,
+    SQLITE_MMAP_SIZE,
+    SQLITE_STATEMENT_CACHE,
+    SQLITE_BUSY_TIMEOUT_MS,
+)
+from app.db.migrations import run_migrations
+
+# Database paths (DATABASE_PATH / CHECKPOINT_DB_PATH); every worker must point at the same files
+DB_PATH = Path(DATABASE_PATH).expanduser()
+CHECKPOINT_PATH = Path(CHECKPOINT_DB_PATH).expanduser()
+
+# Per-connection settings, applied once when a connection is opened.
+# journal_mode=WAL is persistent in the file; the rest are per connection.
+CONNECTION_PRAGMAS = [
+    "PRAGMA journal_mode=WAL;",
+    "PRAGMA synchronous=NORMAL;",
+    f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB};",
+    f"PRAGMA mmap_size={SQLITE_MMAP_SIZE};",
+    "PRAGMA temp_store=MEMORY;",
+    f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS};",
+    # Enforce messages -> threads ON DELETE CASCADE
+    "PRAGMA foreign_keys=ON;",
+]
 
 def get_connection():
     """
     Returns a SQLite connection with WAL mode enabled for concurrency.
     check_same_thread=False is required for FastAPI async endpoints.
+    Request handlers should use the pooled async layer in app/db/async_sqlite.py instead.
     """
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn = sqlite3.connect(
+        DB_PATH,
+        check_same_thread=False,
+        cached_statements=SQLITE_STATEMENT_CACHE,
+    )
     
     # CRITICAL FIX: Enable Write-Ahead Logging (WAL)
     # This prevents "database is locked" errors when reading/writing simultaneously.
-    conn.execute("PRAGMA journal_mode=WAL;")
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
     
     conn.row_factory = sqlite3.Row  # Access columns by name
     return conn
 
 def init_db():
     """
-    Creates tables if they don't exist.
+    Creates tables if they don't exist and upgrades older databases in place.
+    Safe to run from several workers starting at once (see run_migrations).
     """
+    for path in {DB_PATH, CHECKPOINT_PATH}:
+        path.parent.mkdir(parents=True, exist_ok=True)
     conn = get_connection()
-    cursor = conn.cursor()
-
-    # Threads table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS threads (
-        id TEXT PRIMARY KEY,
-        name TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-
-    # Messages table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS messages (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        thread_id TEXT,
-        role TEXT,
-        content TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY(thread_id) REFERENCES threads(id)
-    )
-    """)
-
-    conn.commit()
+    version = run_migrations(conn)
     conn.close()
-    print(f"Database initialized at {DB_PATH} (WAL Mode Enabled).")
\ No newline at end of file
+    print(f"Database initialized at {DB_PATH} (WAL Mode Enabled, schema v{version}).")
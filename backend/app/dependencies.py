@@ -0,0 +1,39 @@
+from fastapi import HTTPException, Request
+
+
+async def _agent_ready(request: Request):
+    """Wait until the agent started in the background is up (see start_agent in app/main.py)."""
+    state = request.app.state
+    await state.agent_ready.wait()
+    if state.chatbot is None:
+        raise HTTPException(status_code=503, detail="Agent is not available")
+
+
+async def get_chatbot(request: Request):
+    """
+    Returns the compiled LangGraph agent shared by every request.
+    It is built once after startup (see app/main.py); early requests wait for it.
+    """
+    await _agent_ready(request)
+    return request.app.state.chatbot
+
+
+async def get_checkpointer(request: Request):
+    """Returns the shared LangGraph checkpointer (agent memory)."""
+    await _agent_ready(request)
+    return request.app.state.checkpointer
+
+
+def get_ingestion_manager(request: Request):
+    """Returns the background ingestion job manager started in the lifespan."""
+    return request.app.state.ingestion
+
+
+def get_chat_runs(request: Request):
+    """Returns the registry of in-flight chat runs (SSE replay/resume)."""
+    return request.app.state.chat_runs
+
+
+def get_admission(request: Request):
+    """Returns the chat admission controller (concurrency cap, queue, rate limits)."""
+    return request.app.state.admission
@@ -0,0 +1,425 @@
+# backend/app/graph/checkpointer.py
+"""
+Delta checkpoint storage.
+
+AsyncSqliteSaver serializes the whole checkpoint on every graph step, including
+the full `messages` list, so a thread's checkpoint writes grow quadratically
+with its length. DeltaSqliteSaver appends each message once to a per-thread
+log (`checkpoint_messages`, numbered by `seq`); the checkpoint only stores the
+runs of seq numbers that make up its list, which for a normal conversation is
+a single [first, last] pair. Checkpoints written by the plain saver still load.
+
+`compact()` keeps the newest CHECKPOINT_KEEP_PER_THREAD checkpoints per thread
+and deletes log entries no kept checkpoint refers to (e.g. turns folded into
+the summary). Writes and per-thread compaction each run in one BEGIN IMMEDIATE
+transaction, so several workers can share the database; the background job
+runs in one worker at a time, under a lease row in `checkpoint_leases`.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Iterable, List, Optional, Tuple
+
+from langgraph.checkpoint.base import get_checkpoint_metadata
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from app.config import CHECKPOINT_KEEP_PER_THREAD, CHECKPOINT_COMPACT_INTERVAL
+from app.utils.metrics import Histogram, timed
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_SECONDS = Histogram("checkpoint_op_seconds", "Checkpoint reads and writes", ("op",))
+
+# Key holding the seq runs in place of the messages list
+RUNS_KEY = "__message_runs__"
+MESSAGES_CHANNEL = "messages"
+# Recently written/read checkpoints whose messages are known (no re-serialization)
+_RECENT_CHECKPOINTS = 256
+
+COMPACTION_LEASE = "compaction"
+# Taken when nobody holds the lease, the holder's lease expired, or we already hold it (renewal)
+ACQUIRE_LEASE_SQL = """
+INSERT INTO checkpoint_leases (name, owner, expires_at) VALUES (?, ?, ?)
+ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+WHERE checkpoint_leases.expires_at < ? OR checkpoint_leases.owner = excluded.owner
+"""
+
+
+class DeltaSqliteSaver(AsyncSqliteSaver):
+    """AsyncSqliteSaver that stores each message once instead of once per checkpoint."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # (thread_id, ns, checkpoint_id) -> [(message, hash, seq)]
+        self._recent: "OrderedDict[tuple, list]" = OrderedDict()
+
+    async def setup(self) -> None:
+        if self.is_setup:
+            return
+        await super().setup()
+        async with self.lock:
+            await self.conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS checkpoint_messages (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL DEFAULT '',
+                    seq INTEGER NOT NULL,
+                    hash BLOB NOT NULL,
+                    type TEXT,
+                    value BLOB,
+                    PRIMARY KEY (thread_id, checkpoint_ns, seq)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS checkpoint_leases (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                ) WITHOUT ROWID;
+                """
+            )
+            await self.conn.commit()
+
+    @asynccontextmanager
+    async def _write_transaction(self):
+        """
+        BEGIN IMMEDIATE under self.lock: takes the database write lock up front,
+        so what is read inside cannot change (in any worker) before the commit.
+        """
+        async with self.lock:
+            if self.conn.in_transaction:
+                # Left open by a statement that failed (e.g. "database is locked") in the base saver
+                await self.conn.rollback()
+            await self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                await self.conn.rollback()
+                raise
+            await self.conn.commit()
+
+    # ------------------------------------------------------------------
+    # Write: append new messages, store seq runs
+    # ------------------------------------------------------------------
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        messages = checkpoint.get("channel_values", {}).get(MESSAGES_CHANNEL)
+        if not isinstance(messages, list):
+            return await super().aput(config, checkpoint, metadata, new_versions)
+
+        await self.setup()
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_id = config["configurable"].get("checkpoint_id")
+
+        # Messages of the parent checkpoint: same object -> same entry,
+        # otherwise same serialized bytes -> same entry
+        parent = await self._known_messages(thread_id, checkpoint_ns, parent_id)
+        by_object = {id(message): (message, digest, seq) for message, digest, seq in parent}
+        by_hash = {digest: seq for _, digest, seq in parent}
+
+        entries, new_rows = [], []
+        for message in messages:
+            known = by_object.get(id(message))
+            if known and known[0] is message:
+                entries.append(known)
+                continue
+            type_, value = self.serde.dumps_typed(message)
+            digest = hashlib.blake2b(value, digest_size=16).digest()
+            if digest in by_hash:
+                entries.append((message, digest, by_hash[digest]))
+            else:
+                new_rows.append((message, digest, type_, value))
+                entries.append(None)  # seq assigned under the lock
+
+        # MAX(seq) is read inside the write transaction, so two workers never allocate the same seq
+        async with self._write_transaction():
+            if new_rows:
+                async with self.conn.execute(
+                    "SELECT COALESCE(MAX(seq), 0) FROM checkpoint_messages WHERE thread_id = ? AND checkpoint_ns = ?",
+                    (thread_id, checkpoint_ns),
+                ) as cur:
+                    next_seq = (await cur.fetchone())[0] + 1
+                rows = []
+                new_iter = iter(new_rows)
+                for i, entry in enumerate(entries):
+                    if entry is None:
+                        message, digest, type_, value = next(new_iter)
+                        entries[i] = (message, digest, next_seq)
+                        rows.append((thread_id, checkpoint_ns, next_seq, digest, type_, value))
+                        next_seq += 1
+                await self.conn.executemany(
+                    "INSERT INTO checkpoint_messages (thread_id, checkpoint_ns, seq, hash, type, value) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+            stored = {
+                **checkpoint,
+                "channel_values": {
+                    **checkpoint["channel_values"],
+                    MESSAGES_CHANNEL: {RUNS_KEY: _to_runs([seq for _, _, seq in entries])},
+                },
+            }
+            type_, serialized_checkpoint = self.serde.dumps_typed(stored)
+            serialized_metadata = json.dumps(
+                get_checkpoint_metadata(config, metadata), ensure_ascii=False
+            ).encode("utf-8", "ignore")
+            # Log entries and the checkpoint referring to them commit together
+            await self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    parent_id,
+                    type_,
+                    serialized_checkpoint,
+                    serialized_metadata,
+                ),
+            )
+
+        self._remember(thread_id, checkpoint_ns, checkpoint["id"], entries)
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    async def _known_messages(self, thread_id: str, checkpoint_ns: str, checkpoint_id: Optional[str]) -> list:
+        """(message, hash, seq) for a checkpoint, from memory or the database."""
+        if not checkpoint_id:
+            return []
+        key = (thread_id, checkpoint_ns, checkpoint_id)
+        if key in self._recent:
+            self._recent.move_to_end(key)
+            return self._recent[key]
+        checkpoint_tuple = await self.aget_tuple({
+            "configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}
+        })
+        return self._recent.get(key, []) if checkpoint_tuple else []
+
+    def _remember(self, thread_id, checkpoint_ns, checkpoint_id, entries):
+        self._recent[(thread_id, checkpoint_ns, checkpoint_id)] = entries
+        while len(self._recent) > _RECENT_CHECKPOINTS:
+            self._recent.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # Read: resolve seq runs back to messages
+    # ------------------------------------------------------------------
+    async def aget_tuple(self, config):
+        checkpoint_tuple = await super().aget_tuple(config)
+        if checkpoint_tuple is not None:
+            await self._hydrate(checkpoint_tuple)
+        return checkpoint_tuple
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        # super().alist holds the lock while iterating, so collect first
+        tuples = [t async for t in super().alist(config, filter=filter, before=before, limit=limit)]
+        for checkpoint_tuple in tuples:
+            await self._hydrate(checkpoint_tuple)
+            yield checkpoint_tuple
+
+    async def _hydrate(self, checkpoint_tuple):
+        channel_values = checkpoint_tuple.checkpoint.get("channel_values", {})
+        runs = _runs(channel_values.get(MESSAGES_CHANNEL))
+        if runs is None:
+            return
+        configurable = checkpoint_tuple.config["configurable"]
+        thread_id = str(configurable["thread_id"])
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+
+        rows = {}
+        async with self.lock:
+            for start, end in runs:
+                async with self.conn.execute(
+                    "SELECT seq, hash, type, value FROM checkpoint_messages "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND seq BETWEEN ? AND ?",
+                    (thread_id, checkpoint_ns, start, end),
+                ) as cur:
+                    async for seq, digest, type_, value in cur:
+                        rows[seq] = (digest, type_, value)
+
+        entries = []
+        for start, end in runs:
+            for seq in range(start, end + 1):
+                if seq not in rows:
+                    raise LookupError(f"Checkpoint message {seq} missing for thread {thread_id}")
+                digest, type_, value = rows[seq]
+                entries.append((self.serde.loads_typed((type_, value)), digest, seq))
+        channel_values[MESSAGES_CHANNEL] = [message for message, _, _ in entries]
+        self._remember(thread_id, checkpoint_ns, configurable["checkpoint_id"], entries)
+
+    # ------------------------------------------------------------------
+    # Deletion + compaction
+    # ------------------------------------------------------------------
+    async def adelete_thread(self, thread_id: str) -> None:
+        await super().adelete_thread(thread_id)
+        async with self.lock:
+            await self.conn.execute("DELETE FROM checkpoint_messages WHERE thread_id = ?", (str(thread_id),))
+            await self.conn.commit()
+        for key in [k for k in self._recent if k[0] == str(thread_id)]:
+            del self._recent[key]
+
+    async def compact(self, thread_ids: Optional[Iterable[str]] = None, keep: int = CHECKPOINT_KEEP_PER_THREAD) -> dict:
+        """
+        Prune old checkpoints. `thread_ids=None` compacts every thread.
+        Returns counts of deleted checkpoints, writes and messages.
+        """
+        await self.setup()
+        if thread_ids is None:
+            async with self.lock:
+                async with self.conn.execute("SELECT DISTINCT thread_id FROM checkpoints") as cur:
+                    thread_ids = [row[0] async for row in cur]
+
+        totals = {"threads": 0, "checkpoints": 0, "writes": 0, "messages": 0}
+        for thread_id in list(thread_ids):
+            deleted = await self._compact_thread(str(thread_id), keep)
+            totals["threads"] += 1
+            for key, count in deleted.items():
+                totals[key] += count
+        return totals
+
+    async def threads_written_after(self, checkpoint_id: Optional[str]) -> Tuple[List[str], Optional[str]]:
+        """
+        Threads with a checkpoint newer than `checkpoint_id` (None: every thread),
+        and the newest checkpoint id now, to pass in next time. Checkpoint ids
+        are time-ordered, so this sees writes from every worker.
+        """
+        await self.setup()
+        async with self.lock:
+            async with self.conn.execute("SELECT MAX(checkpoint_id) FROM checkpoints") as cur:
+                newest = (await cur.fetchone())[0]
+            async with self.conn.execute(
+                "SELECT DISTINCT thread_id FROM checkpoints WHERE checkpoint_id > ?", (checkpoint_id or "",)
+            ) as cur:
+                thread_ids = [row[0] async for row in cur]
+        return thread_ids, newest or checkpoint_id
+
+    async def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """Take or renew the lease `name` for `ttl` seconds; False while another owner holds it."""
+        await self.setup()
+        now = time.time()
+        async with self.lock:
+            cur = await self.conn.execute(ACQUIRE_LEASE_SQL, (name, owner, now + ttl, now))
+            await self.conn.commit()
+        return cur.rowcount == 1
+
+    async def _compact_thread(self, thread_id: str, keep: int) -> dict:
+        deleted = {"checkpoints": 0, "writes": 0, "messages": 0}
+        keep = max(keep, 1)  # the latest checkpoint is the thread's live state
+        # One write transaction for the thread: a checkpoint (and its log rows) committed
+        # by another worker is either seen when building `referenced` or not written yet
+        async with self._write_transaction():
+            async with self.conn.execute(
+                "SELECT DISTINCT checkpoint_ns FROM checkpoints WHERE thread_id = ?", (thread_id,)
+            ) as cur:
+                namespaces = [row[0] async for row in cur]
+
+            for ns in namespaces:
+                async with self.conn.execute(
+                    "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+                    (thread_id, ns, keep - 1),
+                ) as cur:
+                    oldest_kept = await cur.fetchone()
+                if oldest_kept:
+                    cur = await self.conn.execute(
+                        "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                        (thread_id, ns, oldest_kept[0]),
+                    )
+                    deleted["checkpoints"] += cur.rowcount
+                    cur = await self.conn.execute(
+                        "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                        (thread_id, ns, oldest_kept[0]),
+                    )
+                    deleted["writes"] += cur.rowcount
+                    for key in [k for k in self._recent
+                                if k[0] == thread_id and k[1] == ns and k[2] < oldest_kept[0]]:
+                        del self._recent[key]
+
+                # Log entries still referenced by a kept checkpoint
+                referenced: List[Tuple[int, int]] = []
+                async with self.conn.execute(
+                    "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?",
+                    (thread_id, ns),
+                ) as cur:
+                    async for type_, blob in cur:
+                        checkpoint = self.serde.loads_typed((type_, blob))
+                        referenced.extend(_runs(checkpoint.get("channel_values", {}).get(MESSAGES_CHANNEL)) or ())
+
+                keep_clause = " OR ".join("seq BETWEEN ? AND ?" for _ in referenced) or "0"
+                cur = await self.conn.execute(
+                    f"DELETE FROM checkpoint_messages WHERE thread_id = ? AND checkpoint_ns = ? AND NOT ({keep_clause})",
+                    (thread_id, ns, *[bound for run in referenced for bound in run]),
+                )
+                deleted["messages"] += cur.rowcount
+        return deleted
+
+
+def _to_runs(seqs: List[int]) -> List[List[int]]:
+    """[3, 4, 5, 9, 10] -> [[3, 5], [9, 10]]"""
+    runs = []
+    for seq in seqs:
+        if runs and seq == runs[-1][1] + 1:
+            runs[-1][1] = seq
+        else:
+            runs.append([seq, seq])
+    return runs
+
+
+def _runs(value) -> Optional[list]:
+    if isinstance(value, dict) and RUNS_KEY in value:
+        return value[RUNS_KEY]
+    return None
+
+
+class TimedCheckpoints:
+    """Saver mixin: checkpoint reads/writes are observed in checkpoint_op_seconds."""
+
+    async def aget_tuple(self, config):
+        with timed(CHECKPOINT_SECONDS, "checkpoint", op="get"):
+            return await super().aget_tuple(config)
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        with timed(CHECKPOINT_SECONDS, "checkpoint", op="put"):
+            return await super().aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path: str = ""):
+        with timed(CHECKPOINT_SECONDS, "checkpoint", op="put_writes"):
+            return await super().aput_writes(config, writes, task_id, task_path)
+
+
+def with_timing(saver_class):
+    """`saver_class` (DeltaSqliteSaver or AsyncSqliteSaver) with TimedCheckpoints applied."""
+    return type(saver_class.__name__, (TimedCheckpoints, saver_class), {})
+
+
+async def run_compaction(checkpointer: DeltaSqliteSaver, interval: float = CHECKPOINT_COMPACT_INTERVAL):
+    """
+    Background job, started in every worker but run by one at a time (the
+    holder of the compaction lease, renewed every pass): compact every thread
+    on the first pass, then every `interval` seconds only the threads written
+    (by any worker) since the previous pass.
+    """
+    owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+    watermark = None  # newest checkpoint id seen by our previous pass; None = all threads
+    while True:
+        try:
+            # Outlives a slow pass; a crashed holder's lease expires and another worker takes over
+            if await checkpointer.acquire_lease(COMPACTION_LEASE, owner, ttl=3 * interval):
+                thread_ids, newest = await checkpointer.threads_written_after(watermark)
+                totals = await checkpointer.compact(thread_ids)
+                watermark = newest
+                if totals["checkpoints"] or totals["messages"]:
+                    logger.info(f"Checkpoint compaction: {totals}")
+            else:
+                # Another worker compacts; if we take over later, start with a full pass
+                watermark = None
+        except Exception as e:
+            logger.error(f"Checkpoint compaction failed: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,241 @@
+"""
+Token-budget-aware context window management for chat_node.
+
+The prompt sent to the LLM is: system prompt + as much recent history as fits
+the model's budget + the current turn. History is dropped oldest-first in whole
+"units" so an AIMessage with tool_calls is never separated from its ToolMessages.
+Oversized tool outputs are truncated before anything is dropped.
+"""
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import List, Optional
+
+from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage, AIMessage, ToolMessage
+
+from app.config import CONTEXT_MAX_PROMPT_TOKENS, CONTEXT_MAX_TOOL_OUTPUT_TOKENS
+
+logger = logging.getLogger(__name__)
+
+TRUNCATION_MARKER = "\n...[truncated]"
+
+
+@dataclass(frozen=True)
+class ContextBudget:
+    # Tokens allowed for the whole prompt (system + history + current turn)
+    max_prompt_tokens: int
+    # Any single tool result is cut down to this many tokens
+    max_tool_output_tokens: int
+    # Fixed per-message cost for role/formatting tokens
+    per_message_overhead: int = 4
+    # Never truncate a message below this many tokens when squeezing the current turn
+    min_message_tokens: int = 200
+
+
+# Budgets leave room for the completion and for tokenizer mismatch
+# (counts use a GPT tokenizer as an approximation for Llama models).
+MODEL_BUDGETS = {
+    "llama-3.3-70b-versatile": ContextBudget(max_prompt_tokens=12000, max_tool_output_tokens=2000),
+    "llama-3.1-8b-instant": ContextBudget(max_prompt_tokens=6000, max_tool_output_tokens=1000),
+}
+DEFAULT_BUDGET = ContextBudget(max_prompt_tokens=8000, max_tool_output_tokens=1500)
+
+
+def get_budget(model: str) -> ContextBudget:
+    """Budget for a model, with optional env overrides."""
+    budget = MODEL_BUDGETS.get(model, DEFAULT_BUDGET)
+    if CONTEXT_MAX_PROMPT_TOKENS:
+        budget = replace(budget, max_prompt_tokens=CONTEXT_MAX_PROMPT_TOKENS)
+    if CONTEXT_MAX_TOOL_OUTPUT_TOKENS:
+        budget = replace(budget, max_tool_output_tokens=CONTEXT_MAX_TOOL_OUTPUT_TOKENS)
+    return budget
+
+
+def message_text(message: BaseMessage) -> str:
+    """Plain-text content of a message (content may be a list of parts)."""
+    if isinstance(message.content, str):
+        return message.content
+    return message.text
+
+
+def _load_tiktoken_encoding(name: str):
+    # Blocking: the encoding file is downloaded (with retries) when not cached
+    import tiktoken
+    return tiktoken.get_encoding(name)
+
+
+class TokenCounter:
+    """
+    Counts tokens with tiktoken once its encoding is loaded (`load_encoding()`,
+    at startup), and with ~4 characters per token until then or if loading
+    failed. Per-message counts are cached (LRU) so an unchanged history is not
+    re-tokenized on every turn.
+    """
+
+    def __init__(self, encoding_name: str = "cl100k_base", cache_size: int = 20000):
+        self.encoding_name = encoding_name
+        self.cache_size = cache_size
+        self._encoding = None
+        self._encoding_loaded = False
+        self._cache: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def load_encoding(self):
+        """Load the tiktoken encoding in a worker thread (never on the event loop)."""
+        if self._encoding_loaded:
+            return
+        self._encoding_loaded = True
+        try:
+            encoding = await asyncio.to_thread(_load_tiktoken_encoding, self.encoding_name)
+        except Exception as e:
+            logger.warning(f"tiktoken unavailable ({e}); using character-based token estimate")
+            return
+        self._encoding = encoding
+        # Counts cached so far are estimates
+        self._cache.clear()
+
+    def _get_encoding(self):
+        return self._encoding
+
+    def count_text(self, text: str) -> int:
+        encoding = self._get_encoding()
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+        return (len(text) + 3) // 4
+
+    def truncate_text(self, text: str, max_tokens: int) -> str:
+        """Keep roughly the first `max_tokens` tokens of `text`."""
+        if self.count_text(text) <= max_tokens:
+            return text
+        keep = max(0, max_tokens - self.count_text(TRUNCATION_MARKER))
+        encoding = self._get_encoding()
+        if encoding is not None:
+            head = encoding.decode(encoding.encode(text, disallowed_special=())[:keep])
+        else:
+            head = text[:keep * 4]
+        return head + TRUNCATION_MARKER
+
+    def _cache_key(self, message: BaseMessage, text: str, calls: str):
+        # Messages in graph state carry stable ids; the lengths guard against edited copies
+        if message.id:
+            return (message.type, message.id, len(text), len(calls))
+        return (message.type, hash(text), hash(calls))
+
+    def count(self, message: BaseMessage) -> int:
+        text = message_text(message)
+        calls = json.dumps(message.tool_calls, default=str) if isinstance(message, AIMessage) and message.tool_calls else ""
+        key = self._cache_key(message, text, calls)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        tokens = self.count_text(text)
+        if calls:
+            tokens += self.count_text(calls)
+
+        self._cache[key] = tokens
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return tokens
+
+
+def group_units(messages: List[BaseMessage]) -> List[List[BaseMessage]]:
+    """
+    Split history into units that must be kept or dropped together:
+    an AIMessage with tool_calls plus the ToolMessages answering it,
+    or any other single message.
+    """
+    units = []
+    for message in messages:
+        if isinstance(message, ToolMessage) and units and _open_tool_call(units[-1], message):
+            units[-1].append(message)
+        else:
+            units.append([message])
+    return units
+
+
+def _open_tool_call(unit: List[BaseMessage], tool_message: ToolMessage) -> bool:
+    head = unit[0]
+    return (
+        isinstance(head, AIMessage)
+        and any(call.get("id") == tool_message.tool_call_id for call in head.tool_calls)
+    )
+
+
+class ContextWindowManager:
+    def __init__(self, budget: ContextBudget, counter: Optional[TokenCounter] = None):
+        self.budget = budget
+        self.counter = counter or TokenCounter()
+
+    def tokens(self, message: BaseMessage) -> int:
+        return self.counter.count(message) + self.budget.per_message_overhead
+
+    def total(self, messages: List[BaseMessage]) -> int:
+        return sum(self.tokens(m) for m in messages)
+
+    def _truncate(self, message: BaseMessage, max_tokens: int) -> BaseMessage:
+        text = message_text(message)
+        return message.model_copy(update={"content": self.counter.truncate_text(text, max_tokens)})
+
+    def _cap_tool_output(self, message: BaseMessage) -> BaseMessage:
+        if isinstance(message, ToolMessage) and self.counter.count(message) > self.budget.max_tool_output_tokens:
+            return self._truncate(message, self.budget.max_tool_output_tokens)
+        return message
+
+    def _squeeze(self, messages: List[BaseMessage], available: int) -> List[BaseMessage]:
+        """
+        Make the current turn fit by truncating its largest messages:
+        tool outputs first, then the user's message.
+        """
+        messages = list(messages)
+        order = sorted(
+            range(len(messages)),
+            key=lambda i: (not isinstance(messages[i], ToolMessage), -self.counter.count(messages[i])),
+        )
+        for i in order:
+            excess = self.total(messages) - available
+            if excess <= 0:
+                break
+            if not isinstance(messages[i], (ToolMessage, HumanMessage)):
+                continue
+            current = self.counter.count(messages[i])
+            target = max(self.budget.min_message_tokens, current - excess)
+            if target < current:
+                messages[i] = self._truncate(messages[i], target)
+        return messages
+
+    def fit(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """Return the messages to send to the LLM within the token budget."""
+        system = []
+        while len(system) < len(messages) and isinstance(messages[len(system)], SystemMessage):
+            system.append(messages[len(system)])
+        rest = [self._cap_tool_output(m) for m in messages[len(system):]]
+
+        # The current turn (last user message onwards) is always kept
+        last_human = max((i for i, m in enumerate(rest) if isinstance(m, HumanMessage)), default=0)
+        history, current = rest[:last_human], rest[last_human:]
+
+        available = self.budget.max_prompt_tokens - self.total(system)
+        if self.total(current) > available:
+            current = self._squeeze(current, available)
+        available -= self.total(current)
+
+        # Fill with history, newest first, keeping tool-call units whole
+        kept = []
+        for unit in reversed(group_units(history)):
+            cost = self.total(unit)
+            if cost > available:
+                break
+            kept[:0] = unit
+            available -= cost
+
+        dropped = len(history) - len(kept)
+        if dropped:
+            logger.debug(f"Context window: dropped {dropped} older messages")
+        return system + kept + current
@@ -1,29 +1,51 @@
-import os
-from typing import Annotated, TypedDict
+import logging
+import time
+
 from dotenv import load_dotenv
 
 # LangGraph & LangChain Imports
-from langchain_groq import ChatGroq
-from langchain_core.messages import BaseMessage, SystemMessage
-from langgraph.graph import StateGraph, START
-from langgraph.graph.message import add_messages
+from langchain_core.messages import SystemMessage, message_chunk_to_message
+from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode, tools_condition
 
 # Import your tools
 from app.utils.tools import tools
+from app.config import (
+    LLM_MODEL,
+    SUMMARY_ENABLED,
+    SUMMARY_TRIGGER_TOKENS,
+    SUMMARY_KEEP_RECENT_MESSAGES,
+)
+from app.graph.state import ChatState
+from app.graph.context_manager import ContextWindowManager, get_budget, message_text
+from app.graph import summarizer
+from app.services.service_registry import aget_service
+from app.utils.metrics import Counter, Histogram, add_timing
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # ==========================================
 # 1. LLM SETUP
 # ==========================================
-llm = ChatGroq(
-    model="llama-3.3-70b-versatile",
-    api_key=os.getenv("GROQ_API_KEY"),
-    temperature=0.1,
+# The chat model (Groq LLM_MODEL bound to the tools) and the summary model are
+# created on first use: "chat_llm" / "summary_llm" in app/services/service_registry.py
+
+# Token-budgeted history trimming (per-model budget, cached token counts)
+context_manager = ContextWindowManager(get_budget(LLM_MODEL))
+
+LLM_CALL_SECONDS = Histogram("llm_call_seconds", "LLM call duration per graph node", ("node",))
+LLM_TTFT_SECONDS = Histogram("llm_ttft_seconds", "LLM time to first streamed chunk", ("node",))
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "LLM tokens per graph node (provider usage, else estimated)", ("node", "kind")
 )
 
-llm_with_tools = llm.bind_tools(tools)
+
+def _count_tokens(node: str, prompt, response):
+    usage = getattr(response, "usage_metadata", None) or {}
+    LLM_TOKENS.inc(usage.get("input_tokens") or context_manager.total(prompt), node=node, kind="input")
+    LLM_TOKENS.inc(usage.get("output_tokens") or context_manager.tokens(response), node=node, kind="output")
 
 # ==========================================
 # 2. UPDATED SYSTEM PROMPT
@@ -76,27 +98,79 @@ CRITICAL GUIDELINES:
 - NEVER say "I don't have access to real-time information" for general knowledge questions"""
 
 # ==========================================
-# 3. STATE (Simple - no thread_id needed here)
+# 3. NODES (state lives in app/graph/state.py)
 # ==========================================
-class ChatState(TypedDict):
-    messages: Annotated[list[BaseMessage], add_messages]
-
-def chat_node(state: ChatState):
-    """Enhanced agent node with better context management."""
+async def chat_node(state: ChatState):
+    """
+    Enhanced agent node with better context management.
+    Streams the LLM asynchronously, so cancelling the run (client disconnect,
+    request deadline) stops generation immediately.
+    """
     messages = state["messages"]
     
     # Add system message only if not present
     if not messages or not isinstance(messages[0], SystemMessage):
         sys_msg = SystemMessage(content=UNIVERSAL_SYSTEM_PROMPT)
         messages = [sys_msg] + messages
+
+    # Running summary of turns folded out of state goes right after the system prompt
+    summary = state.get("summary")
+    if summary:
+        messages = [messages[0], summarizer.summary_message(summary)] + messages[1:]
     
-    # Smart context window management
-    if len(messages) > 31:
-        messages = [messages[0]] + messages[-30:]
+    # Smart context window management: fit history to the model's token budget
+    messages = context_manager.fit(messages)
     
-    # Invoke LLM
-    response = llm_with_tools.invoke(messages)
-    return {"messages": [response]}
+    # Stream LLM tokens (surfaced to chat_service as on_chat_model_stream events)
+    llm_with_tools = await aget_service("chat_llm")
+    response = None
+    started = time.perf_counter()
+    async for chunk in llm_with_tools.astream(messages):
+        if response is None:
+            ttft = time.perf_counter() - started
+            LLM_TTFT_SECONDS.observe(ttft, node="agent")
+            add_timing("llm_ttft", ttft)
+        response = chunk if response is None else response + chunk
+    if response is None:
+        # Stream ended without a single chunk: ask again without streaming
+        logger.warning("Chat model stream yielded no chunks; retrying with ainvoke")
+        response = await llm_with_tools.ainvoke(messages)
+    elapsed = time.perf_counter() - started
+    LLM_CALL_SECONDS.observe(elapsed, node="agent")
+    add_timing("llm", elapsed)
+    message = message_chunk_to_message(response)
+    _count_tokens("agent", messages, message)
+    return {"messages": [message]}
+
+async def summarize_node(state: ChatState):
+    """
+    Fold older turns into the running summary and drop them from state.
+    Only messages still in state are folded, so the summary grows incrementally.
+    """
+    to_fold, _ = summarizer.split_for_summary(state["messages"], SUMMARY_KEEP_RECENT_MESSAGES)
+    if not to_fold:
+        return {}
+
+    request = summarizer.build_summary_request(state.get("summary", ""), to_fold)
+    summary_llm = await aget_service("summary_llm")
+    started = time.perf_counter()
+    response = await summary_llm.ainvoke(request)
+    elapsed = time.perf_counter() - started
+    LLM_CALL_SECONDS.observe(elapsed, node="summarize")
+    add_timing("summarize", elapsed)
+    _count_tokens("summarize", request, response)
+    return {
+        "summary": message_text(response),
+        "messages": summarizer.removals(to_fold),
+    }
+
+def route_after_agent(state: ChatState):
+    """Run tools if requested; otherwise summarize (when over threshold) or finish."""
+    if tools_condition(state) == "tools":
+        return "tools"
+    if SUMMARY_ENABLED and context_manager.total(state["messages"]) > SUMMARY_TRIGGER_TOKENS:
+        return "summarize"
+    return END
 
 # Use built-in ToolNode - much simpler!
 tool_node = ToolNode(tools)
@@ -109,8 +183,11 @@ graph = StateGraph(ChatState)
 # Add Nodes
 graph.add_node("agent", chat_node)
 graph.add_node("tools", tool_node)
+graph.add_node("summarize", summarize_node)
 
 # Add Edges
 graph.add_edge(START, "agent")
-graph.add_conditional_edges("agent", tools_condition)
-graph.add_edge("tools", "agent")
\ No newline at end of file
+# Summarize after the answer is complete, so it never delays the first token
+graph.add_conditional_edges("agent", route_after_agent, ["tools", "summarize", END])
+graph.add_edge("tools", "agent")
+graph.add_edge("summarize", END)
\ No newline at end of file
@@ -4,4 +4,6 @@ from langchain_core.messages import BaseMessage
 
 class ChatState(TypedDict):
     # Annotated with add_messages ensures conversation history builds up
-    messages: Annotated[list[BaseMessage], add_messages]
\ No newline at end of file
+    messages: Annotated[list[BaseMessage], add_messages]
+    # Running summary of turns folded out of `messages` (see summarize_node)
+    summary: str
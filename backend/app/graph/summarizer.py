@@ -0,0 +1,79 @@
+"""
+Rolling conversation summary.
+
+Once the messages in graph state pass SUMMARY_TRIGGER_TOKENS, everything but the
+most recent turns is folded into `summary` and removed from state. Only messages
+that are still in state get folded, so each run adds just the new turns to the
+existing summary.
+"""
+from typing import List, Tuple
+
+from langchain_core.messages import (
+    BaseMessage, SystemMessage, HumanMessage, AIMessage, ToolMessage, RemoveMessage
+)
+
+from app.graph.context_manager import group_units, message_text
+
+# Tool output is usually retrievable again; keep only a short excerpt in the transcript
+TOOL_EXCERPT_CHARS = 500
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and an AI assistant.
+
+Existing summary (may be empty):
+{summary}
+
+New conversation turns to fold in:
+{transcript}
+
+Write the updated summary. Keep facts the user stated, decisions, open questions, names, numbers and which documents/tools were used. Drop greetings and filler. Use at most {max_words} words. Reply with the summary only."""
+
+SUMMARY_SYSTEM_TEMPLATE = "Summary of the earlier conversation (older messages are not shown):\n{summary}"
+
+
+def split_for_summary(messages: List[BaseMessage], keep_recent: int) -> Tuple[List[BaseMessage], List[BaseMessage]]:
+    """
+    Split state messages into (to_fold, to_keep). At least `keep_recent` messages
+    are kept, extended backwards so a tool-call unit is never split.
+    """
+    kept = 0
+    units = group_units(messages)
+    cut = len(units)
+    while cut > 0 and kept < keep_recent:
+        cut -= 1
+        kept += len(units[cut])
+    to_fold = [m for unit in units[:cut] for m in unit]
+    return to_fold, messages[len(to_fold):]
+
+
+def format_transcript(messages: List[BaseMessage]) -> str:
+    lines = []
+    for m in messages:
+        text = message_text(m)
+        if isinstance(m, HumanMessage):
+            lines.append(f"User: {text}")
+        elif isinstance(m, AIMessage):
+            if m.tool_calls:
+                calls = ", ".join(f"{c['name']}({c.get('args', {})})" for c in m.tool_calls)
+                lines.append(f"Assistant called tools: {calls}")
+            if text:
+                lines.append(f"Assistant: {text}")
+        elif isinstance(m, ToolMessage):
+            excerpt = text[:TOOL_EXCERPT_CHARS] + ("..." if len(text) > TOOL_EXCERPT_CHARS else "")
+            lines.append(f"Tool result ({m.name or 'tool'}): {excerpt}")
+    return "\n".join(lines)
+
+
+def build_summary_request(summary: str, to_fold: List[BaseMessage], max_words: int = 250) -> List[BaseMessage]:
+    return [HumanMessage(content=SUMMARY_PROMPT.format(
+        summary=summary or "(none)",
+        transcript=format_transcript(to_fold),
+        max_words=max_words,
+    ))]
+
+
+def summary_message(summary: str) -> SystemMessage:
+    return SystemMessage(content=SUMMARY_SYSTEM_TEMPLATE.format(summary=summary))
+
+
+def removals(to_fold: List[BaseMessage]) -> List[RemoveMessage]:
+    return [RemoveMessage(id=m.id) for m in to_fold if m.id]
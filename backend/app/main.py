@@ -1,14 +1,116 @@
+import asyncio
+import importlib
+import logging
+from contextlib import asynccontextmanager, AsyncExitStack
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.routes.chat_routes import router as chat_router
 from app.routes.thread_routes import router as thread_router
-from app.db.sqlite_conn import init_db
+from app.db.sqlite_conn import init_db, CHECKPOINT_PATH
+from app.db.async_sqlite import get_pool, close_pool
+from app.config import CHECKPOINT_STORAGE, CHECKPOINT_COMPACT_INTERVAL, WARM_SERVICES
+from app.services.ingestion_jobs import IngestionManager
+from app.services.chat_runs import ChatRunManager
+from app.services.admission import AdmissionController
+from app.services.service_registry import service_status, warm_services
+from app.utils.tool_runtime import close_http_client
+from app.utils.metrics import Gauge, render as render_metrics
 from app.routes import document_routes
+from app.services.rag_service import sweep_orphaned_documents
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = FastAPI(title="LangGraph Chatbot with Threads")
+logger = logging.getLogger(__name__)
+
+
+async def start_agent(app: FastAPI, stack: AsyncExitStack):
+    """
+    Open ONE checkpointer connection and compile the graph ONCE, so chat
+    requests don't pay connection/setup/compile cost per message.
+    Runs after startup: LangGraph is imported in a thread while the server
+    already answers /health; chat requests wait for app.state.agent_ready.
+    """
+    try:
+        setup = await asyncio.to_thread(importlib.import_module, "app.graph.langgraph_setup")
+        checkpoint = await asyncio.to_thread(importlib.import_module, "app.graph.checkpointer")
+
+        # Delta storage keeps each message once instead of once per checkpoint
+        if CHECKPOINT_STORAGE == "delta":
+            saver_class = checkpoint.DeltaSqliteSaver
+        else:
+            saver_class = checkpoint.AsyncSqliteSaver
+        saver_class = checkpoint.with_timing(saver_class)
+        checkpointer = await stack.enter_async_context(saver_class.from_conn_string(str(CHECKPOINT_PATH)))
+        # Create checkpoint tables now instead of on the first message
+        await checkpointer.setup()
+        app.state.checkpointer = checkpointer
+        app.state.chatbot = setup.graph.compile(checkpointer=checkpointer)
+        # Token counts use the character estimate until the encoding is loaded
+        app.state.background.append(asyncio.create_task(setup.context_manager.counter.load_encoding()))
+
+        # Periodically prune old checkpoint versions
+        if isinstance(checkpointer, checkpoint.DeltaSqliteSaver) and CHECKPOINT_COMPACT_INTERVAL > 0:
+            app.state.background.append(asyncio.create_task(checkpoint.run_compaction(checkpointer)))
+        logger.info("Agent ready")
+    except Exception as e:
+        logger.error(f"Agent failed to start: {e}")
+    finally:
+        app.state.agent_ready.set()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Application lifespan.
+    Only the database is opened before the server starts accepting requests;
+    the agent and (optionally) the API clients are prepared in the background.
+    """
+    # Initialize Database on Startup
+    init_db()
+    # Open the pooled async connections used by request handlers
+    await get_pool()
+
+    app.state.chatbot = None
+    app.state.checkpointer = None
+    app.state.agent_ready = asyncio.Event()
+    app.state.background = []
+
+    # Background document ingestion (process pool + workers)
+    app.state.ingestion = IngestionManager()
+    await app.state.ingestion.start()
+
+    # In-flight chat runs (resumable SSE streams)
+    app.state.chat_runs = ChatRunManager()
+    # Concurrency cap, wait queue and rate limits in front of the agent
+    app.state.admission = AdmissionController()
+
+    async with AsyncExitStack() as stack:
+        agent = asyncio.create_task(start_agent(app, stack))
+        # Finish vector deletions that failed for already-deleted threads
+        app.state.background.append(asyncio.create_task(sweep_orphaned_documents()))
+        # Clients created ahead of the first request that needs them
+        if WARM_SERVICES:
+            app.state.background.append(asyncio.create_task(warm_services(WARM_SERVICES)))
+
+        yield
+
+        agent.cancel()
+        for task in app.state.background:
+            task.cancel()
+        await asyncio.gather(agent, *app.state.background, return_exceptions=True)
+        await app.state.chat_runs.shutdown()
+        await app.state.ingestion.shutdown()
+        # Connection is closed cleanly when the exit stack unwinds
+        app.state.chatbot = None
+        app.state.checkpointer = None
+
+    await close_pool()
+    await close_http_client()
+
+
+app = FastAPI(title="LangGraph Chatbot with Threads", lifespan=lifespan)
 
 # CORS Configuration
 app.add_middleware(
@@ -17,11 +119,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Run-ID", "Retry-After"],
 )
 
-# Initialize Database on Startup
-init_db()
-
 # Include Routers
 app.include_router(chat_router, prefix="/chat", tags=["Chat"])
 app.include_router(thread_router, prefix="/thread", tags=["Thread"])
@@ -29,4 +129,41 @@ app.include_router(document_routes.router, prefix="/documents", tags=["Documents
 
 @app.get("/")
 def root():
-    return {"message": "Chatbot backend is running!"}
\ No newline at end of file
+    return {"message": "Chatbot backend is running!"}
+
+
+@app.get("/health")
+def health():
+    """Liveness: the process is up and serving (nothing is checked or created)."""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready(warm: bool = False):
+    """
+    Readiness: 200 once the agent (graph + checkpointer) is up, else 503.
+    With ?warm=true the API clients are created now and must all succeed,
+    so a worker can be warmed before it is put behind the load balancer.
+    """
+    services = await warm_services() if warm else service_status()
+    agent_ready = app.state.chatbot is not None
+    is_ready = agent_ready and (not warm or all(s["ready"] for s in services.values()))
+    return JSONResponse(
+        content={"ready": is_ready, "agent": agent_ready, "services": services},
+        status_code=200 if is_ready else 503,
+    )
+
+
+def _admission_state(attribute: str):
+    admission = getattr(app.state, "admission", None)
+    return getattr(admission, attribute) if admission is not None else 0
+
+
+CHAT_RUNS_ACTIVE = Gauge("chat_runs_active", "Agent runs holding a run slot", function=lambda: _admission_state("running"))
+CHAT_RUNS_QUEUED = Gauge("chat_runs_queued", "Admitted turns waiting for a run slot", function=lambda: _admission_state("queued"))
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics for this worker process."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
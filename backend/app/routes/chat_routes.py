@@ -1,14 +1,49 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
 from fastapi.responses import StreamingResponse
 from app.schemas.chat_schema import ChatRequest
 from app.services.chat_service import stream_chat_response
+from app.services.thread_service import athread_exists
+from app.dependencies import get_chatbot, get_chat_runs, get_admission
+from app.services.admission import AdmissionRejected
+from app.config import RATE_LIMIT_CLIENT_HEADER
+from app.utils.sse import parse_last_event_id
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def _event_stream(run, body):
+    return StreamingResponse(
+        body,
+        media_type="text/event-stream",
+        headers={**SSE_HEADERS, "X-Run-ID": run.id},
+    )
+
+
+def _client_id(http_request: Request) -> str:
+    """Rate-limit key: the configured header (e.g. an API key from the gateway), else the client IP."""
+    if RATE_LIMIT_CLIENT_HEADER:
+        value = http_request.headers.get(RATE_LIMIT_CLIENT_HEADER)
+        if value:
+            return value
+    return http_request.client.host if http_request.client else "unknown"
+
+
 @router.post("/send")
-async def chat_send(request: ChatRequest):
+async def chat_send(
+    request: ChatRequest,
+    http_request: Request,
+    chatbot=Depends(get_chatbot),
+    chat_runs=Depends(get_chat_runs),
+    admission=Depends(get_admission),
+):
     """
     Stream chat response with RAG context from Pinecone.
     
@@ -18,7 +53,13 @@ async def chat_send(request: ChatRequest):
         "thread_id": "uuid-of-thread"
     }
     
-    Returns: Server-Sent Events stream
+    Returns: Server-Sent Events stream.
+    Events: token {"text"}, tool_start/tool_end {"id", "name"},
+    then done {"cached", "tools"} or error {"code", "message"}.
+    Event ids are "<run_id>:<seq>"; the run id is also in the X-Run-ID header.
+    While waiting for a free agent slot: queued {"position"}; "done" carries "queue_ms".
+    404 if the thread does not exist; 429 with Retry-After when the client or
+    thread is over its rate limit or the queue is full.
     """
     try:
         if not request.message or not request.message.strip():
@@ -26,19 +67,57 @@ async def chat_send(request: ChatRequest):
         
         if not request.thread_id:
             raise HTTPException(status_code=400, detail="Thread ID is required")
-        
+
+        if not await athread_exists(request.thread_id):
+            raise HTTPException(status_code=404, detail="Thread not found")
+
+        try:
+            ticket = admission.admit(request.thread_id, _client_id(http_request))
+        except AdmissionRejected as e:
+            logger.warning(f"Chat turn rejected ({e.reason}) for thread: {request.thread_id}")
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many requests ({e.reason}), retry in {e.retry_after}s",
+                headers={"Retry-After": str(e.retry_after)},
+            )
+
         logger.info(f"Processing message for thread: {request.thread_id}")
-        
-        return StreamingResponse(
-            stream_chat_response(request.message, request.thread_id),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "X-Accel-Buffering": "no"
-            }
-        )
+
+        try:
+            run = chat_runs.start(
+                request.thread_id,
+                stream_chat_response(request.message, request.thread_id, chatbot, admission, ticket),
+            )
+        except BaseException:
+            admission.release(ticket)
+            raise
+        # The turn may end before it reaches the run slot queue (busy thread, cancelled)
+        run.task.add_done_callback(lambda _: admission.release(ticket))
+        return _event_stream(run, chat_runs.subscribe(run))
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Chat error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/stream/{run_id}")
+async def chat_resume(
+    run_id: str,
+    last_event_id: Optional[str] = Header(None),
+    chat_runs=Depends(get_chat_runs),
+):
+    """
+    Reconnect to a running (or just finished) response, in this or another worker.
+    Events after the Last-Event-ID header are replayed, then the stream follows live.
+    """
+    run = await chat_runs.aget(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found or expired")
+    return _event_stream(run, chat_runs.subscribe(run, parse_last_event_id(last_event_id)))
+
+
+@router.get("/admission")
+async def chat_admission(admission=Depends(get_admission)):
+    """Agent runs in flight and queued, rejections by reason, and queue wait percentiles."""
+    return admission.stats()
@@ -1,13 +1,15 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
 from fastapi.responses import JSONResponse
 from typing import List
+import asyncio
 import os
+import tempfile
 from pathlib import Path
-from app.services.rag_service import (
-    process_and_store_pdf,
-    delete_thread_documents
-)
-from app.services.thread_service import save_message
+from app.config import MAX_UPLOAD_MB
+from app.services.document_parser import DocumentFormat, SUPPORTED_EXTENSIONS, detect_format
+from app.services.rag_service import delete_thread_documents
+from app.services.thread_service import athread_exists
+from app.dependencies import get_ingestion_manager
 
 router = APIRouter()
 
@@ -15,76 +17,126 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DOCUMENTS_PATH = os.path.join(BASE_DIR, "../../documents")
 Path(DOCUMENTS_PATH).mkdir(parents=True, exist_ok=True)
 
-@router.post("/upload")
+MAX_UPLOAD_BYTES = MAX_UPLOAD_MB * 1024 * 1024
+COPY_BLOCK_SIZE = 1024 * 1024
+
+
+def _save_upload(file: UploadFile, fmt: DocumentFormat) -> str:
+    """
+    Copy an upload to a unique temp file in fixed-size blocks (blocking - run in a thread).
+    Raises ValueError if its content does not match `fmt` or it exceeds MAX_UPLOAD_MB;
+    nothing is left behind.
+    """
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise ValueError(f"File exceeds the {MAX_UPLOAD_MB} MB upload limit")
+    if not fmt.looks_valid(file.file.read(4096)):
+        raise ValueError(f"Not a valid {fmt.name.upper()} file")
+    file.file.seek(0)
+
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=fmt.extensions[0])
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            copied = 0
+            while block := file.file.read(COPY_BLOCK_SIZE):
+                copied += len(block)
+                if copied > MAX_UPLOAD_BYTES:
+                    raise ValueError(f"File exceeds the {MAX_UPLOAD_MB} MB upload limit")
+                buffer.write(block)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+@router.post("/upload", status_code=202)
 async def upload_documents(
     files: List[UploadFile] = File(...),
-    thread_id: str = Form(...)
+    thread_id: str = Form(...),
+    ingestion=Depends(get_ingestion_manager)
 ):
     """
-    Upload PDF documents and index them in Pinecone with thread_id.
+    Queue documents (PDF, DOCX, TXT, Markdown, HTML, CSV) for indexing with thread_id.
+    Returns a job id immediately; poll /documents/jobs/{job_id} for progress.
     """
+    if not thread_id or not thread_id.strip():
+        raise HTTPException(status_code=400, detail="thread_id is required")
+    if not await athread_exists(thread_id):
+        raise HTTPException(status_code=404, detail="Thread not found")
+
     try:
-        if not thread_id or not thread_id.strip():
-            raise HTTPException(status_code=400, detail="thread_id is required")
-        
-        results = []
-        
+        accepted = []
+        rejected = []
+
         for file in files:
-            # Check if file is PDF
-            if not file.filename.lower().endswith('.pdf'):
-                results.append({
+            # Pick the parser by extension, else by MIME type
+            fmt = detect_format(file.filename, file.content_type)
+            if fmt is None:
+                rejected.append({
                     "filename": file.filename,
                     "success": False,
-                    "message": "Only PDF files are supported"
+                    "message": f"Unsupported file type (supported: {', '.join(SUPPORTED_EXTENSIONS)})"
                 })
                 continue
-            
-            # Process and store
-            success, message = await process_and_store_pdf(file, thread_id)
-            
-            results.append({
-                "filename": file.filename,
-                "success": success,
-                "message": message
-            })
-        
-        # Check if any succeeded
-        successful = [r for r in results if r["success"]]
-        failed = [r for r in results if not r["success"]]
-        
-        # Save confirmation message to chat
-        if len(successful) > 0:
-            file_names = ", ".join([r["filename"] for r in successful])
-            confirmation_message = (
-                f"✅ **Document Uploaded Successfully**\n\n"
-                f"📄 **Files:** {file_names}\n"
-                f"📊 **Status:** {successful[0]['message']}\n\n"
-                f"You can now ask me questions about {'this document' if len(successful) == 1 else 'these documents'}!"
+
+            try:
+                path = await asyncio.to_thread(_save_upload, file, fmt)
+            except ValueError as e:
+                rejected.append({
+                    "filename": file.filename,
+                    "success": False,
+                    "message": str(e)
+                })
+                continue
+            accepted.append((file.filename, path, fmt.name))
+
+        if not accepted:
+            return JSONResponse(
+                content={
+                    "success": False,
+                    "message": "No supported files to process",
+                    "results": rejected,
+                    "thread_id": thread_id
+                },
+                status_code=400
             )
-            save_message(thread_id, "assistant", confirmation_message)
-        
+
+        job = await ingestion.submit(thread_id, accepted)
+
         return JSONResponse(
             content={
-                "success": len(successful) > 0,
-                "message": f"Processed {len(successful)} files successfully, {len(failed)} failed",
-                "results": results,
-                "thread_id": thread_id,
-                "total_processed": len(successful)
+                "success": True,
+                "message": f"Queued {len(accepted)} files, {len(rejected)} rejected",
+                "job_id": job.id,
+                "results": rejected,
+                "thread_id": thread_id
             },
-            status_code=200 if len(successful) > 0 else 400
+            status_code=202
         )
-    
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/jobs/{job_id}")
+async def get_ingestion_job(job_id: str, ingestion=Depends(get_ingestion_manager)):
+    """
+    Report progress of an ingestion job
+    (pages parsed, chunks embedded, vectors upserted, per-file status),
+    whichever worker is running it.
+    """
+    state = await ingestion.aget_state(job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return state
+
+
 @router.delete("/thread/{thread_id}")
 async def delete_thread_docs(thread_id: str):
     """
     Delete all documents associated with a specific thread from Pinecone.
     """
     try:
-        success, message = delete_thread_documents(thread_id)
+        success, message = await delete_thread_documents(thread_id)
         
         if success:
             return {"success": True, "message": message, "thread_id": thread_id}
@@ -1,39 +1,66 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Depends, BackgroundTasks
 from app.services.thread_service import (
-    create_thread, 
-    get_threads, 
-    get_thread_messages_for_api, 
-    delete_thread
+    acreate_thread, 
+    aget_threads, 
+    aget_thread_messages_for_api, 
+    adelete_thread,
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE
 )
+from app.dependencies import get_checkpointer
+from app.services.rag_service import delete_thread_documents
 
 router = APIRouter()
 
 # 1. Create a new thread
 # Final URL: http://localhost:8000/thread/create
 @router.post("/create")
-def create_thread_api(name: str = "New Chat"):
-    thread_id = create_thread(name)
+async def create_thread_api(name: str = "New Chat"):
+    thread_id = await acreate_thread(name)
     return {"thread_id": thread_id, "name": name}
 
-# 2. List all threads
-# Final URL: http://localhost:8000/thread/all
+# 2. List threads, newest first (keyset pagination)
+# Final URL: http://localhost:8000/thread/all?limit=50&before=<next_cursor>
 @router.get("/all")
-def list_threads_api():
-    return get_threads()
+async def list_threads_api(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None
+):
+    try:
+        return await aget_threads(limit, before, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-# 3. Get all messages for a specific thread
-# Final URL: http://localhost:8000/thread/{thread_id}/messages
+# 3. Get messages for a specific thread (latest page by default, chronological order)
+# Final URL: http://localhost:8000/thread/{thread_id}/messages?limit=50&before=<before_cursor>
 @router.get("/{thread_id}/messages")
-def get_thread_messages_api(thread_id: str):
-    messages = get_thread_messages_for_api(thread_id)
-    return {"thread_id": thread_id, "messages": messages}
+async def get_thread_messages_api(
+    thread_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None
+):
+    try:
+        return await aget_thread_messages_for_api(thread_id, limit, before, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 # 4. Delete a thread (NEW)
 # Final URL: http://localhost:8000/thread/{thread_id}
 @router.delete("/{thread_id}")
-def delete_thread_api(thread_id: str):
+async def delete_thread_api(
+    thread_id: str,
+    background_tasks: BackgroundTasks,
+    checkpointer=Depends(get_checkpointer)
+):
     try:
-        delete_thread(thread_id)
+        await adelete_thread(thread_id)
+        # Agent memory (checkpoints) goes with the thread
+        await checkpointer.adelete_thread(thread_id)
+        # Vectors are deleted after the response is sent
+        background_tasks.add_task(delete_thread_documents, thread_id)
         return {"success": True, "message": "Thread deleted successfully"}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
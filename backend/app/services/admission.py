@@ -0,0 +1,242 @@
+# backend/app/services/admission.py
+"""
+Admission control for chat turns (per worker process).
+
+- Rate limits: a token bucket per client and per thread. An empty bucket is
+  rejected at once with the time until the next token (429 + Retry-After).
+- Concurrency: at most CHAT_MAX_CONCURRENT_RUNS agent runs execute; further
+  turns wait in a FIFO queue of CHAT_MAX_QUEUED. A full queue is rejected at
+  once (429) instead of piling more LLM streams onto the worker; a turn that
+  waits longer than CHAT_QUEUE_TIMEOUT ends with {"code": "overloaded"}.
+
+`admit()` is called by the route before the response starts; `run()` wraps
+the turn once stream_chat_response holds the thread, so a turn waiting behind
+another turn on its thread does not hold a run slot. The queue wait is its own
+latency component (the "queued" event while waiting, "queue_ms" in the final
+"done" event). A turn that never gets to run() (busy thread, cancelled before
+it started) gives its place back with `release()`.
+"""
+import asyncio
+import logging
+import math
+import statistics
+import time
+from collections import OrderedDict, deque
+from contextlib import aclosing
+from typing import AsyncIterator, Deque, Optional
+
+from app.config import (
+    CHAT_MAX_CONCURRENT_RUNS,
+    CHAT_MAX_QUEUED,
+    CHAT_QUEUE_TIMEOUT,
+    CHAT_CLIENT_RATE_PER_MIN,
+    CHAT_CLIENT_BURST,
+    CHAT_THREAD_RATE_PER_MIN,
+    CHAT_THREAD_BURST,
+    RATE_LIMIT_MAX_KEYS,
+)
+from app.utils.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+CHAT_QUEUE_WAIT_SECONDS = Histogram("chat_queue_wait_seconds", "Time admitted turns waited for a run slot")
+CHAT_ADMISSION_REJECTED = Counter("chat_admission_rejected_total", "Turns rejected with 429", ("reason",))
+CHAT_QUEUE_TIMEOUTS = Counter("chat_queue_timeouts_total", "Turns that waited CHAT_QUEUE_TIMEOUT without a slot")
+
+# Recent queue waits / run durations kept for percentiles and Retry-After estimates
+_SAMPLES = 1000
+
+
+class AdmissionRejected(Exception):
+    """The turn was not admitted; retry after `retry_after` seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate_per_min: float, burst: int):
+        self.rate = rate_per_min / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0: one is available now)."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class AdmissionTicket:
+    """A queue place reserved by admit(); used up by run() or given back by release()."""
+
+    def __init__(self, thread_id: str, client: str):
+        self.thread_id = thread_id
+        self.client = client
+        self.admitted_at = time.monotonic()
+        self.queued = True
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrent: int = CHAT_MAX_CONCURRENT_RUNS,
+        max_queued: int = CHAT_MAX_QUEUED,
+        queue_timeout: float = CHAT_QUEUE_TIMEOUT,
+        client_rate: tuple = (CHAT_CLIENT_RATE_PER_MIN, CHAT_CLIENT_BURST),
+        thread_rate: tuple = (CHAT_THREAD_RATE_PER_MIN, CHAT_THREAD_BURST),
+        max_keys: int = RATE_LIMIT_MAX_KEYS,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.client_rate = client_rate
+        self.thread_rate = thread_rate
+        self.max_keys = max_keys
+        self.running = 0
+        # Admitted turns not running yet (including those still starting)
+        self.queued = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._buckets: "OrderedDict[tuple, TokenBucket]" = OrderedDict()
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "client_rate": 0, "thread_rate": 0}
+        self.timed_out = 0
+        self.queue_waits: Deque[float] = deque(maxlen=_SAMPLES)
+        self.run_seconds: Deque[float] = deque(maxlen=_SAMPLES)
+
+    # ---------- rate limits ----------
+
+    def _bucket(self, kind: str, key: str, rate: tuple) -> Optional[TokenBucket]:
+        if rate[0] <= 0:
+            return None
+        bucket = self._buckets.get((kind, key))
+        if bucket is None:
+            bucket = self._buckets[(kind, key)] = TokenBucket(*rate)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end((kind, key))
+        return bucket
+
+    def _retry_after_queue(self) -> float:
+        """Rough time until a queue place frees up: queued turns / run slots x typical run time."""
+        typical = statistics.median(self.run_seconds) if self.run_seconds else 5.0
+        return typical * (self.queued + 1) / max(1, self.max_concurrent)
+
+    def admit(self, thread_id: str, client: str) -> AdmissionTicket:
+        """Reserve a place for one turn or raise AdmissionRejected (nothing is consumed then)."""
+        if self.running + self.queued >= self.max_concurrent + self.max_queued:
+            self._reject("queue_full", self._retry_after_queue())
+
+        now = time.monotonic()
+        buckets = [
+            ("thread_rate", self._bucket("thread", thread_id, self.thread_rate)),
+            ("client_rate", self._bucket("client", client, self.client_rate)),
+        ]
+        for reason, bucket in buckets:
+            if bucket is not None:
+                wait = bucket.wait_time(now)
+                if wait > 0:
+                    self._reject(reason, wait)
+        for _, bucket in buckets:
+            if bucket is not None:
+                bucket.take()
+
+        self.admitted += 1
+        self.queued += 1
+        return AdmissionTicket(thread_id, client)
+
+    def _reject(self, reason: str, retry_after: float):
+        self.rejected[reason] += 1
+        CHAT_ADMISSION_REJECTED.inc(reason=reason)
+        raise AdmissionRejected(reason, max(1, math.ceil(retry_after)))
+
+    def release(self, ticket: AdmissionTicket):
+        """Free the queue place of `ticket` (once: later calls are no-ops)."""
+        if ticket.queued:
+            ticket.queued = False
+            self.queued -= 1
+
+    # ---------- concurrency ----------
+
+    async def _acquire(self, ticket: AdmissionTicket) -> float:
+        """Wait for a run slot (FIFO). Returns the queue wait in seconds."""
+        if self.running < self.max_concurrent and not self._waiters:
+            self.running += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+            except BaseException:
+                if waiter.done() and not waiter.cancelled():
+                    # The slot was handed over just as the wait ended: pass it on
+                    self._release()
+                elif waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                raise
+        wait = time.monotonic() - ticket.admitted_at
+        self.queue_waits.append(wait)
+        CHAT_QUEUE_WAIT_SECONDS.observe(wait)
+        return wait
+
+    def _release(self):
+        """Hand the slot to the next waiter, or free it."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.running -= 1
+
+    async def run(self, ticket: AdmissionTicket, events: AsyncIterator) -> AsyncIterator:
+        """
+        Yield `events` (stream_chat_response) once a run slot is free.
+        Adds "queued" {"position"} while waiting and "queue_ms" to the final "done".
+        """
+        async with aclosing(events):
+            try:
+                if self.running >= self.max_concurrent or self._waiters:
+                    yield "queued", {"position": len(self._waiters) + 1}
+                wait = await self._acquire(ticket)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                CHAT_QUEUE_TIMEOUTS.inc()
+                logger.warning(f"Chat turn for thread {ticket.thread_id} waited {self.queue_timeout}s in the queue")
+                yield "error", {"code": "overloaded", "message": "The server is busy, please try again."}
+                return
+            finally:
+                self.release(ticket)
+
+            started = time.monotonic()
+            try:
+                async for event, data in events:
+                    if event == "done":
+                        data = {**data, "queue_ms": round(wait * 1000)}
+                    yield event, data
+            finally:
+                self.run_seconds.append(time.monotonic() - started)
+                self._release()
+
+    def stats(self) -> dict:
+        waits = sorted(self.queue_waits)
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "queue_timeouts": self.timed_out,
+            "queue_wait_ms": {
+                "p50": round(waits[len(waits) // 2] * 1000, 1) if waits else None,
+                "p95": round(waits[int(0.95 * (len(waits) - 1))] * 1000, 1) if waits else None,
+                "max": round(waits[-1] * 1000, 1) if waits else None,
+            },
+        }
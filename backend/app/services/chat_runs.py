@@ -0,0 +1,348 @@
+# backend/app/services/chat_runs.py
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional, Union
+
+from app.config import (
+    SSE_HEARTBEAT_SECONDS,
+    SSE_RETRY_MS,
+    SSE_REPLAY_BUFFER,
+    SSE_RUN_TTL,
+    SSE_RESUME_GRACE,
+    RUN_STATE,
+    RUN_STATE_FLUSH_INTERVAL,
+    RUN_STATE_POLL_INTERVAL,
+)
+from app.db.async_sqlite import get_pool
+from app.utils.sse import sse_event, sse_comment, sse_retry, event_id
+
+logger = logging.getLogger(__name__)
+
+# Shared runs (RUN_STATE="sqlite"): the worker executing a run writes its events
+# every RUN_STATE_FLUSH_INTERVAL, so a client reconnecting through another worker
+# can follow it. A running run's row is touched at least every SSE_HEARTBEAT_SECONDS.
+INSERT_RUN_SQL = "INSERT OR IGNORE INTO chat_runs (id, thread_id, updated_at) VALUES (?, ?, ?)"
+INSERT_EVENT_SQL = "INSERT OR IGNORE INTO chat_run_events (run_id, seq, event, data) VALUES (?, ?, ?, ?)"
+UPDATE_RUN_SQL = "UPDATE chat_runs SET updated_at = ?, finished_at = ? WHERE id = ?"
+GET_RUN_SQL = "SELECT thread_id, updated_at, finished_at, remote_seen_at FROM chat_runs WHERE id = ?"
+GET_EVENTS_SQL = "SELECT seq, event, data FROM chat_run_events WHERE run_id = ? AND seq > ? ORDER BY seq"
+SEEN_REMOTELY_SQL = "UPDATE chat_runs SET remote_seen_at = ? WHERE id = ?"
+# Finished runs past SSE_RUN_TTL, and runs whose worker stopped touching them
+PRUNE_RUNS_SQL = "DELETE FROM chat_runs WHERE finished_at < ? OR (finished_at IS NULL AND updated_at < ?)"
+# A running run not touched for this long lost its worker (crash / restart)
+_RUN_LOST_AFTER = 3 * SSE_HEARTBEAT_SECONDS
+
+
+class ChatRun:
+    """
+    One agent run. Events are numbered from 1 and the most recent
+    SSE_REPLAY_BUFFER of them are kept, so a client can reconnect
+    with Last-Event-ID and continue without re-running the agent.
+    """
+
+    def __init__(self, thread_id: str, shared: bool = False):
+        self.id = str(uuid.uuid4())
+        self.thread_id = thread_id
+        self.events = deque(maxlen=SSE_REPLAY_BUFFER)  # (seq, event, data)
+        self.last_seq = 0
+        self.finished_at: Optional[float] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+        self._orphan_timer: Optional[asyncio.TimerHandle] = None
+        self._orphan_check: Optional[asyncio.Task] = None
+        # Shared runs: events not written to chat_run_events yet, and the last write
+        self.shared = shared
+        self.unsaved: List[tuple] = []
+        self.saved_at: Optional[float] = None
+        self.finish_saved = False
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def first_seq(self) -> int:
+        return self.events[0][0] if self.events else self.last_seq + 1
+
+    def append(self, event: str, data: dict):
+        self.last_seq += 1
+        self.events.append((self.last_seq, event, data))
+        if self.shared:
+            self.unsaved.append(self.events[-1])
+        self._notify()
+
+    def finish(self):
+        self.finished_at = time.time()
+        self._notify()
+
+    def _notify(self):
+        # Wake every subscriber waiting on the current event, then start a new one
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+class RemoteRun:
+    """A run executing in another worker, followed through chat_run_events."""
+
+    def __init__(self, run_id: str, thread_id: str):
+        self.id = run_id
+        self.thread_id = thread_id
+
+
+class ChatRunManager:
+    """
+    Runs chat turns in the background and fans their events out as SSE.
+
+    - The agent runs in its own task, independent of the HTTP connection.
+    - Subscribers replay buffered events after their Last-Event-ID, then follow live.
+    - Keep-alive comments are sent when nothing happened for SSE_HEARTBEAT_SECONDS.
+    - A run with no subscriber for SSE_RESUME_GRACE seconds is cancelled
+      (so a disconnected client stops LLM/tool work, but a quick reconnect resumes).
+    - With `shared` (RUN_STATE="sqlite") events are also written to the database;
+      a client that reconnects through another worker follows them from there,
+      and counts as a subscriber for the orphan check.
+    """
+
+    def __init__(self, shared: bool = RUN_STATE == "sqlite"):
+        self.runs: Dict[str, ChatRun] = {}
+        self.shared = shared
+        self._flusher: Optional[asyncio.Task] = None
+
+    def start(self, thread_id: str, events: AsyncIterator) -> ChatRun:
+        """Start a run from an async iterator of (event, data) pairs."""
+        self._prune()
+        run = ChatRun(thread_id, shared=self.shared)
+        self.runs[run.id] = run
+        run.task = asyncio.create_task(self._drive(run, events))
+        # Nobody may ever subscribe (client gone before the response started)
+        self._schedule_orphan_check(run)
+        if self.shared and (self._flusher is None or self._flusher.done()):
+            self._flusher = asyncio.create_task(self._flush_loop())
+        return run
+
+    def get(self, run_id: str) -> Optional[ChatRun]:
+        return self.runs.get(run_id)
+
+    async def aget(self, run_id: str) -> Optional[Union[ChatRun, RemoteRun]]:
+        """A run of this worker, else (shared runs) one executing in another worker."""
+        run = self.runs.get(run_id)
+        if run is not None or not self.shared:
+            return run
+        pool = await get_pool()
+        async with pool.read() as conn:
+            async with conn.execute(GET_RUN_SQL, (run_id,)) as cur:
+                row = await cur.fetchone()
+        return RemoteRun(run_id, row["thread_id"]) if row else None
+
+    async def shutdown(self):
+        tasks = [run.task for run in self.runs.values() if run.task and not run.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+            # Final events ("cancelled") of the runs stopped above
+            try:
+                await self._flush()
+            except Exception as e:
+                logger.warning(f"Could not save chat run events on shutdown: {e}")
+
+    async def subscribe(self, run: Union[ChatRun, RemoteRun], last_seq: int = 0):
+        """
+        Yield SSE frames for `run`, starting after `last_seq`.
+        Ends after the run's final event has been sent.
+        """
+        if isinstance(run, RemoteRun):
+            async for frame in self._follow_remote(run, last_seq):
+                yield frame
+            return
+
+        run.subscribers += 1
+        if run._orphan_timer:
+            run._orphan_timer.cancel()
+            run._orphan_timer = None
+        try:
+            yield sse_retry(SSE_RETRY_MS)
+            while True:
+                changed = run._changed
+
+                while last_seq < run.last_seq:
+                    # Checked before every event: the buffer can rotate while we are
+                    # suspended in a yield (slow client), not only before replay starts
+                    if last_seq + 1 < run.first_seq:
+                        # Requested events fell out of the replay buffer
+                        yield sse_event("error", {
+                            "code": "replay_unavailable",
+                            "message": f"Events after {last_seq} are no longer available",
+                        })
+                        return
+                    seq, event, data = run.events[last_seq + 1 - run.first_seq]
+                    yield sse_event(event, data, event_id(run.id, seq))
+                    last_seq = seq
+
+                if run.finished:
+                    return
+
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield sse_comment()
+        finally:
+            run.subscribers -= 1
+            if run.subscribers == 0 and not run.finished:
+                self._schedule_orphan_check(run)
+
+    async def _drive(self, run: ChatRun, events: AsyncIterator):
+        try:
+            async for event, data in events:
+                run.append(event, data)
+        except asyncio.CancelledError:
+            run.append("error", {"code": "cancelled", "message": "Response was cancelled."})
+            raise
+        except Exception as e:
+            logger.error(f"Chat run {run.id} failed: {e}")
+            run.append("error", {"code": "internal", "message": "Failed to generate a response."})
+        finally:
+            run.finish()
+
+    def _schedule_orphan_check(self, run: ChatRun):
+        loop = asyncio.get_running_loop()
+        run._orphan_timer = loop.call_later(SSE_RESUME_GRACE, self._cancel_if_orphaned, run)
+
+    def _cancel_if_orphaned(self, run: ChatRun):
+        run._orphan_timer = None
+        if run.subscribers == 0 and not run.finished and run.task:
+            if run.shared:
+                run._orphan_check = asyncio.ensure_future(self._cancel_unless_followed_remotely(run))
+                return
+            logger.info(f"No client for chat run {run.id} (thread {run.thread_id}), cancelling")
+            run.task.cancel()
+
+    async def _cancel_unless_followed_remotely(self, run: ChatRun):
+        try:
+            pool = await get_pool()
+            async with pool.read() as conn:
+                async with conn.execute(GET_RUN_SQL, (run.id,)) as cur:
+                    row = await cur.fetchone()
+            seen = row["remote_seen_at"] if row else None
+        except Exception as e:
+            logger.warning(f"Could not check remote clients of chat run {run.id}: {e}")
+            seen = None
+        if run.subscribers or run.finished:
+            return
+        if seen and time.time() - seen < SSE_RESUME_GRACE:
+            self._schedule_orphan_check(run)
+            return
+        logger.info(f"No client for chat run {run.id} (thread {run.thread_id}), cancelling")
+        run.task.cancel()
+
+    # ---------- shared state (RUN_STATE="sqlite") ----------
+
+    async def _flush(self):
+        """Write new events, new runs and finish times of shared runs in one transaction."""
+        now = time.time()
+        pending = [
+            run for run in self.runs.values()
+            if run.shared and (
+                run.saved_at is None or run.unsaved or (run.finished and not run.finish_saved)
+                or now - run.saved_at >= SSE_HEARTBEAT_SECONDS
+            )
+        ]
+        if not pending:
+            return
+        # Taken before the write: events appended meanwhile go to the next flush
+        batches = [(run, run.finished_at, run.unsaved) for run in pending]
+        for run in pending:
+            run.unsaved = []
+        try:
+            pool = await get_pool()
+            async with pool.write() as conn:
+                await conn.executemany(
+                    INSERT_RUN_SQL, [(run.id, run.thread_id, now) for run in pending if run.saved_at is None]
+                )
+                await conn.executemany(INSERT_EVENT_SQL, [
+                    (run.id, seq, event, json.dumps(data, ensure_ascii=False))
+                    for run, _, events in batches for seq, event, data in events
+                ])
+                await conn.executemany(UPDATE_RUN_SQL, [(now, finished_at, run.id) for run, finished_at, _ in batches])
+        except BaseException:
+            for run, _, events in batches:
+                run.unsaved[:0] = events
+            raise
+        for run, finished_at, _ in batches:
+            run.saved_at = now
+            run.finish_saved = finished_at is not None
+
+    async def _flush_loop(self):
+        pruned_at = 0.0
+        while True:
+            await asyncio.sleep(RUN_STATE_FLUSH_INTERVAL)
+            try:
+                await self._flush()
+                now = time.time()
+                if now - pruned_at >= SSE_RUN_TTL:
+                    pool = await get_pool()
+                    async with pool.write() as conn:
+                        await conn.execute(PRUNE_RUNS_SQL, (now - SSE_RUN_TTL, now - SSE_RUN_TTL - _RUN_LOST_AFTER))
+                    pruned_at = now
+            except Exception as e:
+                logger.warning(f"Could not save chat run events: {e}")
+
+    async def _follow_remote(self, run: RemoteRun, last_seq: int):
+        """SSE frames of a run executing in another worker, polled from chat_run_events."""
+        pool = await get_pool()
+        loop = asyncio.get_running_loop()
+        yield sse_retry(SSE_RETRY_MS)
+        last_frame, seen_at = loop.time(), None
+        while True:
+            if seen_at is None or loop.time() - seen_at >= SSE_RESUME_GRACE / 3:
+                # Tells the run's worker a client is still attached
+                async with pool.write() as conn:
+                    await conn.execute(SEEN_REMOTELY_SQL, (time.time(), run.id))
+                seen_at = loop.time()
+
+            async with pool.read() as conn:
+                async with conn.execute(GET_RUN_SQL, (run.id,)) as cur:
+                    row = await cur.fetchone()
+                # Read after the run row: once it shows finished_at, every event is written
+                async with conn.execute(GET_EVENTS_SQL, (run.id, last_seq)) as cur:
+                    events = await cur.fetchall()
+
+            if row is None:
+                yield sse_event("error", {
+                    "code": "replay_unavailable",
+                    "message": f"Events after {last_seq} are no longer available",
+                })
+                return
+            for seq, event, data in events:
+                yield sse_event(event, json.loads(data), event_id(run.id, seq))
+                last_seq = seq
+                last_frame = loop.time()
+            if row["finished_at"] is not None:
+                return
+            if time.time() - row["updated_at"] > _RUN_LOST_AFTER:
+                logger.warning(f"Chat run {run.id} stopped being updated by its worker")
+                yield sse_event("error", {"code": "internal", "message": "Failed to generate a response."})
+                return
+
+            if loop.time() - last_frame >= SSE_HEARTBEAT_SECONDS:
+                yield sse_comment()
+                last_frame = loop.time()
+            await asyncio.sleep(RUN_STATE_POLL_INTERVAL)
+
+    def _prune(self):
+        """Forget finished runs older than SSE_RUN_TTL."""
+        now = time.time()
+        expired = [
+            run_id for run_id, run in self.runs.items()
+            if run.finished and now - run.finished_at > SSE_RUN_TTL
+        ]
+        for run_id in expired:
+            del self.runs[run_id]
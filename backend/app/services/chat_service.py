@@ -1,17 +1,138 @@
+import asyncio
 import logging
-from app.graph.langgraph_setup import graph 
-from app.services.thread_service import save_message
-from langchain_core.messages import HumanMessage
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver 
+import time
+from contextlib import aclosing
+import anyio
+from app.config import CHAT_REQUEST_TIMEOUT, SSE_COALESCE_CHARS, SSE_COALESCE_INTERVAL, CHAT_TIMING_BREAKDOWN
+from app.services.thread_service import asave_message, aget_thread_messages_for_api, ThreadNotFoundError
+from app.services.response_cache import response_cache, context_fingerprint, chunk_response
+from app.services.thread_locks import thread_turn, ThreadBusyError
+from app.utils.metrics import Counter, Gauge, Histogram, start_timings, add_timing, timed
+from langchain_core.messages import HumanMessage, AIMessage
 
 logger = logging.getLogger(__name__)
 
-async def stream_chat_response(message: str, thread_id: str):
+# Sentinel pushed by the graph task once the run has finished
+_RUN_FINISHED = object()
+
+CHAT_TURN_SECONDS = Histogram(
+    "chat_turn_seconds", "Chat turn duration from thread lock to final event (queue wait included)", ("outcome",)
+)
+CHAT_TTFT_SECONDS = Histogram("chat_ttft_seconds", "Chat turn start to first token sent to the client")
+CHAT_STEP_SECONDS = Histogram(
+    "chat_step_seconds", "Time spent in each step of a chat turn (lock, history, save)", ("step",)
+)
+CHAT_TURNS_IN_FLIGHT = Gauge("chat_turns_in_flight", "Chat turns running in this worker")
+TOOL_CALLS = Counter("tool_calls_total", "Agent tool calls", ("tool", "outcome"))
+TOOL_SECONDS = Histogram("tool_call_seconds", "Agent tool call duration", ("tool",))
+
+
+def _step(name: str, seconds: float):
+    CHAT_STEP_SECONDS.observe(seconds, step=name)
+    add_timing(name, seconds)
+
+
+async def _run_graph(chatbot, inputs, config, events: asyncio.Queue):
+    """
+    Drive the graph inside its own task and hand its events to the response stream.
+    The whole run (LLM calls + tools) shares one deadline; any failure, including
+    the deadline, is passed to the consumer instead of being raised here.
+    """
+    async def pump():
+        async for event in chatbot.astream_events(inputs, config=config, version="v2"):
+            events.put_nowait(event)
+
+    try:
+        await asyncio.wait_for(pump(), timeout=CHAT_REQUEST_TIMEOUT)
+        events.put_nowait(_RUN_FINISHED)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        events.put_nowait(e)
+
+
+def _tool_finished(tool_started: dict, event: dict) -> str:
+    """
+    Count one finished tool call; returns its outcome. "error": the tool raised,
+    or returned a handled ToolException (a ToolMessage with status="error").
+    """
+    failed = event["event"] == "on_tool_error" or getattr(event["data"].get("output"), "status", None) == "error"
+    outcome = "error" if failed else "ok"
+    started = tool_started.pop(event["run_id"], None)
+    TOOL_CALLS.inc(tool=event["name"], outcome=outcome)
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        TOOL_SECONDS.observe(elapsed, tool=event["name"])
+        add_timing("tools", elapsed)
+    return outcome
+
+
+async def stream_chat_response(message: str, thread_id: str, chatbot, admission=None, ticket=None):
     """
     Stream chat response using LangGraph agent with tools.
     The agent will decide whether to use RAG or other tools.
+
+    `chatbot` is the graph compiled once at startup (app.state.chatbot)
+    with the long-lived checkpointer.
+    Repeated questions are answered from the response cache without running the graph.
+
+    Yields (event, data) pairs: "token", "tool_start", "tool_end", then one
+    final "done" or "error". Tokens are coalesced: under high token rates they
+    are sent at most every SSE_COALESCE_INTERVAL (or SSE_COALESCE_CHARS) as one event.
+
+    The graph runs in a separate task: if this stream is cancelled the run
+    (LLM + tools) is cancelled with it; if the run exceeds CHAT_REQUEST_TIMEOUT
+    it is stopped and the partial answer is kept.
+
+    Turns on the same thread run one after another, in this worker or any
+    other (app/services/thread_locks.py); a turn that waits longer than
+    THREAD_LOCK_WAIT ends with an error {"code": "busy"}.
+
+    With an admission `ticket` (app/services/admission.py) the turn waits for a
+    run slot only once it holds the thread.
+
+    Timings go to /metrics (app/utils/metrics.py); with CHAT_TIMING_BREAKDOWN
+    the "done" event also carries {"timings": {phase: ms}}.
     """
-    
+    timings = start_timings()
+    started = time.perf_counter()
+    outcome = "cancelled"
+    first_token = True
+    CHAT_TURNS_IN_FLIGHT.inc()
+    try:
+        async with thread_turn(thread_id):
+            _step("lock", time.perf_counter() - started)
+            events = _answer(message, thread_id, chatbot)
+            if ticket is not None:
+                events = admission.run(ticket, events)
+            async with aclosing(events) as events:
+                async for event, data in events:
+                    if event == "token" and first_token:
+                        first_token = False
+                        CHAT_TTFT_SECONDS.observe(time.perf_counter() - started)
+                    elif event == "done":
+                        outcome = "cached" if data.get("cached") else "done"
+                        if CHAT_TIMING_BREAKDOWN:
+                            timings["total"] = (time.perf_counter() - started) * 1000
+                            data = {**data, "timings": {k: round(v, 1) for k, v in timings.items()}}
+                    elif event == "error":
+                        outcome = data.get("code", "error")
+                    yield event, data
+    except ThreadBusyError:
+        outcome = "busy"
+        logger.warning(f"Previous turn still running, rejecting message for thread: {thread_id}")
+        yield "error", {"code": "busy", "message": "A previous message in this chat is still being answered."}
+    except ThreadNotFoundError:
+        outcome = "thread_not_found"
+        logger.warning(f"Thread deleted during a turn: {thread_id}")
+        yield "error", {"code": "thread_not_found", "message": "This chat no longer exists."}
+    finally:
+        CHAT_TURNS_IN_FLIGHT.dec()
+        CHAT_TURN_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
+
+
+async def _answer(message: str, thread_id: str, chatbot):
+    """One turn of stream_chat_response; the caller holds the thread."""
     config = {
         "configurable": {"thread_id": thread_id},
         "metadata": {"thread_id": thread_id, "run_name": "chat_stream"}
@@ -21,30 +142,125 @@ async def stream_chat_response(message: str, thread_id: str):
     input_message = HumanMessage(content=message)
     full_response = ""
 
-    # 1. Save User Message to DB
-    save_message(thread_id, "user", message)
-
-    # 2. Open Async Database Connection
-    async with AsyncSqliteSaver.from_conn_string("chatbot.db") as checkpointer:
-        
-        # 3. Compile the graph with checkpointer
-        chatbot = graph.compile(checkpointer=checkpointer)
-
-        # 4. Stream events
-        async for event in chatbot.astream_events(
-            {"messages": [input_message]}, 
-            config=config, 
-            version="v1"
-        ):
+    # 1. Cache lookup (context = the previous exchange in this thread; only
+    #    first turns are shared across threads, the rest stay in the thread)
+    with timed(CHAT_STEP_SECONDS, "history", step="history"):
+        previous = await aget_thread_messages_for_api(thread_id, limit=2)
+        cache_context = context_fingerprint(previous["messages"])
+        shared = not previous["messages"]
+        cached = await response_cache.lookup(message, cache_context, thread_id, shared=shared)
+
+    # 2. Save User Message to DB
+    with timed(CHAT_STEP_SECONDS, "save", step="save"):
+        await asave_message(thread_id, "user", message)
+
+    if cached is not None:
+        logger.info(f"Response cache hit for thread: {thread_id}")
+        for piece in chunk_response(cached):
+            yield "token", {"text": piece}
+
+        # Keep the agent's memory in step with what the user saw
+        await chatbot.aupdate_state(
+            config,
+            {"messages": [input_message, AIMessage(content=cached)]},
+            as_node="summarize",
+        )
+        with timed(CHAT_STEP_SECONDS, "save", step="save"):
+            await asave_message(thread_id, "assistant", cached)
+        yield "done", {"cached": True, "tools": []}
+        return
+
+    # 3. Stream events from the shared compiled graph
+    tools_used = []
+    tool_failed = False  # a tool returned an error: the answer is not worth caching
+    tool_started = {}  # run_id -> perf_counter at on_tool_start
+    completed = False
+    error = None
+    pending = ""  # tokens received but not sent yet (coalescing)
+    loop = asyncio.get_running_loop()
+    last_flush = 0.0
+    events: asyncio.Queue = asyncio.Queue()
+    run = asyncio.create_task(
+        _run_graph(chatbot, {"messages": [input_message]}, config, events)
+    )
+    try:
+        while True:
+            if pending and (len(pending) >= SSE_COALESCE_CHARS
+                            or loop.time() - last_flush >= SSE_COALESCE_INTERVAL):
+                yield "token", {"text": pending}
+                pending, last_flush = "", loop.time()
+
+            if not events.empty():
+                event = events.get_nowait()
+            elif pending:
+                # Hold the pending tokens until the interval is up, unless more arrive
+                try:
+                    event = await asyncio.wait_for(
+                        events.get(), timeout=last_flush + SSE_COALESCE_INTERVAL - loop.time()
+                    )
+                except asyncio.TimeoutError:
+                    continue
+            else:
+                event = await events.get()
+
+            if event is _RUN_FINISHED:
+                completed = True
+                break
+            if isinstance(event, asyncio.TimeoutError):
+                logger.warning(f"Chat run exceeded {CHAT_REQUEST_TIMEOUT}s for thread: {thread_id}")
+                full_response += "\n\n⚠️ Response timed out."
+                error = {"code": "timeout", "message": "Response timed out."}
+                break
+            if isinstance(event, Exception):
+                logger.error(f"Chat run failed for thread {thread_id}: {event}")
+                error = {"code": "internal", "message": "Failed to generate a response."}
+                break
+
             kind = event["event"]
-            
-            if kind == "on_chat_model_stream":
+
+            if kind in ("on_tool_start", "on_tool_end"):
+                if pending:
+                    yield "token", {"text": pending}
+                    pending, last_flush = "", loop.time()
+                if kind == "on_tool_start":
+                    tools_used.append(event["name"])
+                    tool_started[event["run_id"]] = time.perf_counter()
+                    yield "tool_start", {"id": event["run_id"], "name": event["name"]}
+                else:
+                    if _tool_finished(tool_started, event) == "error":
+                        tool_failed = True
+                    yield "tool_end", {"id": event["run_id"], "name": event["name"]}
+            elif kind == "on_tool_error":
+                tool_failed = True
+                _tool_finished(tool_started, event)
+
+            # Only the agent's tokens go to the client (not the summarizer's)
+            if kind == "on_chat_model_stream" and event.get("metadata", {}).get("langgraph_node") == "agent":
                 chunk = event["data"]["chunk"]
                 content = chunk.content if hasattr(chunk, "content") else str(chunk)
-                
+
                 if content:
                     full_response += content
-                    yield content
+                    pending += content
+    except (asyncio.CancelledError, GeneratorExit):
+        logger.info(f"Chat stream closed, cancelling chat run for thread: {thread_id}")
+        raise
+    finally:
+        if not run.done():
+            run.cancel()
+        # 4. Save the (possibly partial) AI Response to DB, even while being cancelled
+        if full_response or completed:
+            with anyio.CancelScope(shield=True), timed(CHAT_STEP_SECONDS, "save", step="save"):
+                await asave_message(thread_id, "assistant", full_response)
+
+    if pending:
+        yield "token", {"text": pending}
+
+    if error:
+        yield "error", error
+        return
 
-    # 5. Save the Full AI Response to DB
-    save_message(thread_id, "assistant", full_response)
\ No newline at end of file
+    # 5. Remember the answer for identical questions in the same context
+    if not tool_failed:
+        await response_cache.store(message, cache_context, thread_id, full_response, tools_used, shared=shared)
+    yield "done", {"cached": False, "tools": tools_used}
@@ -0,0 +1,135 @@
+# backend/app/services/document_manifest.py
+"""
+Local record of what was indexed for each thread.
+
+One row per (thread, file) with its chunk count; vector ids are rebuilt from
+it with document_parser.chunk_id, so deleting a thread's vectors never needs
+a similarity query to discover them.
+
+Completed uploads also keep the file digest and one digest per chunk, so a
+re-upload can skip an unchanged file or only re-index the chunks that changed.
+"""
+import asyncio
+from typing import List, Optional
+
+from app.db.async_sqlite import get_pool
+from app.services.document_parser import chunk_id
+from app.services.embedding_pipeline import delete_vectors
+from app.services.keyword_index import aforget_thread_chunks
+
+# A re-upload with fewer chunks keeps the larger count so stale ids still get deleted.
+# The digests are cleared until the upload completes (a failed one is fully re-checked).
+RECORD_DOCUMENT_SQL = """
+INSERT INTO document_manifest (thread_id, filename, chunk_count) VALUES (?, ?, ?)
+ON CONFLICT (thread_id, filename) DO UPDATE SET
+    chunk_count = MAX(chunk_count, excluded.chunk_count),
+    content_hash = NULL,
+    chunk_hashes = NULL,
+    indexed_at = CURRENT_TIMESTAMP
+"""
+FINISH_DOCUMENT_SQL = """
+UPDATE document_manifest SET chunk_count=?, content_hash=?, chunk_hashes=?, indexed_at=CURRENT_TIMESTAMP
+WHERE thread_id=? AND filename=?
+"""
+SELECT_DOCUMENT_SQL = """
+SELECT chunk_count, content_hash, chunk_hashes FROM document_manifest WHERE thread_id=? AND filename=?
+"""
+SELECT_DOCUMENTS_SQL = "SELECT filename, chunk_count FROM document_manifest WHERE thread_id=?"
+DELETE_DOCUMENTS_SQL = "DELETE FROM document_manifest WHERE thread_id=?"
+# Threads deleted while their vectors could not be removed
+ORPHANED_THREADS_SQL = """
+SELECT DISTINCT d.thread_id FROM document_manifest d
+WHERE NOT EXISTS (SELECT 1 FROM threads t WHERE t.id = d.thread_id)
+"""
+
+
+async def arecord_document(thread_id: str, filename: str, chunk_count: int):
+    pool = await get_pool()
+    async with pool.write() as conn:
+        await conn.execute(RECORD_DOCUMENT_SQL, (thread_id, filename, chunk_count))
+
+
+async def afinish_document(thread_id: str, filename: str, chunk_count: int, content_hash: str, digests: List[bytes]):
+    """Mark an upload complete: exact chunk count plus the digests a re-upload is compared with."""
+    pool = await get_pool()
+    async with pool.write() as conn:
+        await conn.execute(FINISH_DOCUMENT_SQL, (chunk_count, content_hash, b"".join(digests), thread_id, filename))
+
+
+async def aget_document(thread_id: str, filename: str):
+    """(chunk_count, content_hash, [chunk digest]) of a file, or None if it was never indexed.
+    Hash and digests are None unless the last upload completed."""
+    pool = await get_pool()
+    async with pool.read() as conn:
+        async with conn.execute(SELECT_DOCUMENT_SQL, (thread_id, filename)) as cursor:
+            row = await cursor.fetchone()
+    if row is None:
+        return None
+    blob = row["chunk_hashes"]
+    digests = None if blob is None else [bytes(blob[i:i + 16]) for i in range(0, len(blob), 16)]
+    return row["chunk_count"], row["content_hash"], digests
+
+
+async def athread_documents(thread_id: str):
+    """[(filename, chunk_count)] indexed for a thread."""
+    pool = await get_pool()
+    async with pool.read() as conn:
+        async with conn.execute(SELECT_DOCUMENTS_SQL, (thread_id,)) as cursor:
+            return [(row["filename"], row["chunk_count"]) for row in await cursor.fetchall()]
+
+
+async def aforget_thread_documents(thread_id: str):
+    pool = await get_pool()
+    async with pool.write() as conn:
+        await conn.execute(DELETE_DOCUMENTS_SQL, (thread_id,))
+
+
+async def aorphaned_thread_ids():
+    pool = await get_pool()
+    async with pool.read() as conn:
+        async with conn.execute(ORPHANED_THREADS_SQL) as cursor:
+            return [row["thread_id"] for row in await cursor.fetchall()]
+
+
+def vector_ids(thread_id: str, documents):
+    """Every vector id for the given [(filename, chunk_count)]."""
+    for filename, chunk_count in documents:
+        for i in range(chunk_count):
+            yield chunk_id(thread_id, filename, i)
+
+
+async def delete_thread_vectors(thread_id: str, index) -> Optional[int]:
+    """
+    Delete every vector of a thread from `index`, its keyword index rows and
+    its manifest rows.
+
+    Ids are rebuilt from the manifest and deleted in batched, concurrent calls.
+    Threads indexed before the manifest existed fall back to listing ids by
+    their "{thread_id}_" prefix (serverless indexes) or a metadata-filtered
+    delete (pod-based indexes).
+    Returns the number of ids deleted, or None when deleted by filter.
+    """
+    documents = await athread_documents(thread_id)
+    if documents:
+        deleted = await delete_vectors(vector_ids(thread_id, documents), index)
+    else:
+        deleted = await _delete_by_prefix(thread_id, index)
+    await aforget_thread_chunks(thread_id)
+    await aforget_thread_documents(thread_id)
+    return deleted
+
+
+async def _delete_by_prefix(thread_id: str, index) -> Optional[int]:
+    def list_ids():
+        ids = []
+        for page in index.list(prefix=f"{thread_id}_"):
+            ids.extend(page)
+        return ids
+
+    try:
+        ids = await asyncio.to_thread(list_ids)
+    except Exception:
+        # Listing by prefix is serverless-only; pod indexes can delete by filter
+        await asyncio.to_thread(index.delete, filter={"thread_id": thread_id})
+        return None
+    return await delete_vectors(ids, index)
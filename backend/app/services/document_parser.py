@@ -0,0 +1,380 @@
+# backend/app/services/document_parser.py
+"""
+CPU-bound document parsing.
+Runs inside the ingestion process pool, so keep imports here light
+(no Pinecone / embedding clients).
+
+Supported upload types (PDF, DOCX, TXT, Markdown, HTML, CSV) are registered in
+FORMATS and looked up by extension or MIME type. Every format is read as
+numbered pages of text; formats without pages are a single page 0.
+
+PDFs are read from an open file (pypdf would otherwise load the whole file
+into memory) and extracted a window of pages at a time; chunks never span
+pages, so windows chunk exactly like the whole document.
+"""
+import csv
+import hashlib
+import io
+import os
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional, Tuple
+from xml.etree import ElementTree
+
+from langchain_core.documents import Document
+from langchain_text_splitters import Language, RecursiveCharacterTextSplitter
+
+from app.config import INGEST_PAGE_WINDOW
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+# Text splitter for chunking documents
+text_splitter = RecursiveCharacterTextSplitter(
+    chunk_size=CHUNK_SIZE,
+    chunk_overlap=CHUNK_OVERLAP,
+    length_function=len,
+)
+
+
+def chunk_id(thread_id: str, filename: str, index: int) -> str:
+    """Deterministic vector id; the document manifest relies on this scheme."""
+    return f"{thread_id}_{filename}_{index}"
+
+
+def chunk_hash(text: str) -> bytes:
+    """Embedding cache key of a chunk: depends on its text only."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def chunk_digest(record: dict) -> bytes:
+    """What was upserted under a chunk id (text + page), to detect changed chunks on re-upload."""
+    page = str(record["metadata"].get("page", 0)).encode()
+    return hashlib.blake2b(record["hash"] + page, digest_size=16).digest()
+
+
+def file_digest(path: str) -> str:
+    """Hash of the file bytes and the chunking settings (different settings give different chunks)."""
+    digest = hashlib.sha256(f"{CHUNK_SIZE}:{CHUNK_OVERLAP}\n".encode())
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# PDFs open in this process, reused across page windows: opening one indexes
+# the whole page tree (~3.5 KB per page), which per window would be quadratic
+_MAX_OPEN_READERS = 4
+# A reader not used for this long belongs to a job that ended early (page limit, error)
+_READER_IDLE_SECONDS = 60
+_readers: "OrderedDict[tuple, tuple]" = OrderedDict()  # file key -> (file, reader, last used)
+_readers_lock = threading.Lock()
+
+
+def _file_key(path: str):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return path, stat.st_size, stat.st_mtime_ns
+
+
+def _open_pdf(path: str):
+    # pypdf (and its crypto provider) is imported with the first PDF, not with the upload route
+    from pypdf import PdfReader
+
+    key = _file_key(path)
+    if key is None:
+        raise FileNotFoundError(path)
+    now = time.monotonic()
+    with _readers_lock:
+        # Uploads are deleted once processed; drop readers of files that are gone or idle
+        for stale in [k for k, (_, _, used) in _readers.items()
+                      if k != key and (_file_key(k[0]) != k or now - used > _READER_IDLE_SECONDS)]:
+            _readers.pop(stale)[0].close()
+        if key in _readers:
+            f, reader, _ = _readers[key]
+            _readers[key] = (f, reader, now)
+            _readers.move_to_end(key)
+            return reader
+        f = open(path, "rb")
+        _readers[key] = (f, PdfReader(f), now)
+        while len(_readers) > _MAX_OPEN_READERS:
+            _readers.popitem(last=False)[1][0].close()
+        return _readers[key][1]
+
+
+def _close_pdf(path: str):
+    with _readers_lock:
+        for key in [k for k in _readers if k[0] == path]:
+            _readers.pop(key)[0].close()
+
+
+def pdf_page_count(path: str) -> int:
+    """Page count from the page tree only (no page content is read)."""
+    return len(_open_pdf(path).pages)
+
+
+def _pdf_pages(path: str, first_page: int, last_page: int):
+    reader = _open_pdf(path)
+    page_count = len(reader.pages)
+    try:
+        # Same text as PyPDFLoader ("plain" extraction, stripped)
+        pages = [(page, reader.pages[page].extract_text().strip()) for page in range(first_page, min(last_page, page_count))]
+    finally:
+        # Drop parsed objects (content streams, fonts) of this window, even if a page failed
+        reader.resolved_objects.clear()
+    if last_page >= page_count:
+        _close_pdf(path)
+    return pages
+
+
+# ---------------------------------------------------------------------------
+# Single-section formats: the whole file is one "page" (page 0)
+# ---------------------------------------------------------------------------
+
+def _read_text(path: str) -> str:
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return data.decode("cp1252", errors="replace")
+
+
+class _HTMLText(HTMLParser):
+    """Visible text of an HTML page, one line per block element."""
+
+    SKIP = {"script", "style", "noscript", "template", "head"}
+    BLOCKS = {
+        "p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section",
+        "article", "header", "footer", "blockquote", "pre", "table", "ul", "ol", "dd", "dt",
+    }
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self.skipping += 1
+        elif tag in self.BLOCKS:
+            self.parts.append("\n")
+        elif tag in ("td", "th"):
+            self.parts.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self.skipping = max(0, self.skipping - 1)
+        elif tag in self.BLOCKS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(data)
+
+    def text(self) -> str:
+        lines = (" ".join(line.split()) for line in "".join(self.parts).splitlines())
+        return "\n".join(line for line in lines if line)
+
+
+def _html_text(path: str) -> str:
+    parser = _HTMLText()
+    parser.feed(_read_text(path))
+    parser.close()
+    return parser.text()
+
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def _docx_text(path: str) -> str:
+    """Paragraph text of a .docx (body XML streamed, so large documents stay cheap)."""
+    paragraphs = []
+    with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as xml:
+        for _, elem in ElementTree.iterparse(xml):
+            if elem.tag != _W + "p":
+                continue
+            parts = []
+            for node in elem.iter():
+                if node.tag == _W + "t" and node.text:
+                    parts.append(node.text)
+                elif node.tag == _W + "tab":
+                    parts.append("\t")
+                elif node.tag in (_W + "br", _W + "cr"):
+                    parts.append("\n")
+            text = "".join(parts).strip()
+            if text:
+                paragraphs.append(text)
+            elem.clear()
+    return "\n\n".join(paragraphs)
+
+
+def _csv_text(path: str) -> str:
+    """One line per row, each value labelled with its column header."""
+    text = _read_text(path)
+    try:
+        dialect = csv.Sniffer().sniff(text[:8192], delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+    rows = csv.reader(io.StringIO(text), dialect)
+    header = next(rows, [])
+    lines = []
+    for row in rows:
+        values = [f"{name}: {value}" for name, value in zip(header, row) if value.strip()]
+        if values:
+            lines.append(", ".join(values))
+    return "\n".join(lines)
+
+
+def _one_page(path: str) -> int:
+    return 1
+
+
+def _single_page(extract):
+    def pages(path: str, first_page: int, last_page: int):
+        return [(0, extract(path).strip())] if first_page == 0 < last_page else []
+    return pages
+
+
+# ---------------------------------------------------------------------------
+# Format registry
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class DocumentFormat:
+    """
+    A supported upload type. `count_pages(path)` and
+    `extract_pages(path, first_page, last_page) -> [(page, text)]` run in the
+    ingestion process pool; single-section formats have exactly one page.
+    """
+    name: str
+    extensions: Tuple[str, ...]
+    mime_types: Tuple[str, ...]
+    count_pages: Callable[[str], int]
+    extract_pages: Callable[[str, int, int], List[Tuple[int, str]]]
+    magic: Optional[bytes] = None      # required leading bytes; None means plain text
+    language: Optional[Language] = None  # split on this language's structure (e.g. headings)
+
+    def looks_valid(self, head: bytes) -> bool:
+        """Cheap content check on the first bytes of an upload."""
+        if self.magic is not None:
+            return head.startswith(self.magic)
+        return b"\x00" not in head
+
+
+FORMATS: Dict[str, DocumentFormat] = {}
+_BY_EXTENSION: Dict[str, DocumentFormat] = {}
+_BY_MIME: Dict[str, DocumentFormat] = {}
+
+
+def register_format(fmt: DocumentFormat):
+    FORMATS[fmt.name] = fmt
+    _BY_EXTENSION.update((ext, fmt) for ext in fmt.extensions)
+    _BY_MIME.update((mime, fmt) for mime in fmt.mime_types)
+
+
+def detect_format(filename: str, content_type: Optional[str] = None) -> Optional[DocumentFormat]:
+    """Format of an upload by file extension, else by MIME type. None if unsupported."""
+    fmt = _BY_EXTENSION.get(os.path.splitext(filename or "")[1].lower())
+    if fmt is None and content_type:
+        fmt = _BY_MIME.get(content_type.split(";")[0].strip().lower())
+    return fmt
+
+
+register_format(DocumentFormat(
+    "pdf", (".pdf",), ("application/pdf",), pdf_page_count, _pdf_pages, magic=b"%PDF-",
+))
+register_format(DocumentFormat(
+    "docx", (".docx",), ("application/vnd.openxmlformats-officedocument.wordprocessingml.document",),
+    _one_page, _single_page(_docx_text), magic=b"PK\x03\x04",
+))
+register_format(DocumentFormat(
+    "txt", (".txt", ".text", ".log"), ("text/plain",), _one_page, _single_page(_read_text),
+))
+register_format(DocumentFormat(
+    "markdown", (".md", ".markdown"), ("text/markdown", "text/x-markdown"), _one_page, _single_page(_read_text),
+    language=Language.MARKDOWN,
+))
+register_format(DocumentFormat(
+    "html", (".html", ".htm"), ("text/html", "application/xhtml+xml"), _one_page, _single_page(_html_text),
+))
+register_format(DocumentFormat(
+    "csv", (".csv",), ("text/csv", "application/csv"), _one_page, _single_page(_csv_text),
+))
+
+SUPPORTED_EXTENSIONS = tuple(_BY_EXTENSION)
+
+_splitters: Dict[str, RecursiveCharacterTextSplitter] = {}
+
+
+def _splitter(fmt: DocumentFormat) -> RecursiveCharacterTextSplitter:
+    if fmt.language is None:
+        return text_splitter
+    if fmt.name not in _splitters:
+        _splitters[fmt.name] = RecursiveCharacterTextSplitter.from_language(
+            fmt.language,
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            length_function=len,
+        )
+    return _splitters[fmt.name]
+
+
+def page_count(path: str, fmt: str = "pdf") -> int:
+    return FORMATS[fmt].count_pages(path)
+
+
+def parse_pages(
+    path: str, filename: str, thread_id: str, first_page: int, last_page: int, first_index: int, fmt: str = "pdf"
+):
+    """
+    Extract pages [first_page, last_page) of a document, split them into
+    chunks and build upsert records numbered from `first_index`. Returns the records.
+    """
+    document_format = FORMATS[fmt]
+    documents = [
+        Document(page_content=text, metadata={"page": page})
+        for page, text in document_format.extract_pages(path, first_page, last_page)
+    ]
+    chunks = _splitter(document_format).split_documents(documents)
+
+    return [
+        {
+            # Create Unique ID for this chunk
+            "id": chunk_id(thread_id, filename, i),
+            "text": doc.page_content,
+            "hash": chunk_hash(doc.page_content),
+            "metadata": {
+                "text": doc.page_content,
+                "source": filename,
+                "thread_id": thread_id,
+                "chunk_index": i,
+                "page": doc.metadata.get("page", 0)
+            }
+        }
+        for i, doc in enumerate(chunks, start=first_index)
+    ]
+
+
+def iter_records(path: str, filename: str, thread_id: str, fmt: str = "pdf", window: int = INGEST_PAGE_WINDOW):
+    """Upsert records of a whole document, extracted `window` pages at a time."""
+    pages = page_count(path, fmt)
+    index = 0
+    for first_page in range(0, pages, window):
+        records = parse_pages(path, filename, thread_id, first_page, first_page + window, index, fmt)
+        index += len(records)
+        yield from records
+
+
+def parse_document(path: str, filename: str, thread_id: str, fmt: str = "pdf"):
+    """
+    Load a document, split it into chunks and build upsert records.
+    Returns (page_count, records).
+    """
+    return page_count(path, fmt), list(iter_records(path, filename, thread_id, fmt))
@@ -0,0 +1,77 @@
+# backend/app/services/embedding_cache.py
+"""
+Persistent embedding cache in chatbot.db.
+
+Vectors are keyed by (embedding model, chunk hash), where the chunk hash is
+document_parser.chunk_hash of the chunk text. The same text is therefore
+embedded once per model, whatever thread, file or re-upload it comes from.
+Vectors are stored as float32 bytes; least recently used rows are evicted
+beyond EMBED_CACHE_MAX_ENTRIES.
+"""
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from app.db.async_sqlite import get_pool
+
+UPSERT_EMBEDDING_SQL = """
+INSERT INTO embedding_cache (model, chunk_hash, vector) VALUES (?, ?, ?)
+ON CONFLICT (model, chunk_hash) DO UPDATE SET
+    vector = excluded.vector,
+    last_used_at = CURRENT_TIMESTAMP
+"""
+COUNT_EMBEDDINGS_SQL = "SELECT COUNT(*) FROM embedding_cache"
+# Ties on last_used_at (same second) are broken arbitrarily
+EVICT_EMBEDDINGS_SQL = """
+DELETE FROM embedding_cache WHERE (model, chunk_hash) IN (
+    SELECT model, chunk_hash FROM embedding_cache ORDER BY last_used_at LIMIT ?
+)
+"""
+
+
+async def aget_embeddings(model: str, hashes: List[bytes]) -> Dict[bytes, List[float]]:
+    """Cached vectors for the given chunk hashes (misses are absent). Marks hits as used."""
+    unique = list(dict.fromkeys(hashes))
+    if not unique:
+        return {}
+    placeholders = ",".join("?" * len(unique))
+
+    pool = await get_pool()
+    async with pool.read() as conn:
+        async with conn.execute(
+            f"SELECT chunk_hash, vector FROM embedding_cache WHERE model=? AND chunk_hash IN ({placeholders})",
+            (model, *unique),
+        ) as cursor:
+            rows = await cursor.fetchall()
+    found = {bytes(row["chunk_hash"]): np.frombuffer(row["vector"], dtype=np.float32).tolist() for row in rows}
+
+    if found:
+        async with pool.write() as conn:
+            await conn.execute(
+                f"UPDATE embedding_cache SET last_used_at=CURRENT_TIMESTAMP "
+                f"WHERE model=? AND chunk_hash IN ({','.join('?' * len(found))})",
+                (model, *found),
+            )
+    return found
+
+
+async def aput_embeddings(model: str, items: Iterable[Tuple[bytes, List[float]]]):
+    rows = [(model, h, np.asarray(v, dtype=np.float32).tobytes()) for h, v in items]
+    if not rows:
+        return
+    pool = await get_pool()
+    async with pool.write() as conn:
+        await conn.executemany(UPSERT_EMBEDDING_SQL, rows)
+
+
+async def aprune_embeddings(max_entries: int) -> int:
+    """Evict least recently used vectors beyond `max_entries`. Returns the number evicted."""
+    pool = await get_pool()
+    async with pool.write() as conn:
+        async with conn.execute(COUNT_EMBEDDINGS_SQL) as cursor:
+            count = (await cursor.fetchone())[0]
+        excess = count - max_entries
+        if excess <= 0:
+            return 0
+        await conn.execute(EVICT_EMBEDDINGS_SQL, (excess,))
+        return excess
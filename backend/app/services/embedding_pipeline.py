@@ -0,0 +1,210 @@
+# backend/app/services/embedding_pipeline.py
+import asyncio
+import logging
+import random
+from itertools import islice
+from typing import AsyncIterable, Callable, Iterable, Optional, Union
+
+from app.config import (
+    EMBED_BATCH_SIZE,
+    EMBED_CONCURRENCY,
+    EMBED_MAX_RETRIES,
+    EMBED_RETRY_BACKOFF,
+    VECTOR_DELETE_BATCH_SIZE,
+    VECTOR_DELETE_CONCURRENCY,
+)
+from app.services.embedding_cache import aget_embeddings, aput_embeddings
+from app.utils.metrics import Counter, Histogram, timed
+
+logger = logging.getLogger(__name__)
+
+# Shared with rag_service, which times the other stages (hash, parse, index, finish)
+INGEST_STAGE_SECONDS = Histogram("ingest_stage_seconds", "Document ingestion time per stage and batch", ("stage",))
+EMBED_RETRIES = Counter("embed_retries_total", "Retried embedding / vector store calls", ("call",))
+
+
+def _batched(records: Iterable[dict], batch_size: int):
+    """Yield lists of at most `batch_size` records."""
+    iterator = iter(records)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+async def _with_retry(func, *args, retries: int, backoff: float, what: str, **kwargs):
+    """
+    Run a blocking call in a worker thread, retrying with exponential backoff + jitter.
+    """
+    attempt = 0
+    while True:
+        try:
+            return await asyncio.to_thread(func, *args, **kwargs)
+        except Exception as e:
+            attempt += 1
+            if attempt > retries:
+                raise
+            delay = backoff * (2 ** (attempt - 1)) * (1 + random.random())
+            EMBED_RETRIES.inc(call=what)
+            logger.warning(f"{what} failed ({e}), retry {attempt}/{retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+async def embed_and_upsert(
+    records: Union[Iterable[dict], AsyncIterable[dict]],
+    embedder,
+    index,
+    batch_size: int = EMBED_BATCH_SIZE,
+    concurrency: int = EMBED_CONCURRENCY,
+    max_retries: int = EMBED_MAX_RETRIES,
+    retry_backoff: float = EMBED_RETRY_BACKOFF,
+    on_batch_embedded: Optional[Callable[[int], None]] = None,
+    on_batch_done: Optional[Callable[[int], None]] = None,
+    cache_model: Optional[str] = None,
+    on_batch_cached: Optional[Callable[[int], None]] = None,
+) -> int:
+    """
+    Embed chunks in batches and upsert each batch as soon as it is embedded.
+
+    `records` is an iterable of {"id", "text", "metadata"} dicts, or an async
+    iterable (e.g. pages parsed while earlier ones are embedded); an async source
+    is read only as fast as batches are taken, at most `concurrency` batches ahead.
+    Up to `concurrency` batches are in flight at once; each one makes a single
+    `embedder.embed_documents()` call followed by a single `index.upsert()` call.
+    Only the in-flight (and queued) batches are held in memory.
+    `on_batch_embedded` / `on_batch_done` are called with the batch size after
+    the embedding and after the upsert respectively (used for progress reporting).
+
+    With `cache_model`, records carrying a "hash" (document_parser.chunk_hash)
+    take their vector from the embedding cache; only misses are embedded, each
+    distinct text once, and the new vectors are cached. `on_batch_cached` gets
+    the number of cache hits per batch.
+
+    Returns the number of vectors upserted.
+    """
+    batch_size = max(1, batch_size)
+    concurrency = max(1, concurrency)
+    upserted = 0
+    tasks = []
+
+    if hasattr(records, "__aiter__"):
+        queue = asyncio.Queue(maxsize=concurrency)
+
+        async def feed():
+            batch = []
+            async for record in records:
+                batch.append(record)
+                if len(batch) == batch_size:
+                    await queue.put(batch)
+                    batch = []
+            if batch:
+                await queue.put(batch)
+            for _ in range(concurrency):
+                await queue.put(None)
+
+        tasks.append(asyncio.create_task(feed()))
+        next_batch = queue.get
+    else:
+        batches = _batched(records, batch_size)
+
+        async def next_batch():
+            # All workers share one generator; next() never awaits, so this is safe
+            return next(batches, None)
+
+    async def worker():
+        nonlocal upserted
+        while (batch := await next_batch()) is not None:
+            vectors = await _embed_batch(batch)
+            if on_batch_embedded:
+                on_batch_embedded(len(batch))
+
+            payload = [
+                {"id": r["id"], "values": values, "metadata": r["metadata"]}
+                for r, values in zip(batch, vectors)
+            ]
+            with timed(INGEST_STAGE_SECONDS, stage="upsert"):
+                await _with_retry(
+                    index.upsert, vectors=payload,
+                    retries=max_retries, backoff=retry_backoff, what="Upsert batch",
+                )
+
+            upserted += len(payload)
+            if on_batch_done:
+                on_batch_done(len(payload))
+
+    async def _embed_batch(batch):
+        if not cache_model:
+            with timed(INGEST_STAGE_SECONDS, stage="embed"):
+                return await _with_retry(
+                    embedder.embed_documents, [r["text"] for r in batch],
+                    retries=max_retries, backoff=retry_backoff, what="Embedding batch",
+                )
+
+        hashes = [r.get("hash") for r in batch]
+        cached = await aget_embeddings(cache_model, [h for h in hashes if h is not None])
+        if on_batch_cached and cached:
+            on_batch_cached(sum(1 for h in hashes if h in cached))
+
+        # Embed each missing text once (a batch may repeat a chunk)
+        missing = {}
+        for r, h in zip(batch, hashes):
+            if h is None or h not in cached:
+                missing.setdefault(h if h is not None else id(r), r["text"])
+        if missing:
+            with timed(INGEST_STAGE_SECONDS, stage="embed"):
+                embedded = await _with_retry(
+                    embedder.embed_documents, list(missing.values()),
+                    retries=max_retries, backoff=retry_backoff, what="Embedding batch",
+                )
+            fresh = dict(zip(missing, embedded))
+            await aput_embeddings(cache_model, [(h, v) for h, v in fresh.items() if isinstance(h, bytes)])
+            cached.update(fresh)
+        return [cached[h if h is not None else id(r)] for r, h in zip(batch, hashes)]
+
+    tasks += [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        await asyncio.gather(*tasks)
+    except Exception:
+        for t in tasks:
+            t.cancel()
+        raise
+
+    return upserted
+
+
+async def delete_vectors(
+    ids: Iterable[str],
+    index,
+    batch_size: int = VECTOR_DELETE_BATCH_SIZE,
+    concurrency: int = VECTOR_DELETE_CONCURRENCY,
+    max_retries: int = EMBED_MAX_RETRIES,
+    retry_backoff: float = EMBED_RETRY_BACKOFF,
+) -> int:
+    """
+    Delete vectors by id in batches of `batch_size` (Pinecone accepts up to 1000
+    ids per call), with up to `concurrency` delete calls in flight.
+    Deleting ids that don't exist is a no-op. Returns the number of ids sent.
+    """
+    batches = _batched(ids, max(1, batch_size))
+    deleted = 0
+
+    async def worker():
+        nonlocal deleted
+        for batch in batches:
+            with timed(INGEST_STAGE_SECONDS, stage="delete"):
+                await _with_retry(
+                    index.delete, ids=batch,
+                    retries=max_retries, backoff=retry_backoff, what="Delete batch",
+                )
+            deleted += len(batch)
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+    try:
+        await asyncio.gather(*workers)
+    except Exception:
+        for w in workers:
+            w.cancel()
+        raise
+
+    return deleted
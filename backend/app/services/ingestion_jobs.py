@@ -0,0 +1,256 @@
+# backend/app/services/ingestion_jobs.py
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional, Tuple
+
+from app.config import INGEST_WORKERS, INGEST_PROCESS_POOL_SIZE, INGEST_JOB_TTL, RUN_STATE
+from app.db.async_sqlite import get_pool
+
+logger = logging.getLogger(__name__)
+
+# Shared jobs (RUN_STATE="sqlite"): the worker processing a job writes its progress
+# here, so a poll answered by another worker sees it
+SAVE_JOB_SQL = """
+INSERT INTO ingestion_jobs (id, thread_id, state, updated_at, finished_at) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at,
+                               finished_at = excluded.finished_at
+"""
+GET_JOB_SQL = "SELECT state FROM ingestion_jobs WHERE id = ?"
+# Finished jobs past INGEST_JOB_TTL, and jobs whose worker stopped writing them
+PRUNE_JOBS_SQL = "DELETE FROM ingestion_jobs WHERE COALESCE(finished_at, updated_at) < ?"
+# Seconds between progress writes; unchanged running jobs are rewritten every _TOUCH_SECONDS
+_PROGRESS_FLUSH_SECONDS = 0.5
+_TOUCH_SECONDS = 60
+
+
+@dataclass
+class FileProgress:
+    filename: str
+    format: str = "pdf"     # document_parser.FORMATS name
+    status: str = "queued"  # queued -> processing -> done | failed
+    pages_parsed: int = 0
+    chunks_total: int = 0
+    chunks_embedded: int = 0
+    vectors_upserted: int = 0
+    chunks_cached: int = 0      # vectors taken from the embedding cache
+    chunks_unchanged: int = 0   # already indexed with the same content, skipped
+    message: str = ""
+
+
+@dataclass
+class IngestionJob:
+    id: str
+    thread_id: str
+    files: List[FileProgress]
+    status: str = "queued"  # queued -> processing -> done | failed
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def to_dict(self):
+        files = [asdict(f) for f in self.files]
+        return {
+            "job_id": self.id,
+            "thread_id": self.thread_id,
+            "status": self.status,
+            "pages_parsed": sum(f["pages_parsed"] for f in files),
+            "chunks_total": sum(f["chunks_total"] for f in files),
+            "chunks_embedded": sum(f["chunks_embedded"] for f in files),
+            "vectors_upserted": sum(f["vectors_upserted"] for f in files),
+            "chunks_cached": sum(f["chunks_cached"] for f in files),
+            "chunks_unchanged": sum(f["chunks_unchanged"] for f in files),
+            "files": files,
+        }
+
+
+class IngestionManager:
+    """
+    Background document ingestion.
+
+    - Parsing + chunking runs in a process pool (CPU-bound, never on the event loop).
+    - Embedding + upsert runs in asyncio worker tasks that offload blocking calls to threads.
+    - Each file is its own queue item, so files from one upload are processed in parallel.
+    - With `shared` (RUN_STATE="sqlite") job progress is also written to the
+      database, so any worker can report it.
+    """
+
+    def __init__(
+        self,
+        workers: int = INGEST_WORKERS,
+        pool_size: int = INGEST_PROCESS_POOL_SIZE,
+        shared: bool = RUN_STATE == "sqlite",
+    ):
+        self.workers = workers
+        self.pool_size = pool_size
+        self.shared = shared
+        self.jobs: Dict[str, IngestionJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # job id -> (state JSON, time) of the last write
+        self._saved: Dict[str, Tuple[str, float]] = {}
+
+    async def start(self):
+        # "spawn" so children don't inherit the server's threads/sockets
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.pool_size,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if self.shared:
+            self._tasks.append(asyncio.create_task(self._flush_loop()))
+        logger.info(f"Ingestion started ({self.workers} workers, {self.pool_size} parser processes)")
+
+    async def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.shared:
+            try:
+                await self._flush()
+            except Exception as e:
+                logger.warning(f"Could not save ingestion progress on shutdown: {e}")
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def submit(self, thread_id: str, files: List[tuple]) -> IngestionJob:
+        """
+        Queue an upload. `files` is a list of (filename, temp_path, format) triples.
+        Returns the job as soon as it is queued (and, if shared, saved).
+        """
+        self._prune()
+        job = IngestionJob(
+            id=str(uuid.uuid4()),
+            thread_id=thread_id,
+            files=[FileProgress(filename=name, format=fmt) for name, _, fmt in files],
+        )
+        self.jobs[job.id] = job
+        for progress, (_, path, _) in zip(job.files, files):
+            self._queue.put_nowait((job, progress, path))
+        if self.shared:
+            # The first progress poll may reach another worker
+            await self._flush()
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self.jobs.get(job_id)
+
+    async def aget_state(self, job_id: str) -> Optional[dict]:
+        """Progress of a job of this worker, else (shared) as last saved by the worker running it."""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if not self.shared:
+            return None
+        pool = await get_pool()
+        async with pool.read() as conn:
+            async with conn.execute(GET_JOB_SQL, (job_id,)) as cur:
+                row = await cur.fetchone()
+        return json.loads(row["state"]) if row else None
+
+    def _prune(self):
+        """Forget finished jobs older than INGEST_JOB_TTL."""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished_at and now - job.finished_at > INGEST_JOB_TTL
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+            self._saved.pop(job_id, None)
+
+    async def _flush(self):
+        """Write the jobs whose progress changed since their last write."""
+        now = time.time()
+        rows = []
+        for job in self.jobs.values():
+            state = json.dumps(job.to_dict(), ensure_ascii=False)
+            saved = self._saved.get(job.id)
+            if saved and saved[0] == state and (job.finished_at or now - saved[1] < _TOUCH_SECONDS):
+                continue
+            rows.append((job.id, job.thread_id, state, now, job.finished_at))
+        if not rows:
+            return
+        pool = await get_pool()
+        async with pool.write() as conn:
+            await conn.executemany(SAVE_JOB_SQL, rows)
+        for job_id, _, state, _, _ in rows:
+            self._saved[job_id] = (state, now)
+
+    async def _flush_loop(self):
+        pruned_at = 0.0
+        while True:
+            await asyncio.sleep(_PROGRESS_FLUSH_SECONDS)
+            try:
+                await self._flush()
+                now = time.time()
+                if now - pruned_at >= _TOUCH_SECONDS:
+                    pool = await get_pool()
+                    async with pool.write() as conn:
+                        await conn.execute(PRUNE_JOBS_SQL, (now - max(INGEST_JOB_TTL, 2 * _TOUCH_SECONDS),))
+                    pruned_at = now
+            except Exception as e:
+                logger.warning(f"Could not save ingestion progress: {e}")
+
+    async def _worker(self):
+        while True:
+            job, progress, path = await self._queue.get()
+            try:
+                await self._process_file(job, progress, path)
+            except Exception as e:
+                logger.error(f"Ingestion worker error: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _process_file(self, job: IngestionJob, progress: FileProgress, path: str):
+        # Import here so the parse processes don't import Pinecone/embedding clients
+        from app.services.rag_service import process_and_store_document
+
+        job.status = "processing"
+        progress.status = "processing"
+        try:
+            success, message = await process_and_store_document(
+                path, progress.filename, job.thread_id,
+                progress=progress, executor=self._pool, fmt=progress.format,
+            )
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+        progress.status = "done" if success else "failed"
+        progress.message = message
+
+        if all(f.status in ("done", "failed") for f in job.files):
+            await self._finish(job)
+
+    async def _finish(self, job: IngestionJob):
+        from app.services.thread_service import asave_message, ThreadNotFoundError
+
+        successful = [f for f in job.files if f.status == "done"]
+        job.status = "done" if successful else "failed"
+        job.finished_at = time.time()
+
+        # Save confirmation message to chat
+        if successful:
+            file_names = ", ".join(f.filename for f in successful)
+            confirmation_message = (
+                f"✅ **Document Uploaded Successfully**\n\n"
+                f"📄 **Files:** {file_names}\n"
+                f"📊 **Status:** {successful[0].message}\n\n"
+                f"You can now ask me questions about {'this document' if len(successful) == 1 else 'these documents'}!"
+            )
+            try:
+                await asave_message(job.thread_id, "assistant", confirmation_message)
+            except ThreadNotFoundError:
+                logger.info(f"Thread {job.thread_id} was deleted during ingestion job {job.id}")
+
+        logger.info(f"Ingestion job {job.id} finished: {len(successful)}/{len(job.files)} files indexed")
@@ -0,0 +1,97 @@
+# backend/app/services/keyword_index.py
+"""
+Keyword (BM25) index of document chunks, next to the vector index.
+
+Chunks live in `document_chunks`; the FTS5 table `document_chunks_fts` is kept
+in sync by triggers (see migration v6). Searching is a MATCH restricted to one
+thread and ranked with SQLite's built-in bm25(), so exact terms (SQL keywords,
+identifiers, error codes) are found without an embedding call.
+"""
+import re
+from typing import Iterable, List
+
+from app.db.async_sqlite import get_pool
+
+UPSERT_CHUNK_SQL = """
+INSERT INTO document_chunks (chunk_id, thread_id, source, page, text) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (chunk_id) DO UPDATE SET source=excluded.source, page=excluded.page, text=excluded.text
+"""
+DELETE_CHUNK_SQL = "DELETE FROM document_chunks WHERE chunk_id=?"
+DELETE_THREAD_CHUNKS_SQL = "DELETE FROM document_chunks WHERE thread_id=?"
+# bm25() is lower-is-better; the thread_id column gets no weight
+SEARCH_CHUNKS_SQL = """
+SELECT c.chunk_id, c.source, c.page, c.text, bm25(document_chunks_fts, 1.0, 0.0) AS rank
+FROM document_chunks_fts JOIN document_chunks c ON c.id = document_chunks_fts.rowid
+WHERE document_chunks_fts MATCH ?
+ORDER BY rank LIMIT ?
+"""
+
+# Same token characters as the FTS tokenizer (letters, digits, '_')
+_TOKEN_RE = re.compile(r"\w+")
+_PHRASE_RE = re.compile(r'"([^"]+)"')
+MAX_QUERY_TERMS = 32
+# Too common to rank by; matching on them alone would add noise to the fusion
+STOPWORDS = frozenset(
+    "a an the is are was were be been do does did can could should would will "
+    "how what why when where which who whom whose this that these those there "
+    "of to in on at by for with from about as into and or not no if then so "
+    "i me my we you your it its".split()
+)
+
+
+def _quote(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+def match_expression(thread_id: str, query: str) -> str:
+    """
+    FTS5 query: the thread, AND any of the query's terms / "quoted phrases".
+    Stopwords are dropped; every term is quoted, so user text never becomes FTS syntax.
+    """
+    phrases = [p for p in _PHRASE_RE.findall(query) if _TOKEN_RE.search(p)]
+    terms = [t.lower() for t in _TOKEN_RE.findall(_PHRASE_RE.sub(" ", query))]
+    terms = list(dict.fromkeys(t for t in terms if t not in STOPWORDS))
+    parts = [_quote(p) for p in phrases] + [_quote(t) for t in terms]
+    if not parts:
+        return ""
+    return f"thread_id : {_quote(thread_id)} AND text : ({' OR '.join(parts[:MAX_QUERY_TERMS])})"
+
+
+async def aindex_chunks(records: Iterable[dict]):
+    """Add or replace chunks ({"id", "text", "metadata"} upsert records)."""
+    rows = [
+        (r["id"], r["metadata"]["thread_id"], r["metadata"].get("source"), r["metadata"].get("page", 0), r["text"])
+        for r in records
+    ]
+    if not rows:
+        return
+    pool = await get_pool()
+    async with pool.write() as conn:
+        await conn.executemany(UPSERT_CHUNK_SQL, rows)
+
+
+async def adelete_chunks(chunk_ids: Iterable[str]):
+    pool = await get_pool()
+    async with pool.write() as conn:
+        await conn.executemany(DELETE_CHUNK_SQL, [(chunk_id,) for chunk_id in chunk_ids])
+
+
+async def aforget_thread_chunks(thread_id: str):
+    pool = await get_pool()
+    async with pool.write() as conn:
+        await conn.execute(DELETE_THREAD_CHUNKS_SQL, (thread_id,))
+
+
+async def asearch_chunks(thread_id: str, query: str, limit: int = 20) -> List[dict]:
+    """Best BM25 matches in a thread, best first: [{"id", "source", "page", "text", "rank"}]."""
+    expression = match_expression(thread_id, query)
+    if not expression:
+        return []
+    pool = await get_pool()
+    async with pool.read() as conn:
+        async with conn.execute(SEARCH_CHUNKS_SQL, (expression, limit)) as cursor:
+            rows = await cursor.fetchall()
+    return [
+        {"id": row["chunk_id"], "source": row["source"], "page": row["page"], "text": row["text"], "rank": row["rank"]}
+        for row in rows
+    ]
@@ -1,159 +1,243 @@
 # backend/app/services/rag_service.py
-import os
-import shutil
-from fastapi import UploadFile
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from pinecone import Pinecone
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+import asyncio
 import logging
+import time
+from app.config import EMBEDDING_MODEL, EMBED_CACHE_ENABLED, EMBED_CACHE_MAX_ENTRIES, INGEST_PAGE_WINDOW, MAX_PDF_PAGES
+from app.services.embedding_pipeline import embed_and_upsert, delete_vectors, INGEST_STAGE_SECONDS
+from app.services.embedding_cache import aprune_embeddings
+from app.services.document_parser import detect_format, page_count, parse_pages, chunk_id, chunk_digest, file_digest
+from app.services.service_registry import aget_service
+from app.services.keyword_index import aindex_chunks, adelete_chunks
+from app.services.retrieval import hybrid_search
+from app.services.document_manifest import (
+    arecord_document,
+    afinish_document,
+    aget_document,
+    aorphaned_thread_ids,
+    delete_thread_vectors,
+)
+from app.utils.metrics import Counter, Gauge, Histogram, timed
 
 logger = logging.getLogger(__name__)
 
-# Initialize Pinecone
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-index = pc.Index(os.getenv("PINECONE_INDEX_NAME"))
-
-# ✅ Use Google Gemini Embeddings (No DLL issues!)
-embeddings = GoogleGenerativeAIEmbeddings(
-    model="text-embedding-004",  # 768 dimensions
-    google_api_key=os.getenv("GOOGLE_API_KEY")
+INGEST_DOCUMENTS = Counter("ingest_documents_total", "Documents processed", ("outcome",))
+INGEST_DOCUMENT_SECONDS = Histogram("ingest_document_seconds", "Time to process one document")
+INGEST_IN_PROGRESS = Gauge("ingest_documents_in_progress", "Documents being processed in this worker")
+INGEST_PAGES = Counter("ingest_pages_total", "Pages (or sections) parsed")
+INGEST_CHUNKS = Counter(
+    "ingest_chunks_total", "Chunks by what ingestion did with them", ("result",)
 )
 
-# Text splitter for chunking documents
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000,
-    chunk_overlap=200,
-    length_function=len,
-)
+# The vector store (Pinecone or local, see VECTOR_STORE) and the Gemini embeddings
+# (EMBEDDING_MODEL, 768 dimensions) are created on first use by the service registry.
 
-async def process_and_store_pdf(file: UploadFile, thread_id: str):
+async def process_and_store_document(path: str, filename: str, thread_id: str, progress=None, executor=None, fmt=None):
     """
-    1. Saves file temporarily.
-    2. Extracts text & chunks it.
-    3. Embeds & Upserts to Pinecone with thread_id metadata.
+    1. Hashes the file; an unchanged re-upload of an indexed file stops here.
+    2. Checks the page limit, then extracts text & chunks it in `executor` (the
+       ingestion process pool) with the parser registered for `fmt` (a format
+       name from document_parser.FORMATS; detected from the filename if None).
+       PDFs go a window of pages at a time, each window fed to the embedding
+       stage, so memory stays flat however long the PDF is.
+    3. Embeds & Upserts to the vector store with thread_id metadata (off the event loop),
+       and adds the chunks to the keyword index.
+       Chunks already indexed with the same content are skipped, and vectors
+       come from the embedding cache when the same text was embedded before.
+
+    `progress` is an optional object with pages_parsed, chunks_total,
+    chunks_embedded, vectors_upserted, chunks_cached and chunks_unchanged
+    attributes, updated as work completes.
     """
-    temp_filename = None
-    
+    INGEST_IN_PROGRESS.inc()
+    started = time.perf_counter()
     try:
-        # 1. Save file temporarily
-        temp_filename = f"temp_{file.filename}"
-        with open(temp_filename, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        logger.info(f"Processing PDF: {file.filename} for thread: {thread_id}")
-
-        # 2. Load PDF
-        loader = PyPDFLoader(temp_filename)
-        documents = loader.load()
-        
-        # 3. Split into chunks
-        chunks = text_splitter.split_documents(documents)
-        logger.info(f"Split into {len(chunks)} chunks")
-
-        # 4. Prepare Vectors with Metadata
-        vectors_to_upsert = []
-        
-        for i, doc in enumerate(chunks):
-            # Create Embedding
-            vector_values = embeddings.embed_query(doc.page_content)
-            
-            # Create Unique ID for this chunk
-            chunk_id = f"{thread_id}_{file.filename}_{i}"
-
-            vectors_to_upsert.append({
-                "id": chunk_id,
-                "values": vector_values,
-                "metadata": {
-                    "text": doc.page_content,
-                    "source": file.filename,
-                    "thread_id": thread_id,
-                    "chunk_index": i,
-                    "page": doc.metadata.get("page", 0)
-                }
-            })
-
-        # 5. Upsert to Pinecone in batches
-        if vectors_to_upsert:
-            batch_size = 100
-            for i in range(0, len(vectors_to_upsert), batch_size):
-                batch = vectors_to_upsert[i:i + batch_size]
-                index.upsert(vectors=batch)
-            
-            logger.info(f"Uploaded {len(vectors_to_upsert)} vectors to Pinecone")
-
-        # 6. Cleanup
-        if temp_filename and os.path.exists(temp_filename):
-            os.remove(temp_filename)
-            
-        return True, f"Successfully indexed {len(vectors_to_upsert)} chunks from {file.filename}"
+        success, message = await _process_document(path, filename, thread_id, progress, executor, fmt)
+    finally:
+        INGEST_IN_PROGRESS.dec()
+    INGEST_DOCUMENTS.inc(outcome="indexed" if success else "failed")
+    INGEST_DOCUMENT_SECONDS.observe(time.perf_counter() - started)
+    return success, message
+
+
+async def _process_document(path: str, filename: str, thread_id: str, progress, executor, fmt):
+    try:
+        if fmt is None:
+            document_format = detect_format(filename)
+            if document_format is None:
+                return False, f"{filename}: unsupported file type"
+            fmt = document_format.name
+        logger.info(f"Processing {fmt} document: {filename} for thread: {thread_id}")
+        loop = asyncio.get_running_loop()
+
+        # 1. Same bytes as the last completed upload: nothing to do
+        with timed(INGEST_STAGE_SECONDS, stage="hash"):
+            content_hash = await loop.run_in_executor(executor, file_digest, path)
+            previous = await aget_document(thread_id, filename)
+        if previous and previous[1] == content_hash:
+            chunk_count = previous[0]
+            INGEST_CHUNKS.inc(chunk_count, result="unchanged")
+            if progress is not None:
+                progress.chunks_total = chunk_count
+                progress.chunks_unchanged = chunk_count
+            logger.info(f"{filename} unchanged since last upload, skipping")
+            return True, f"{filename} is already indexed ({chunk_count} chunks unchanged)"
+
+        # 2. Page limit (reads the page tree only)
+        with timed(INGEST_STAGE_SECONDS, stage="page_count"):
+            pages = await loop.run_in_executor(executor, page_count, path, fmt)
+        if pages > MAX_PDF_PAGES:
+            return False, f"{filename} has {pages} pages (limit is {MAX_PDF_PAGES})"
+
+        old_digests = previous[2] if previous and previous[2] else []
+        digests = []
+        unchanged = 0
+
+        def parse_window(first_page, first_index):
+            submitted = time.perf_counter()
+            window = loop.run_in_executor(
+                executor, parse_pages, path, filename, thread_id,
+                first_page, first_page + INGEST_PAGE_WINDOW, first_index, fmt,
+            )
+            # Submit to result, so waiting for a free pool process counts as parse time
+            window.add_done_callback(
+                lambda f: f.cancelled() or INGEST_STAGE_SECONDS.observe(time.perf_counter() - submitted, stage="parse")
+            )
+            return window
+
+        async def changed_records():
+            """
+            Parse INGEST_PAGE_WINDOW pages at a time outside the event loop (the next
+            window is parsed while this one is embedded) and yield the chunks whose
+            id now holds different content.
+            """
+            nonlocal unchanged
+            next_window = parse_window(0, 0) if pages else None
+            try:
+                for first_page in range(0, pages, INGEST_PAGE_WINDOW):
+                    records = await next_window
+                    first_index = len(digests)
+                    next_page = first_page + INGEST_PAGE_WINDOW
+                    next_window = parse_window(next_page, first_index + len(records)) if next_page < pages else None
+
+                    changed = []
+                    for i, record in enumerate(records, start=first_index):
+                        digest = chunk_digest(record)
+                        digests.append(digest)
+                        if i >= len(old_digests) or old_digests[i] != digest:
+                            changed.append(record)
+                    unchanged += len(records) - len(changed)
+
+                    if progress is not None:
+                        progress.pages_parsed = min(next_page, pages)
+                        progress.chunks_total = len(digests)
+                        progress.chunks_unchanged = unchanged
+
+                    # Record the ids before upserting, so a failed upload can still be cleaned up
+                    with timed(INGEST_STAGE_SECONDS, stage="index"):
+                        await arecord_document(thread_id, filename, len(digests))
+                        await aindex_chunks(changed)
+                    for record in changed:
+                        yield record
+            finally:
+                if next_window is not None:
+                    next_window.cancel()
+
+        def on_embedded(n):
+            if progress is not None:
+                progress.chunks_embedded += n
+
+        def on_upserted(n):
+            if progress is not None:
+                progress.vectors_upserted += n
+
+        cached = 0
+
+        def on_cached(n):
+            nonlocal cached
+            cached += n
+            if progress is not None:
+                progress.chunks_cached += n
+
+        # 3. Embed in batches and upsert each batch as soon as it is ready
+        upserted = await embed_and_upsert(
+            changed_records(), await aget_service("embeddings"), await aget_service("vector_store"),
+            on_batch_embedded=on_embedded,
+            on_batch_done=on_upserted,
+            cache_model=EMBEDDING_MODEL if EMBED_CACHE_ENABLED else None,
+            on_batch_cached=on_cached,
+        )
+        total = len(digests)
+        logger.info(
+            f"Parsed {pages} pages into {total} chunks; uploaded {upserted} vectors to the vector store "
+            f"({upserted - cached} embedded, {cached} cached, {unchanged} unchanged)"
+        )
+
+        INGEST_PAGES.inc(pages)
+        INGEST_CHUNKS.inc(upserted - cached, result="embedded")
+        INGEST_CHUNKS.inc(cached, result="cached")
+        INGEST_CHUNKS.inc(unchanged, result="unchanged")
+
+        # A shorter new version leaves ids past its last chunk behind
+        if previous and previous[0] > total:
+            stale = [chunk_id(thread_id, filename, i) for i in range(total, previous[0])]
+            await delete_vectors(stale, await aget_service("vector_store"))
+            await adelete_chunks(stale)
+        with timed(INGEST_STAGE_SECONDS, stage="finish"):
+            await afinish_document(thread_id, filename, total, content_hash, digests)
+            if EMBED_CACHE_ENABLED:
+                await aprune_embeddings(EMBED_CACHE_MAX_ENTRIES)
+
+        if upserted < total:
+            return True, (
+                f"Successfully indexed {total} chunks from {filename} "
+                f"({unchanged} unchanged, {cached} reused, {upserted - cached} embedded)"
+            )
+        return True, f"Successfully indexed {upserted} chunks from {filename}"
 
     except Exception as e:
-        logger.error(f"Error processing PDF: {str(e)}")
-        # Cleanup on error
-        if temp_filename and os.path.exists(temp_filename):
-            os.remove(temp_filename)
+        logger.error(f"Error processing {filename}: {str(e)}")
         return False, str(e)
 
 
-def search_documents(query: str, thread_id: str, top_k: int = 5):
+async def search_documents(query: str, thread_id: str, top_k: int = 5):
     """
-    Search Pinecone for relevant documents filtered by thread_id.
+    Search the thread's documents: BM25 + vector results fused (see app/services/retrieval.py).
+    Failures are raised, not returned as "no results": the search_documents tool
+    reports them as an error, so the turn's answer is not cached.
     """
     try:
-        # 1. Embed the query
-        query_vector = embeddings.embed_query(query)
-        
-        # 2. Query Pinecone with thread_id filter
-        results = index.query(
-            vector=query_vector,
-            top_k=top_k,
-            include_metadata=True,
-            filter={"thread_id": thread_id}
+        return await hybrid_search(
+            query, thread_id, await aget_service("embeddings"), await aget_service("vector_store"), top_k=top_k
         )
-        
-        # 3. Extract context
-        contexts = []
-        for match in results.get('matches', []):
-            if match.get('metadata') and match['metadata'].get('text'):
-                contexts.append({
-                    'text': match['metadata']['text'],
-                    'source': match['metadata'].get('source', 'Unknown'),
-                    'score': match.get('score', 0),
-                    'page': match['metadata'].get('page', 0)
-                })
-        
-        return contexts
-    
+
     except Exception as e:
         logger.error(f"Error searching documents: {str(e)}")
-        return []
+        raise
 
 
-def delete_thread_documents(thread_id: str):
+async def delete_thread_documents(thread_id: str):
     """
-    Delete all documents associated with a thread_id from Pinecone.
+    Delete all documents associated with a thread_id from the vector store.
+    Ids come from the local document manifest (no similarity query).
     """
     try:
-        # Query to get all IDs for this thread
-        dummy_vector = [0.0] * 768  # Gemini embedding-001 dimension
-        results = index.query(
-            vector=dummy_vector,
-            top_k=10000,
-            include_metadata=True,
-            filter={"thread_id": thread_id}
-        )
-        
-        # Extract IDs and delete
-        ids_to_delete = [match['id'] for match in results.get('matches', [])]
-        
-        if ids_to_delete:
-            index.delete(ids=ids_to_delete)
-            logger.info(f"Deleted {len(ids_to_delete)} vectors for thread {thread_id}")
-            return True, f"Deleted {len(ids_to_delete)} document chunks"
-        else:
-            return True, "No documents found for this thread"
-    
+        deleted = await delete_thread_vectors(thread_id, await aget_service("vector_store"))
+
+        if deleted is None:
+            logger.info(f"Deleted vectors for thread {thread_id} by metadata filter")
+            return True, "Deleted document chunks"
+        if deleted:
+            logger.info(f"Deleted {deleted} vectors for thread {thread_id}")
+            return True, f"Deleted {deleted} document chunks"
+        return True, "No documents found for this thread"
+
     except Exception as e:
         logger.error(f"Error deleting thread documents: {str(e)}")
-        return False, str(e)
\ No newline at end of file
+        return False, str(e)
+
+
+async def sweep_orphaned_documents():
+    """Retry vector deletion for threads that were deleted while it failed."""
+    for thread_id in await aorphaned_thread_ids():
+        success, message = await delete_thread_documents(thread_id)
+        logger.info(f"Orphaned documents of thread {thread_id}: {message}")
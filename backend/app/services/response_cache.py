@@ -0,0 +1,251 @@
+# backend/app/services/response_cache.py
+"""
+Response cache in front of the agent graph.
+
+Exact tier: key = normalized prompt + context fingerprint (model, the previous
+exchange in the thread) + scope. Only a thread's first turn is shared across
+threads ("global"); follow-up turns and answers built from the thread's
+documents are scoped to the thread id, since the recent exchange is not the
+whole history (or summary) the answer was built from.
+Semantic tier (optional): cosine similarity between prompt embeddings, only
+among entries with the same context fingerprint.
+
+Entries expire by tool category (stock/weather short, static knowledge long)
+and are evicted LRU under an entry-count and memory cap.
+"""
+import asyncio
+import hashlib
+import logging
+import re
+import sys
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import numpy as np
+
+from app.config import (
+    LLM_MODEL,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_SEMANTIC,
+    RESPONSE_CACHE_SIMILARITY,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_TTLS,
+)
+from app.services.service_registry import aget_service
+from app.utils.metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# Which TTL category each tool's result belongs to
+TOOL_CATEGORIES = {
+    "get_stock_price": "stock",
+    "get_weather": "weather",
+    "duckduckgo_search": "search",
+    "search_documents": "documents",
+    "calculator": "static",
+}
+
+_PUNCTUATION_TAIL = re.compile(r"[\s?!.]+$")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    text = unicodedata.normalize("NFKC", prompt).lower().strip()
+    text = _WHITESPACE.sub(" ", text)
+    return _PUNCTUATION_TAIL.sub("", text)
+
+
+def context_fingerprint(previous_messages: Iterable[dict]) -> str:
+    """Hash of the model + the previous exchange the answer may depend on."""
+    h = hashlib.sha256(LLM_MODEL.encode("utf-8"))
+    for m in previous_messages:
+        h.update(f"\x00{m['role']}\x00{m['content']}".encode("utf-8"))
+    return h.hexdigest()
+
+
+@dataclass
+class CacheEntry:
+    response: str
+    category: str
+    expires_at: float
+    context: str
+    scope: str
+    vector: Optional[np.ndarray] = None
+    size: int = 0
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+        ttls: dict = RESPONSE_CACHE_TTLS,
+        semantic: bool = RESPONSE_CACHE_SEMANTIC,
+        similarity: float = RESPONSE_CACHE_SIMILARITY,
+        embedder=None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttls = ttls
+        self.semantic = semantic
+        self.similarity = similarity
+        self._embedder = embedder
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.bytes = 0
+        self.hits = {"exact": 0, "semantic": 0}
+        self.misses = 0
+
+    # ---------- helpers ----------
+
+    @staticmethod
+    def _key(normalized: str, context: str, scope: str) -> str:
+        return hashlib.sha256(f"{scope}\x00{context}\x00{normalized}".encode("utf-8")).hexdigest()
+
+    def category_for(self, tools_used: Iterable[str]) -> str:
+        """Shortest-lived category among the tools used (static if none)."""
+        categories = [TOOL_CATEGORIES.get(name, "search") for name in tools_used] or ["static"]
+        return min(categories, key=lambda c: self.ttls.get(c, 0))
+
+    async def _get_embedder(self):
+        if self._embedder is None:
+            # Shared document embeddings (service registry), unless one was passed in
+            return await aget_service("embeddings")
+        return self._embedder
+
+    async def _embed(self, normalized: str) -> Optional[np.ndarray]:
+        """Unit-length prompt embedding, so similarity is a dot product."""
+        try:
+            embedder = await self._get_embedder()
+            vector = await asyncio.to_thread(embedder.embed_query, normalized)
+        except Exception as e:
+            logger.warning(f"Response cache embedding failed: {e}")
+            return None
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+
+    # ---------- public API ----------
+
+    async def lookup(self, prompt: str, context: str, thread_id: str, shared: bool = True) -> Optional[str]:
+        """shared=False (a follow-up turn) only looks at answers scoped to this thread."""
+        if not RESPONSE_CACHE_ENABLED:
+            return None
+
+        normalized = normalize_prompt(prompt)
+        now = time.time()
+        scopes = ("global", thread_id) if shared else (thread_id,)
+
+        # Exact tier: global answers first, then answers scoped to this thread
+        for scope in scopes:
+            key = self._key(normalized, context, scope)
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            if entry.expires_at <= now:
+                self._remove(key)
+                continue
+            self._entries.move_to_end(key)
+            self.hits["exact"] += 1
+            return entry.response
+
+        # Semantic tier
+        if self.semantic:
+            vector = await self._embed(normalized)
+            if vector is not None:
+                best_key, best_score = None, self.similarity
+                for key, entry in self._entries.items():
+                    if entry.vector is None or entry.context != context or entry.scope not in scopes:
+                        continue
+                    if entry.expires_at <= now:
+                        continue
+                    score = float(np.dot(vector, entry.vector))
+                    if score >= best_score:
+                        best_key, best_score = key, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.hits["semantic"] += 1
+                    return self._entries[best_key].response
+
+        self.misses += 1
+        return None
+
+    async def store(
+        self,
+        prompt: str,
+        context: str,
+        thread_id: str,
+        response: str,
+        tools_used: Iterable[str],
+        shared: bool = True,
+    ):
+        if not RESPONSE_CACHE_ENABLED or not response:
+            return
+
+        tools_used = list(tools_used)
+        category = self.category_for(tools_used)
+        # Follow-up turns and answers built from a thread's documents are only valid for that thread
+        scope = thread_id if not shared or "search_documents" in tools_used else "global"
+        normalized = normalize_prompt(prompt)
+        vector = await self._embed(normalized) if self.semantic else None
+
+        key = self._key(normalized, context, scope)
+        if key in self._entries:
+            self._remove(key)
+
+        entry = CacheEntry(
+            response=response,
+            category=category,
+            expires_at=time.time() + self.ttls.get(category, 0),
+            context=context,
+            scope=scope,
+            vector=vector,
+        )
+        entry.size = (
+            sys.getsizeof(response) + len(key) + len(context) + len(scope)
+            + (vector.nbytes if vector is not None else 0)
+        )
+        self._entries[key] = entry
+        self.bytes += entry.size
+        self._evict()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": dict(self.hits),
+            "misses": self.misses,
+        }
+
+
+def chunk_response(text: str, words_per_chunk: int = 3):
+    """Split a cached answer into small pieces so it streams like model output."""
+    parts = re.findall(r"\S+\s*|\s+", text)
+    for i in range(0, len(parts), words_per_chunk):
+        yield "".join(parts[i:i + words_per_chunk])
+
+
+response_cache = ResponseCache()
+
+RESPONSE_CACHE_LOOKUPS = Counter(
+    "response_cache_lookups_total", "Response cache lookups by result", ("result",),
+    function=lambda: {
+        ("exact",): response_cache.hits["exact"],
+        ("semantic",): response_cache.hits["semantic"],
+        ("miss",): response_cache.misses,
+    },
+)
+RESPONSE_CACHE_BYTES = Gauge(
+    "response_cache_bytes", "Size of the cached responses", function=lambda: response_cache.bytes
+)
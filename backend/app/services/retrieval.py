@@ -0,0 +1,143 @@
+# backend/app/services/retrieval.py
+"""
+Hybrid document retrieval for one thread.
+
+- Keyword: BM25 over the thread's chunks (app/services/keyword_index.py).
+- Vector: similarity query on the vector store, with query embeddings kept in
+  a bounded LRU + TTL cache as float32 arrays (the agent often re-asks the
+  same question within a turn).
+- Results are fused with reciprocal rank fusion (RRF); both run concurrently.
+- Short keyword / identifier queries that BM25 can answer return right away,
+  without an embedding call.
+"""
+import asyncio
+import re
+from typing import Dict, List
+
+import numpy as np
+
+from app.config import (
+    HYBRID_SEARCH_ENABLED,
+    HYBRID_CANDIDATES,
+    RRF_K,
+    KEYWORD_QUERY_MAX_TERMS,
+    QUERY_EMBED_CACHE_SIZE,
+    QUERY_EMBED_CACHE_TTL,
+)
+from app.services.keyword_index import STOPWORDS, asearch_chunks
+from app.utils.tool_runtime import ToolCache
+
+# Shared by every thread, so bounded by count and age; concurrent identical queries share one call
+query_embedding_cache = ToolCache("query_embedding", ttl=QUERY_EMBED_CACHE_TTL, max_entries=QUERY_EMBED_CACHE_SIZE)
+
+# Words that mark a natural-language question rather than a keyword lookup
+_QUESTION_WORDS = STOPWORDS | {"explain", "describe", "summarize", "tell", "show", "list"}
+# SQL keywords, snake_case / camelCase identifiers, dotted names, calls, codes with digits
+_CODE_LIKE = re.compile(r"^(?:[A-Z][A-Z0-9]+|.*[_.()\d].*|[a-z]+[A-Z]\w*)$")
+
+
+def is_keyword_query(query: str) -> bool:
+    """A quoted phrase, or a few terms that are identifiers / keywords rather than a question."""
+    if '"' in query:
+        return True
+    terms = [t.strip("?.,!:;") for t in query.split()]
+    terms = [t for t in terms if t]
+    if not terms or len(terms) > KEYWORD_QUERY_MAX_TERMS:
+        return False
+    if any(_CODE_LIKE.match(t) for t in terms):
+        return True
+    return not any(t.lower() in _QUESTION_WORDS for t in terms)
+
+
+def rrf_fuse(rankings: List[List[str]], k: int = RRF_K) -> List[tuple]:
+    """
+    Reciprocal rank fusion of ranked id lists: [(id, score)], best first.
+    Scores are scaled so an id ranked first by every list scores 1.0.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    scale = (k + 1) / max(1, len(rankings))
+    return sorted(((item, score * scale) for item, score in scores.items()), key=lambda x: -x[1])
+
+
+async def embed_query(embedder, query: str) -> List[float]:
+    key = " ".join(query.split())
+
+    async def compute():
+        # Kept as float32 (~8x smaller than a list of Python floats)
+        return np.asarray(await asyncio.to_thread(embedder.embed_query, query), dtype=np.float32)
+
+    # A fresh list per caller: vector stores may normalize the query in place
+    return (await query_embedding_cache.get_or_compute(key, compute)).tolist()
+
+
+async def hybrid_search(
+    query: str,
+    thread_id: str,
+    embedder,
+    index,
+    top_k: int = 5,
+    hybrid: bool = HYBRID_SEARCH_ENABLED,
+    candidates: int = HYBRID_CANDIDATES,
+) -> List[dict]:
+    """
+    Top `top_k` chunks of a thread for `query`: [{"text", "source", "score", "page"}].
+    Threads indexed before the keyword index existed simply get vector results.
+    """
+    found: Dict[str, dict] = {}
+
+    async def vector_search():
+        vector = await embed_query(embedder, query)
+        return await asyncio.to_thread(
+            index.query,
+            vector=vector,
+            top_k=max(top_k, candidates) if hybrid else top_k,
+            include_metadata=True,
+            filter={"thread_id": thread_id},
+        )
+
+    keyword_hits = []
+    if hybrid and is_keyword_query(query):
+        # Exact terms (SQL commands, identifiers): the keyword index alone, when it finds them
+        keyword_hits = await asearch_chunks(thread_id, query, limit=max(top_k, candidates))
+        for hit in keyword_hits:
+            found[hit["id"]] = hit
+        if keyword_hits:
+            return _contexts(rrf_fuse([[hit["id"] for hit in keyword_hits]])[:top_k], found)
+        results = await vector_search()
+    elif hybrid:
+        keyword_hits, results = await asyncio.gather(
+            asearch_chunks(thread_id, query, limit=max(top_k, candidates)),
+            vector_search(),
+        )
+        for hit in keyword_hits:
+            found[hit["id"]] = hit
+    else:
+        results = await vector_search()
+
+    vector_ids = []
+    for match in results.get("matches", []):
+        metadata = match.get("metadata") or {}
+        if not metadata.get("text"):
+            continue
+        vector_ids.append(match["id"])
+        found.setdefault(match["id"], metadata)
+    if not hybrid:
+        scores = {m["id"]: m.get("score", 0) for m in results.get("matches", [])}
+        return _contexts([(i, scores[i]) for i in vector_ids], found)
+
+    return _contexts(rrf_fuse([[hit["id"] for hit in keyword_hits], vector_ids])[:top_k], found)
+
+
+def _contexts(ranked, found) -> List[dict]:
+    return [
+        {
+            "text": found[item]["text"],
+            "source": found[item].get("source") or "Unknown",
+            "score": score,
+            "page": found[item].get("page", 0),
+        }
+        for item, score in ranked
+    ]
@@ -0,0 +1,130 @@
+# backend/app/services/service_registry.py
+"""
+Lazily created clients: chat model, summary model, embeddings, vector store.
+
+Nothing is built at import time. A service is created by its factory on first
+use, once, under a lock, so the app starts (and answers health checks) without
+importing the provider SDKs or needing every API key; a missing key fails the
+first request that needs that client instead of startup.
+
+- get_service(name) / aget_service(name): the shared instance, created on first call.
+- warm_services(names): create services ahead of traffic (/ready?warm=true, WARM_SERVICES).
+- override_service(name, instance): swap in a stand-in (benchmarks, fakes).
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from app.config import LLM_MODEL, SUMMARY_MODEL, EMBEDDING_MODEL
+
+logger = logging.getLogger(__name__)
+
+
+class _Service:
+    def __init__(self, factory: Callable):
+        self.factory = factory
+        self.instance = None
+        self.error: Optional[str] = None
+        self.init_seconds: Optional[float] = None
+        self.lock = threading.Lock()
+
+
+_services: Dict[str, _Service] = {}
+
+
+def register_service(name: str, factory: Callable):
+    _services[name] = _Service(factory)
+
+
+def get_service(name: str):
+    """The shared instance of `name`, created on first use (thread-safe)."""
+    service = _services[name]
+    if service.instance is None:
+        with service.lock:
+            if service.instance is None:
+                started = time.perf_counter()
+                try:
+                    service.instance = service.factory()
+                except Exception as e:
+                    service.error = str(e)
+                    raise
+                service.error = None
+                service.init_seconds = time.perf_counter() - started
+                logger.info(f"Created {name} in {service.init_seconds:.2f}s")
+    return service.instance
+
+
+async def aget_service(name: str):
+    """get_service() for async code: a first-time creation runs in a thread, off the event loop."""
+    service = _services[name]
+    if service.instance is not None:
+        return service.instance
+    return await asyncio.to_thread(get_service, name)
+
+
+def override_service(name: str, instance):
+    """Use `instance` for `name` from now on (None: create it again on next use)."""
+    service = _services[name]
+    with service.lock:
+        service.instance = instance
+        service.error = None
+
+
+def service_status() -> dict:
+    return {
+        name: {"ready": service.instance is not None, "init_seconds": service.init_seconds, "error": service.error}
+        for name, service in _services.items()
+    }
+
+
+async def warm_services(names: Optional[Iterable[str]] = None) -> dict:
+    """Create the given services (default: all) concurrently in threads. Returns service_status()."""
+    names = list(names) if names is not None else list(_services)
+
+    async def warm(name):
+        try:
+            await aget_service(name)
+        except Exception as e:
+            logger.warning(f"Could not create {name}: {e}")
+
+    await asyncio.gather(*(warm(name) for name in names if name in _services))
+    return service_status()
+
+
+# ==========================================
+# FACTORIES (provider SDKs are imported here, on first use)
+# ==========================================
+def _chat_llm():
+    from langchain_groq import ChatGroq
+    from app.utils.tools import tools
+
+    llm = ChatGroq(model=LLM_MODEL, api_key=os.getenv("GROQ_API_KEY"), temperature=0.1)
+    return llm.bind_tools(tools)
+
+
+def _summary_llm():
+    # Non-streaming model used only to write the running summary
+    from langchain_groq import ChatGroq
+
+    return ChatGroq(model=SUMMARY_MODEL, api_key=os.getenv("GROQ_API_KEY"), temperature=0)
+
+
+def _embeddings():
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    return GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=os.getenv("GOOGLE_API_KEY"))
+
+
+def _vector_store():
+    from app.services.vector_store import create_vector_store
+
+    return create_vector_store()
+
+
+register_service("chat_llm", _chat_llm)
+register_service("summary_llm", _summary_llm)
+register_service("embeddings", _embeddings)
+register_service("vector_store", _vector_store)
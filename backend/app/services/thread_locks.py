@@ -0,0 +1,116 @@
+# backend/app/services/thread_locks.py
+"""
+One turn at a time per thread.
+
+A chat turn reads the thread's history, runs the graph (checkpoint writes) and
+saves the user + assistant messages. Two turns on the same thread running at
+once would both answer from the same history and interleave their writes, so
+`thread_turn(thread_id)` serializes them while different threads run freely:
+
+- In-process: an asyncio.Lock per thread (FIFO for turns in the same worker).
+- Across workers (THREAD_LOCKS="sqlite"): a lease row in `thread_leases`.
+  The lease expires after the run slot wait (CHAT_QUEUE_TIMEOUT, taken while
+  the thread is held) and the run deadline plus THREAD_LEASE_GRACE, so a
+  crashed worker cannot block a thread for good. Waiting workers poll every
+  THREAD_LOCK_POLL seconds; order between workers is first come, best effort.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Dict
+
+import anyio
+
+from app.config import (
+    CHAT_QUEUE_TIMEOUT,
+    CHAT_REQUEST_TIMEOUT,
+    THREAD_LOCKS,
+    THREAD_LOCK_WAIT,
+    THREAD_LEASE_GRACE,
+    THREAD_LOCK_POLL,
+)
+from app.db.async_sqlite import get_pool
+
+logger = logging.getLogger(__name__)
+
+# Taken when the thread has no lease or the holder's lease has expired
+ACQUIRE_LEASE_SQL = """
+INSERT INTO thread_leases (thread_id, owner, expires_at) VALUES (?, ?, ?)
+ON CONFLICT (thread_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+WHERE thread_leases.expires_at < ?
+"""
+RELEASE_LEASE_SQL = "DELETE FROM thread_leases WHERE thread_id = ? AND owner = ?"
+
+
+class ThreadBusyError(Exception):
+    """The previous turn on the thread did not finish within THREAD_LOCK_WAIT."""
+
+
+class _LocalLock:
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+# thread_id -> lock; entries are dropped when no turn holds or waits for them
+_local: Dict[str, _LocalLock] = {}
+
+
+async def _acquire_lease(thread_id: str, owner: str, deadline: float) -> bool:
+    pool = await get_pool()
+    while True:
+        now = time.time()
+        async with pool.write() as conn:
+            cursor = await conn.execute(
+                ACQUIRE_LEASE_SQL,
+                (thread_id, owner, now + CHAT_QUEUE_TIMEOUT + CHAT_REQUEST_TIMEOUT + THREAD_LEASE_GRACE, now),
+            )
+        if cursor.rowcount == 1:
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(THREAD_LOCK_POLL)
+
+
+async def _release_lease(thread_id: str, owner: str):
+    try:
+        pool = await get_pool()
+        async with pool.write() as conn:
+            await conn.execute(RELEASE_LEASE_SQL, (thread_id, owner))
+    except Exception as e:
+        # The lease still expires on its own
+        logger.warning(f"Could not release turn lease for thread {thread_id}: {e}")
+
+
+@asynccontextmanager
+async def thread_turn(thread_id: str, timeout: float = THREAD_LOCK_WAIT):
+    """
+    Hold the thread for one turn. Waits for the turn before it (in this or
+    another worker) and raises ThreadBusyError after `timeout` seconds.
+    """
+    deadline = time.monotonic() + timeout
+    entry = _local.setdefault(thread_id, _LocalLock())
+    entry.users += 1
+    try:
+        try:
+            await asyncio.wait_for(entry.lock.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise ThreadBusyError(thread_id) from None
+        owner = f"{os.getpid()}:{uuid.uuid4().hex}" if THREAD_LOCKS == "sqlite" else None
+        try:
+            if owner and not await _acquire_lease(thread_id, owner, deadline):
+                raise ThreadBusyError(thread_id)
+            yield
+        finally:
+            if owner:
+                # Release even while the turn is being cancelled (a no-op if it was never taken)
+                with anyio.CancelScope(shield=True):
+                    await _release_lease(thread_id, owner)
+            entry.lock.release()
+    finally:
+        entry.users -= 1
+        if not entry.users:
+            _local.pop(thread_id, None)
@@ -1,16 +1,142 @@
 from app.db.sqlite_conn import get_connection
+from app.db.async_sqlite import get_pool
+import base64
+import json
+import sqlite3
 import uuid
 from langchain_core.messages import HumanMessage, AIMessage
 
+class ThreadNotFoundError(Exception):
+    """A message was saved to a thread that does not exist."""
+
+
+# Page sizes for thread listing / message history
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# SQL is kept in constants so every call reuses the same cached prepared statement
+INSERT_THREAD_SQL = "INSERT INTO threads (id, name, last_activity_at) VALUES (?, ?, CURRENT_TIMESTAMP)"
+INSERT_MESSAGE_SQL = "INSERT INTO messages (thread_id, role, content) VALUES (?, ?, ?)"
+SELECT_MESSAGES_SQL = "SELECT role, content FROM messages WHERE thread_id=? ORDER BY created_at, id"
+DELETE_THREAD_SQL = "DELETE FROM threads WHERE id=?"
+THREAD_EXISTS_SQL = "SELECT 1 FROM threads WHERE id=?"
+
+_THREAD_COLUMNS = "id, name, created_at, last_message_preview, message_count, last_activity_at"
+_MESSAGE_COLUMNS = "id, role, content, created_at"
+
+# Keyset pages: newest threads first, messages in chronological order.
+# "before" = older than the cursor, "after" = newer than the cursor.
+THREADS_PAGE_SQL = {
+    None: f"SELECT {_THREAD_COLUMNS} FROM threads ORDER BY created_at DESC, id DESC LIMIT ?",
+    "before": f"SELECT {_THREAD_COLUMNS} FROM threads WHERE (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT ?",
+    "after": f"SELECT {_THREAD_COLUMNS} FROM threads WHERE (created_at, id) > (?, ?) ORDER BY created_at, id LIMIT ?",
+}
+MESSAGES_PAGE_SQL = {
+    None: f"SELECT {_MESSAGE_COLUMNS} FROM messages WHERE thread_id=? ORDER BY created_at DESC, id DESC LIMIT ?",
+    "before": f"SELECT {_MESSAGE_COLUMNS} FROM messages WHERE thread_id=? AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT ?",
+    "after": f"SELECT {_MESSAGE_COLUMNS} FROM messages WHERE thread_id=? AND (created_at, id) > (?, ?) ORDER BY created_at, id LIMIT ?",
+}
+
+
+def _to_langchain(rows):
+    messages = []
+    for row in rows:
+        if row["role"] == "user":
+            messages.append(HumanMessage(content=row["content"]))
+        else:
+            messages.append(AIMessage(content=row["content"]))
+    return messages
+
+
+def _to_api(rows):
+    return [
+        {"id": row["id"], "role": row["role"], "content": row["content"], "created_at": row["created_at"]}
+        for row in rows
+    ]
+
+# ==========================================
+# CURSORS / PAGING
+# ==========================================
+
+def encode_cursor(created_at, row_id) -> str:
+    """Opaque cursor for a (created_at, id) position."""
+    raw = json.dumps([created_at, row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor. Raises ValueError on a malformed cursor."""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return created_at, row_id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _page_query(queries: dict, prefix_params: tuple, limit: int, before: str = None, after: str = None):
+    """Pick the keyset query and its parameters. Fetches one extra row to detect more pages."""
+    if before and after:
+        raise ValueError("Use either 'before' or 'after', not both")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    direction = "before" if before else "after" if after else None
+    cursor_params = decode_cursor(before or after) if direction else ()
+    return direction, limit, queries[direction], (*prefix_params, *cursor_params, limit + 1)
+
+
+def _page_result(rows, direction, limit, newest_first: bool):
+    """
+    Trim the extra row and order the page for display.
+    Returns (rows, has_older, has_newer) where has_* are None if unknown.
+    """
+    has_more = len(rows) > limit
+    rows = list(rows[:limit])
+
+    # "after" pages are fetched ascending; the others descending
+    if direction == "after":
+        rows.reverse()
+        has_older, has_newer = True, has_more
+    else:
+        has_older, has_newer = has_more, direction == "before"
+
+    # rows are now newest-first
+    if not newest_first:
+        rows.reverse()
+    return rows, has_older, has_newer
+
+
+def _threads_page(rows, direction, limit):
+    rows, has_older, has_newer = _page_result(rows, direction, limit, newest_first=True)
+    threads = [dict(row) for row in rows]
+    return {
+        "threads": threads,
+        # Next page further down the sidebar (older threads)
+        "next_cursor": encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if rows and has_older else None,
+        # Page above (newer threads)
+        "prev_cursor": encode_cursor(rows[0]["created_at"], rows[0]["id"]) if rows and has_newer else None,
+    }
+
+
+def _messages_page(thread_id, rows, direction, limit):
+    rows, has_older, has_newer = _page_result(rows, direction, limit, newest_first=False)
+    return {
+        "thread_id": thread_id,
+        "messages": _to_api(rows),
+        # Older history (scroll up)
+        "before_cursor": encode_cursor(rows[0]["created_at"], rows[0]["id"]) if rows and has_older else None,
+        # Newer messages
+        "after_cursor": encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if rows and has_newer else None,
+    }
+
+# ==========================================
+# SYNC API (scripts / background threads)
+# ==========================================
+
 # 1️⃣ Create a new thread
 def create_thread(name: str = "New Chat"):
     thread_id = str(uuid.uuid4())
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO threads (id, name) VALUES (?, ?)",
-        (thread_id, name)
-    )
+    cursor.execute(INSERT_THREAD_SQL, (thread_id, name))
     conn.commit()
     conn.close()
     return thread_id
@@ -19,10 +145,7 @@ def create_thread(name: str = "New Chat"):
 def save_message(thread_id: str, role: str, content: str):
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO messages (thread_id, role, content) VALUES (?, ?, ?)",
-        (thread_id, role, content)
-    )
+    cursor.execute(INSERT_MESSAGE_SQL, (thread_id, role, content))
     conn.commit()
     conn.close()
 
@@ -30,57 +153,96 @@ def save_message(thread_id: str, role: str, content: str):
 def get_thread_messages(thread_id: str):
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute(
-        "SELECT role, content FROM messages WHERE thread_id=? ORDER BY created_at",
-        (thread_id,)
-    )
+    cursor.execute(SELECT_MESSAGES_SQL, (thread_id,))
     rows = cursor.fetchall()
     conn.close()
+    return _to_langchain(rows)
 
-    messages = []
-    for row in rows:
-        if row["role"] == "user":
-            messages.append(HumanMessage(content=row["content"]))
-        else:
-            messages.append(AIMessage(content=row["content"]))
-    return messages
-
-# 4️⃣ Get all messages of a thread for API (dicts for frontend)
-def get_thread_messages_for_api(thread_id: str):
+# 4️⃣ Get one page of a thread's messages for API (dicts for frontend)
+def get_thread_messages_for_api(thread_id: str, limit: int = DEFAULT_PAGE_SIZE, before: str = None, after: str = None):
+    direction, limit, sql, params = _page_query(MESSAGES_PAGE_SQL, (thread_id,), limit, before, after)
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute(
-        "SELECT role, content, created_at FROM messages WHERE thread_id=? ORDER BY created_at",
-        (thread_id,)
-    )
+    cursor.execute(sql, params)
     rows = cursor.fetchall()
     conn.close()
+    return _messages_page(thread_id, rows, direction, limit)
 
-    return [
-        {"role": row["role"], "content": row["content"], "created_at": row["created_at"]}
-        for row in rows
-    ]
-
-# 5️⃣ List all threads
-def get_threads():
+# 5️⃣ List one page of threads (with summary columns)
+def get_threads(limit: int = DEFAULT_PAGE_SIZE, before: str = None, after: str = None):
+    direction, limit, sql, params = _page_query(THREADS_PAGE_SQL, (), limit, before, after)
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT id, name, created_at FROM threads ORDER BY created_at DESC")
+    cursor.execute(sql, params)
     rows = cursor.fetchall()
     conn.close()
-    return [dict(row) for row in rows]
+    return _threads_page(rows, direction, limit)
 
 # 6️⃣ Delete a thread and its messages (NEW)
 def delete_thread(thread_id: str):
     conn = get_connection()
     cursor = conn.cursor()
     
-    # First, delete all messages associated with this thread
-    cursor.execute("DELETE FROM messages WHERE thread_id=?", (thread_id,))
-    
-    # Then, delete the thread itself
-    cursor.execute("DELETE FROM threads WHERE id=?", (thread_id,))
+    # Messages are removed by ON DELETE CASCADE (idx_messages_thread_created)
+    cursor.execute(DELETE_THREAD_SQL, (thread_id,))
     
     conn.commit()
     conn.close()
-    return True
\ No newline at end of file
+    return True
+
+# ==========================================
+# ASYNC API (request handlers - never blocks the event loop)
+# ==========================================
+
+async def acreate_thread(name: str = "New Chat"):
+    thread_id = str(uuid.uuid4())
+    pool = await get_pool()
+    async with pool.write() as conn:
+        await conn.execute(INSERT_THREAD_SQL, (thread_id, name))
+    return thread_id
+
+async def athread_exists(thread_id: str) -> bool:
+    pool = await get_pool()
+    async with pool.read() as conn:
+        async with conn.execute(THREAD_EXISTS_SQL, (thread_id,)) as cursor:
+            return await cursor.fetchone() is not None
+
+async def asave_message(thread_id: str, role: str, content: str):
+    """Raises ThreadNotFoundError if the thread does not exist (never created, or deleted meanwhile)."""
+    pool = await get_pool()
+    try:
+        async with pool.write() as conn:
+            await conn.execute(INSERT_MESSAGE_SQL, (thread_id, role, content))
+    except sqlite3.IntegrityError:
+        # messages.thread_id REFERENCES threads(id)
+        raise ThreadNotFoundError(thread_id) from None
+
+async def aget_thread_messages(thread_id: str):
+    pool = await get_pool()
+    async with pool.read() as conn:
+        async with conn.execute(SELECT_MESSAGES_SQL, (thread_id,)) as cursor:
+            rows = await cursor.fetchall()
+    return _to_langchain(rows)
+
+async def aget_thread_messages_for_api(thread_id: str, limit: int = DEFAULT_PAGE_SIZE, before: str = None, after: str = None):
+    direction, limit, sql, params = _page_query(MESSAGES_PAGE_SQL, (thread_id,), limit, before, after)
+    pool = await get_pool()
+    async with pool.read() as conn:
+        async with conn.execute(sql, params) as cursor:
+            rows = await cursor.fetchall()
+    return _messages_page(thread_id, rows, direction, limit)
+
+async def aget_threads(limit: int = DEFAULT_PAGE_SIZE, before: str = None, after: str = None):
+    direction, limit, sql, params = _page_query(THREADS_PAGE_SQL, (), limit, before, after)
+    pool = await get_pool()
+    async with pool.read() as conn:
+        async with conn.execute(sql, params) as cursor:
+            rows = await cursor.fetchall()
+    return _threads_page(rows, direction, limit)
+
+async def adelete_thread(thread_id: str):
+    pool = await get_pool()
+    async with pool.write() as conn:
+        # Messages are removed by ON DELETE CASCADE
+        await conn.execute(DELETE_THREAD_SQL, (thread_id,))
+    return True
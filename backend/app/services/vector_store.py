@@ -0,0 +1,496 @@
+# backend/app/services/vector_store.py
+"""
+Vector store backends.
+
+Every backend exposes the subset of the Pinecone Index API the app uses:
+    upsert(vectors=[{"id", "values", "metadata"}])
+    query(vector, top_k, filter=None, include_metadata=False) -> {"matches": [...]}
+    delete(ids=None, filter=None)
+    list(prefix="") -> pages of ids
+
+- "pinecone": the hosted index (network round-trip per call).
+- "local": per-thread vectors memory-mapped on disk, searched with NumPy.
+  Small threads are searched exactly (brute force); threads with at least
+  LOCAL_ANN_THRESHOLD vectors get an IVF index (k-means partitions, only the
+  `nprobe` closest partitions are scanned). Several processes (uvicorn
+  workers) may share one directory: calls are serialized by a file lock and
+  each process replays what the others appended to a thread's log.
+
+Select with VECTOR_STORE; `get_vector_store()` returns the shared instance
+(created on first use, see app/services/service_registry.py).
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, run a single worker
+    fcntl = None
+
+from app.config import (
+    VECTOR_STORE,
+    VECTOR_STORE_PATH,
+    LOCAL_ANN_THRESHOLD,
+    LOCAL_ANN_NPROBE,
+    LOCAL_MAX_OPEN_THREADS,
+)
+from app.services.service_registry import get_service
+
+logger = logging.getLogger(__name__)
+
+# Vectors without a thread_id live in this partition
+SHARED_PARTITION = "_shared"
+# Fraction of new rows after which the IVF index is rebuilt
+_IVF_REBUILD_GROWTH = 0.2
+
+
+# ==========================================
+# METADATA FILTERS (Pinecone syntax subset)
+# ==========================================
+def matches_filter(metadata: dict, filter: Optional[dict]) -> bool:
+    """
+    {"field": value} or {"field": {"$eq"|"$ne"|"$in"|"$nin"|"$gt"|"$gte"|"$lt"|"$lte": value}},
+    combined with "$and" / "$or" lists. All top-level conditions must hold.
+    """
+    if not filter:
+        return True
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, f) for f in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, f) for f in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if not _compare(op, value, operand):
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def _compare(op: str, value, operand) -> bool:
+    if op == "$eq":
+        return value == operand
+    if op == "$ne":
+        return value != operand
+    if op == "$in":
+        return value in operand
+    if op == "$nin":
+        return value not in operand
+    if value is None:
+        return False
+    if op == "$gt":
+        return value > operand
+    if op == "$gte":
+        return value >= operand
+    if op == "$lt":
+        return value < operand
+    if op == "$lte":
+        return value <= operand
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+# ==========================================
+# LOCAL ENGINE
+# ==========================================
+class _IVFIndex:
+    """Inverted-file index over unit vectors (spherical k-means)."""
+
+    def __init__(self, vectors: np.ndarray, iterations: int = 8, seed: int = 0):
+        n = len(vectors)
+        self.size = n
+        self.nlist = max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+
+        # Train on a sample, then assign every vector
+        sample = vectors[rng.choice(n, size=min(n, 64 * self.nlist), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=self.nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(self.nlist):
+                members = sample[assign == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            centroids /= np.linalg.norm(centroids, axis=1, keepdims=True) + 1e-12
+        self.centroids = centroids.astype(np.float32)
+
+        assign = np.empty(n, dtype=np.int32)
+        for start in range(0, n, 8192):
+            assign[start:start + 8192] = np.argmax(vectors[start:start + 8192] @ self.centroids.T, axis=1)
+        # CSR layout: rows of list c are order[offsets[c]:offsets[c + 1]]
+        self.order = np.argsort(assign, kind="stable").astype(np.int64)
+        self.offsets = np.searchsorted(assign[self.order], np.arange(self.nlist + 1))
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        nprobe = min(nprobe, self.nlist)
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probe])
+
+
+class _Partition:
+    """
+    One thread's vectors.
+
+    vectors.f32 : float32 unit vectors, row-major, memory-mapped for search
+    log.jsonl   : {"dim"} header, then {"put": id, "row", "metadata"} / {"del": id}
+    Upserting an existing id overwrites its row; deletes are tombstones until
+    the partition is rewritten.
+
+    Other processes append to the same files: `refresh()` applies the log
+    records written since this process last read it.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.dim: Optional[int] = None
+        self.ids: List[str] = []
+        self.metadata: List[dict] = []
+        self.rows: Dict[str, int] = {}
+        self._alive = np.zeros(1024, dtype=bool)
+        self.vectors: Optional[np.ndarray] = None
+        self.ivf: Optional[_IVFIndex] = None
+        # The log file read (inode) and how far
+        self._log_inode: Optional[int] = None
+        self._log_offset = 0
+        self._load()
+
+    @property
+    def alive(self) -> np.ndarray:
+        """Live-row mask (a view; rows are tombstoned in place)."""
+        return self._alive[:len(self.ids)]
+
+    @property
+    def live_count(self) -> int:
+        return int(self.alive.sum())
+
+    def _load(self):
+        try:
+            f = open(self.path / "log.jsonl", "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            self._log_inode = os.fstat(f.fileno()).st_ino
+            self._read_log(f)
+        self._map()
+
+    def refresh(self) -> bool:
+        """
+        Apply records appended to the log by other processes.
+        False if the partition was dropped or recreated meanwhile (open it again).
+        """
+        try:
+            stat = (self.path / "log.jsonl").stat()
+        except FileNotFoundError:
+            return self._log_inode is None
+        if stat.st_ino != self._log_inode or stat.st_size < self._log_offset:
+            return False
+        if stat.st_size > self._log_offset:
+            with open(self.path / "log.jsonl", "rb") as f:
+                f.seek(self._log_offset)
+                self._read_log(f)
+            self._map()
+        return True
+
+    def _read_log(self, f):
+        for line in f:
+            op = json.loads(line)
+            if "dim" in op:
+                self.dim = op["dim"]
+            elif "put" in op:
+                if op["row"] < len(self.ids):
+                    self.ivf = None  # an overwritten row stays in its old IVF list
+                self._apply_put(op["put"], op["row"], op["metadata"])
+            elif "del" in op and op["del"] in self.rows:
+                self.alive[self.rows.pop(op["del"])] = False
+        self._log_offset = f.tell()
+
+    def _append_log(self, lines: List[str]):
+        """Append whole records, or nothing: a failed write is cut back off the log."""
+        with open(self.path / "log.jsonl", "ab") as f:
+            end = f.tell()
+            try:
+                f.write(("\n".join(lines) + "\n").encode("utf-8"))
+                f.flush()
+            except BaseException:
+                f.truncate(end)
+                raise
+            self._log_inode, self._log_offset = os.fstat(f.fileno()).st_ino, f.tell()
+
+    def _apply_put(self, vector_id: str, row: int, metadata: dict):
+        if row == len(self.ids):
+            if row == len(self._alive):
+                self._alive = np.concatenate([self._alive, np.zeros(len(self._alive), dtype=bool)])
+            self.ids.append(vector_id)
+            self.metadata.append(metadata)
+            self._alive[row] = True
+        else:
+            self.ids[row] = vector_id
+            self.metadata[row] = metadata
+            self.alive[row] = True
+        self.rows[vector_id] = row
+
+    def _map(self):
+        if not self.ids:
+            self.vectors = None
+            return
+        self.vectors = np.memmap(self.path / "vectors.f32", dtype=np.float32, mode="r",
+                                 shape=(len(self.ids), self.dim))
+
+    def upsert(self, items: List[tuple]):
+        """
+        items: [(id, unit vector, metadata)]
+
+        Vectors are written first, each at its row's offset, then the log;
+        the in-memory state follows only once both succeeded. A failure leaves
+        at most unlogged bytes past the last row, which the next append overwrites.
+        """
+        dim = self.dim if self.dim is not None else len(items[0][1])
+        log_lines = [] if self.dim is not None else [json.dumps({"dim": dim})]
+
+        puts, rows, vectors = [], {}, {}
+        next_row = len(self.ids)
+        for vector_id, vector, metadata in items:
+            if len(vector) != dim:
+                raise ValueError(f"Vector dimension {len(vector)} does not match index dimension {dim}")
+            row = rows.get(vector_id, self.rows.get(vector_id))
+            if row is None:
+                row, next_row = next_row, next_row + 1
+            rows[vector_id] = row
+            vectors[row] = vector
+            puts.append((vector_id, row, metadata))
+            log_lines.append(json.dumps({"put": vector_id, "row": row, "metadata": metadata}, ensure_ascii=False))
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path / "vectors.f32", os.O_RDWR | os.O_CREAT, 0o644)
+        with open(fd, "r+b") as f:
+            for row in (row for row in vectors if row < len(self.ids)):
+                f.seek(row * dim * 4)
+                f.write(np.asarray(vectors[row], dtype=np.float32).tobytes())
+            if next_row > len(self.ids):
+                f.seek(len(self.ids) * dim * 4)
+                f.write(np.asarray([vectors[row] for row in range(len(self.ids), next_row)], dtype=np.float32).tobytes())
+        self._append_log(log_lines)
+
+        self.dim = dim
+        if any(row < len(self.ids) for row in vectors):
+            self.ivf = None  # an overwritten row stays in its old IVF list
+        for vector_id, row, metadata in puts:
+            self._apply_put(vector_id, row, metadata)
+        self._map()
+
+    def delete(self, ids):
+        removed = [vector_id for vector_id in ids if vector_id in self.rows]
+        if not removed:
+            return
+        self._append_log([json.dumps({"del": vector_id}) for vector_id in removed])
+        for vector_id in removed:
+            self.alive[self.rows.pop(vector_id)] = False
+
+    def search(self, query: np.ndarray, top_k: int, filter: Optional[dict], nprobe: int, ann_threshold: int):
+        if self.vectors is None or not self.live_count:
+            return []
+        n = len(self.ids)
+
+        if self.live_count >= ann_threshold:
+            if self.ivf is None or n - self.ivf.size > _IVF_REBUILD_GROWTH * self.ivf.size:
+                self.ivf = _IVFIndex(np.asarray(self.vectors))
+            # Probed lists + rows added since the index was built
+            rows = np.concatenate([self.ivf.candidates(query, nprobe), np.arange(self.ivf.size, n)])
+        else:
+            rows = None
+
+        if rows is None:
+            scores = np.asarray(self.vectors @ query)
+            valid = self.alive.copy()
+        else:
+            scores = np.full(n, -np.inf, dtype=np.float32)
+            scores[rows] = self.vectors[rows] @ query
+            valid = np.zeros(n, dtype=bool)
+            valid[rows] = self.alive[rows]
+
+        if filter:
+            for row in np.flatnonzero(valid):
+                if not matches_filter(self.metadata[row], filter):
+                    valid[row] = False
+        candidates = np.flatnonzero(valid)
+        if not len(candidates):
+            return []
+        k = min(top_k, len(candidates))
+        best = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        best = best[np.argsort(-scores[best])]
+        return [(self.ids[row], float(scores[row]), self.metadata[row]) for row in best]
+
+
+class LocalVectorStore:
+    """
+    Embedded vector store: one directory per thread under `root`.
+    Safe to call from worker threads (asyncio.to_thread), like the Pinecone client,
+    and from several processes: writes hold an exclusive flock on `root/.lock`,
+    reads a shared one, and open partitions are refreshed from their log first.
+    """
+
+    def __init__(
+        self,
+        root: str = VECTOR_STORE_PATH,
+        ann_threshold: int = LOCAL_ANN_THRESHOLD,
+        nprobe: int = LOCAL_ANN_NPROBE,
+        max_open: int = LOCAL_MAX_OPEN_THREADS,
+    ):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.ann_threshold = ann_threshold
+        self.nprobe = nprobe
+        self.max_open = max_open
+        self._open: "OrderedDict[str, _Partition]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._lock_file = open(self.root / ".lock", "a+b")
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _dirname(partition: str) -> str:
+        # Thread ids are UUIDs; anything else is hashed into a safe name
+        if re.fullmatch(r"[A-Za-z0-9_-]{1,64}", partition):
+            return partition
+        return hashlib.sha1(partition.encode("utf-8")).hexdigest()
+
+    def _partition(self, name: str) -> _Partition:
+        key = self._dirname(name)
+        if key in self._open and self._open[key].refresh():
+            self._open.move_to_end(key)
+            return self._open[key]
+        partition = _Partition(self.root / key)
+        self._open[key] = partition
+        while len(self._open) > self.max_open:
+            self._open.popitem(last=False)
+        return partition
+
+    def _partition_names(self) -> List[str]:
+        names = set(self._open)
+        names.update(p.name for p in self.root.iterdir() if p.is_dir())
+        return sorted(names)
+
+    def _owner(self, vector_id: str, names: List[str]) -> List[str]:
+        """Partitions that may hold `vector_id` (chunk ids start with "<thread_id>_")."""
+        owners = [name for name in names if vector_id.startswith(name + "_")]
+        return owners or names
+
+    @staticmethod
+    def _thread_of(filter: Optional[dict]) -> Optional[str]:
+        value = (filter or {}).get("thread_id")
+        if isinstance(value, dict):
+            value = value.get("$eq")
+        return value if isinstance(value, str) else None
+
+    def upsert(self, vectors):
+        by_partition: Dict[str, list] = {}
+        for v in vectors:
+            values = np.asarray(v["values"], dtype=np.float32)
+            values /= np.linalg.norm(values) + 1e-12
+            metadata = v.get("metadata") or {}
+            by_partition.setdefault(metadata.get("thread_id") or SHARED_PARTITION, []).append((v["id"], values, metadata))
+        with self._locked(exclusive=True):
+            for name, items in by_partition.items():
+                self._partition(name).upsert(items)
+        return {"upserted_count": len(vectors)}
+
+    def query(self, vector, top_k: int = 10, filter: Optional[dict] = None, include_metadata: bool = False, **kwargs):
+        query = np.asarray(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) + 1e-12
+        thread_id = self._thread_of(filter)
+        rest = {k: v for k, v in (filter or {}).items() if k != "thread_id"} if thread_id else filter
+
+        with self._locked(exclusive=False):
+            names = [thread_id] if thread_id else self._partition_names()
+            hits = []
+            for name in names:
+                hits.extend(self._partition(name).search(query, top_k, rest, self.nprobe, self.ann_threshold))
+        hits.sort(key=lambda hit: -hit[1])
+        return {"matches": [
+            {"id": vector_id, "score": score, "metadata": metadata if include_metadata else None}
+            for vector_id, score, metadata in hits[:top_k]
+        ]}
+
+    def delete(self, ids=None, filter=None, **kwargs):
+        with self._locked(exclusive=True):
+            if ids is not None:
+                names = self._partition_names()
+                by_partition: Dict[str, list] = {}
+                for vector_id in ids:
+                    for name in self._owner(vector_id, names):
+                        by_partition.setdefault(name, []).append(vector_id)
+                for name, partition_ids in by_partition.items():
+                    self._partition(name).delete(partition_ids)
+                    self._drop_if_empty(name)
+            elif filter:
+                thread_id = self._thread_of(filter)
+                if thread_id and set(filter) == {"thread_id"}:
+                    self._drop(thread_id)
+                    return
+                for name in ([thread_id] if thread_id else self._partition_names()):
+                    partition = self._partition(name)
+                    partition.delete([partition.ids[row] for row in np.flatnonzero(partition.alive)
+                                      if matches_filter(partition.metadata[row], filter)])
+                    self._drop_if_empty(name)
+
+    def list(self, prefix: str = "", limit: int = 100):
+        with self._locked(exclusive=False):
+            ids = sorted(
+                vector_id
+                for name in self._owner(prefix, self._partition_names())
+                for vector_id in self._partition(name).rows
+                if vector_id.startswith(prefix)
+            )
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+    def _drop_if_empty(self, name: str):
+        partition = self._open.get(self._dirname(name))
+        if partition is not None and partition.ids and not partition.live_count:
+            self._drop(name)
+
+    def _drop(self, name: str):
+        key = self._dirname(name)
+        self._open.pop(key, None)
+        shutil.rmtree(self.root / key, ignore_errors=True)
+
+
+# ==========================================
+# FACTORY
+# ==========================================
+def create_vector_store():
+    """A new instance of the configured backend."""
+    if VECTOR_STORE == "local":
+        logger.info(f"Using local vector store at {os.path.abspath(VECTOR_STORE_PATH)}")
+        return LocalVectorStore()
+    from pinecone import Pinecone
+    return Pinecone(api_key=os.getenv("PINECONE_API_KEY")).Index(os.getenv("PINECONE_INDEX_NAME", "chatbot"))
+
+
+def get_vector_store():
+    """The shared backend (ingestion, search and deletion), created on first use."""
+    return get_service("vector_store")
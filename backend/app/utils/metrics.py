@@ -0,0 +1,173 @@
+"""
+In-process metrics in Prometheus text format (GET /metrics).
+
+Counter / Gauge / Histogram with labels, kept per worker process (each
+uvicorn worker serves its own numbers; scrape workers separately or run one
+worker per port). A Counter or Gauge built with `function=` is read when
+/metrics is rendered instead of being updated on the hot path; it returns a
+value, or {label values tuple: value}.
+
+Per-turn timing breakdown: chat_service calls start_timings() at the start of
+a turn. Every `timed(...)` block (and add_timing()) in the same task, or in
+tasks and threads started from it, adds its milliseconds to that turn's phase.
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Seconds: from sub-millisecond SQLite calls to minute-long agent runs
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_registry: List["_Metric"] = []
+_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), function: Callable = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self._values: Dict[tuple, float] = {}
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _samples(self):
+        if self.function is None:
+            with _lock:
+                values = dict(self._values)
+        else:
+            values = self.function()
+            if not isinstance(values, dict):
+                values = {(): values}
+        for key, value in sorted(values.items()):
+            yield self.name, self.labelnames, key, value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, labelnames, key, value in self._samples():
+            lines.append(f"{name}{_format_labels(labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with _lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [count per bucket (+Inf last), sum]
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        for key, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def render() -> str:
+    """Every registered metric in Prometheus text exposition format (0.0.4)."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ==========================================
+# PER-TURN TIMING BREAKDOWN
+# ==========================================
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("timings", default=None)
+
+
+def start_timings() -> Dict[str, float]:
+    """Collect phase timings (ms) for the current turn into the returned dict."""
+    timings: Dict[str, float] = {}
+    _timings.set(timings)
+    return timings
+
+
+def add_timing(phase: str, seconds: float):
+    timings = _timings.get()
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + seconds * 1000
+
+
+@contextmanager
+def timed(histogram: Histogram, phase: Optional[str] = None, **labels):
+    """Observe the block's duration in `histogram` (and in the turn's `phase`, if given)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        histogram.observe(elapsed, **labels)
+        if phase:
+            add_timing(phase, elapsed)
@@ -1,43 +1,35 @@
-import os
 from dotenv import load_dotenv
-from pinecone import Pinecone
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.document_loaders import PyPDFLoader, TextLoader, UnstructuredWordDocumentLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
-from pathlib import Path
+from app.services.service_registry import get_service
 
 load_dotenv()
 
-# --- Configuration ---
-INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "chatbot")
-
 class DocumentSearchInput(BaseModel):
     query: str = Field(description="Search query to find relevant information in uploaded documents")
     thread_id: str = Field(description="Thread ID to search documents for this specific conversation")
 
 class RAGManager:
-    def __init__(self):
+    # Clients are shared with ingestion and created on first use (service registry)
+    @property
+    def embeddings(self):
         # 1. Google Embeddings
-        self.embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/text-embedding-004",
-            google_api_key=os.getenv("GOOGLE_API_KEY")
-        )
-        
-        # 2. Pinecone client
-        self.pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-        self.index = self.pc.Index(INDEX_NAME)
+        return get_service("embeddings")
+
+    @property
+    def index(self):
+        # 2. Vector store shared with ingestion (Pinecone or local, see VECTOR_STORE)
+        return get_service("vector_store")
 
     def search(self, query: str, thread_id: str, k: int = 3):
         """
-        Search Pinecone for relevant documents filtered by thread_id.
+        Search the vector store for relevant documents filtered by thread_id.
         """
         try:
             # 1. Embed the query
             query_vector = self.embeddings.embed_query(query)
             
-            # 2. Query Pinecone with thread_id filter
+            # 2. Query the vector store with thread_id filter
             results = self.index.query(
                 vector=query_vector,
                 top_k=k,
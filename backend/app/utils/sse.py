@@ -0,0 +1,45 @@
+# backend/app/utils/sse.py
+"""
+Server-Sent Events framing.
+
+Every frame is `id:` (optional) + `event:` + a single JSON `data:` line,
+terminated by a blank line. Comment frames (": ...") are ignored by clients
+and are used as keep-alives.
+"""
+import json
+from typing import Optional
+
+
+def sse_event(event: str, data: dict, event_id: Optional[str] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def sse_comment(text: str = "keep-alive") -> str:
+    return f": {text}\n\n"
+
+
+def sse_retry(milliseconds: int) -> str:
+    """Tell the client how long to wait before reconnecting."""
+    return f"retry: {milliseconds}\n\n"
+
+
+def event_id(run_id: str, seq: int) -> str:
+    return f"{run_id}:{seq}"
+
+
+def parse_last_event_id(value: Optional[str]) -> int:
+    """
+    Sequence number from a Last-Event-ID header ("<run_id>:<seq>" or "<seq>").
+    Missing or malformed ids mean "from the start".
+    """
+    if not value:
+        return 0
+    try:
+        return max(int(value.rsplit(":", 1)[-1]), 0)
+    except ValueError:
+        return 0
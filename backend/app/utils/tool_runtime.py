@@ -0,0 +1,165 @@
+"""
+Shared async execution layer for the agent tools.
+
+- One pooled async HTTP client (keep-alive connections) instead of a new client per call.
+- A TTL + LRU result cache per tool.
+- Request coalescing: concurrent identical lookups share one upstream call.
+  If every caller goes away (timeout / client disconnect) the upstream call is cancelled.
+- Hit / miss / coalesced / error counters per tool (see tool_cache_stats()).
+"""
+import asyncio
+import time
+from collections import OrderedDict
+
+from app.config import TOOL_CACHE_TTLS, TOOL_CACHE_MAX_ENTRIES, TOOL_TIMEOUTS, HTTP_POOL_MAXSIZE
+from app.utils.metrics import Counter
+
+
+class ToolResultError(Exception):
+    """A lookup failed in an expected way; the message is shown to the model as-is."""
+
+
+class _Inflight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+# Every ToolCache, including those created outside this module (query embeddings)
+_all_caches: list = []
+
+
+def _cache_requests() -> dict:
+    counts = {}
+    for cache in _all_caches:
+        for result in ("hits", "misses", "coalesced", "errors"):
+            counts[(cache.name, result)] = getattr(cache, result)
+    return counts
+
+
+TOOL_CACHE_REQUESTS = Counter(
+    "tool_cache_requests_total", "Tool cache lookups by result", ("cache", "result"), function=_cache_requests
+)
+
+
+class ToolCache:
+    def __init__(self, name: str, ttl: float, max_entries: int = TOOL_CACHE_MAX_ENTRIES):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: dict = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        _all_caches.append(self)
+
+    async def _run(self, key: str, compute):
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+        else:
+            now = time.monotonic()
+            self._data[key] = (now + self.ttl, value)
+            self._data.move_to_end(key)
+            # Over the cap, or expired at the least recently used end (entries otherwise expire only when read)
+            while self._data and (len(self._data) > self.max_entries or next(iter(self._data.values()))[0] <= now):
+                self._data.popitem(last=False)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get_or_compute(self, key: str, compute):
+        """
+        Return the cached value for `key`, or run `compute()` (a coroutine factory) once.
+        Exceptions are not cached and are re-raised to every waiting caller.
+        """
+        entry = self._data.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            inflight = _Inflight(asyncio.ensure_future(self._run(key, compute)))
+            self._inflight[key] = inflight
+            self.misses += 1
+        else:
+            self.coalesced += 1
+
+        inflight.waiters += 1
+        try:
+            # shield: one caller going away must not cancel the others' result
+            return await asyncio.shield(inflight.task)
+        except asyncio.CancelledError:
+            if inflight.waiters == 1 and not inflight.task.done():
+                inflight.task.cancel()
+            raise
+        finally:
+            inflight.waiters -= 1
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+        }
+
+
+_caches = {name: ToolCache(name, ttl) for name, ttl in TOOL_CACHE_TTLS.items()}
+
+
+def tool_cache(name: str) -> ToolCache:
+    return _caches[name]
+
+
+def tool_cache_stats() -> dict:
+    return {name: cache.stats() for name, cache in _caches.items()}
+
+
+def tool_timeout(name: str) -> float:
+    return TOOL_TIMEOUTS.get(name, 10.0)
+
+
+async def run_blocking(name: str, func, *args):
+    """
+    Run a blocking client call (yfinance, ddgs, Pinecone) in a worker thread under
+    the tool's deadline. On timeout/cancellation the caller returns at once; the
+    thread finishes in the background.
+    """
+    return await asyncio.wait_for(asyncio.to_thread(func, *args), tool_timeout(name))
+
+
+# Shared async HTTP client; connections are reused across tool calls.
+# Created on first use (httpx/httpcore are slow to import).
+_http_client = None
+
+
+def get_http_client():
+    global _http_client
+    if _http_client is None:
+        import httpx
+
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=HTTP_POOL_MAXSIZE, max_keepalive_connections=HTTP_POOL_MAXSIZE),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Close pooled connections (called on application shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
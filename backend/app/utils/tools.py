@@ -1,10 +1,12 @@
-import requests
-import yfinance as yf
-from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
-from langchain_core.tools import tool
+import ast
+import asyncio
+from langchain_core.tools import tool, ToolException
 from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field
 
+from app.config import WEATHER_API_BASE
+from app.utils.tool_runtime import get_http_client, tool_cache, tool_timeout, run_blocking, ToolResultError
+
 # ==========================================
 # 1. SEARCH TOOL
 # ==========================================
@@ -13,8 +15,23 @@ class SearchInput(BaseModel):
         description="Search query for finding current information, news, facts, or events."
     )
 
+# One wrapper for all searches instead of one per call (created on first search)
+_search_wrapper = None
+
+def _fetch_search(query: str) -> str:
+    global _search_wrapper
+    if _search_wrapper is None:
+        from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
+        _search_wrapper = DuckDuckGoSearchAPIWrapper(max_results=5)
+    results = _search_wrapper.run(query)
+    
+    if not results or results.strip() == "":
+        raise ToolResultError(f"No search results found for '{query}'. Try rephrasing your search query.")
+    
+    return results
+
 @tool("duckduckgo_search", args_schema=SearchInput)
-def duckduckgo_search(query: str) -> str:
+async def duckduckgo_search(query: str) -> str:
     """
     Search the web for current information, news, events, and facts.
     
@@ -29,16 +46,17 @@ def duckduckgo_search(query: str) -> str:
     Returns: Text with relevant search results
     """
     try:
-        wrapper = DuckDuckGoSearchAPIWrapper(max_results=5)
-        results = wrapper.run(query)
-        
-        if not results or results.strip() == "":
-            return f"No search results found for '{query}'. Try rephrasing your search query."
-        
-        return results
+        return await tool_cache("duckduckgo_search").get_or_compute(
+            " ".join(query.lower().split()),
+            lambda: run_blocking("duckduckgo_search", _fetch_search, query)
+        )
     
+    except ToolResultError as e:
+        raise ToolException(str(e))
+    except asyncio.TimeoutError:
+        raise ToolException("Search timed out. Please try again or answer without searching.")
     except Exception as e:
-        return f"Search error: {str(e)}. Please try a different query."
+        raise ToolException(f"Search error: {str(e)}. Please try a different query.")
 
 # ==========================================
 # 2. CALCULATOR
@@ -48,8 +66,27 @@ class CalculatorInput(BaseModel):
         description="Mathematical expression to evaluate. Examples: '5 + 3', '100 * 2.5'"
     )
 
+# Evaluated on the event loop, so the work must stay tiny: no powers (9**9**9
+# would hold the worker for minutes), short expressions, bounded numbers
+_CALC_MAX_LENGTH = 200
+_CALC_MAX_NUMBER_DIGITS = 30
+_CALC_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.UAdd, ast.USub)
+
+
+def _check_expression(expression: str):
+    if len(expression) > _CALC_MAX_LENGTH:
+        raise ToolException(f"Error: Expression too long (at most {_CALC_MAX_LENGTH} characters).")
+    for node in ast.walk(ast.parse(expression, mode="eval")):
+        if isinstance(node, (ast.BinOp, ast.UnaryOp)) and not isinstance(node.op, _CALC_OPERATORS):
+            raise ToolException("Error: Only +, -, *, / and parentheses are supported.")
+        if isinstance(node, ast.Constant) and len(str(node.value)) > _CALC_MAX_NUMBER_DIGITS:
+            raise ToolException(f"Error: Numbers are limited to {_CALC_MAX_NUMBER_DIGITS} digits.")
+        if not isinstance(node, (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.operator, ast.unaryop)):
+            raise ToolException("Error: Only numbers and operators are supported.")
+
+
 @tool("calculator", args_schema=CalculatorInput)
-def calculator(expression: str) -> str:
+async def calculator(expression: str) -> str:
     """
     Perform mathematical calculations.
     
@@ -61,15 +98,18 @@ def calculator(expression: str) -> str:
     try:
         allowed_chars = set("0123456789+-*/(). ")
         if not all(char in allowed_chars for char in expression):
-            return "Error: Invalid characters. Only use numbers and operators (+, -, *, /, parentheses)."
-        
+            raise ToolException("Error: Invalid characters. Only use numbers and operators (+, -, *, /, parentheses).")
+        _check_expression(expression)
+
         result = eval(expression)
         return f"{expression} = {result}"
     
+    except ToolException:
+        raise
     except ZeroDivisionError:
-        return "Error: Division by zero."
+        raise ToolException("Error: Division by zero.")
     except Exception as e:
-        return f"Calculation error: {str(e)}"
+        raise ToolException(f"Calculation error: {str(e)}")
 
 # ==========================================
 # 3. STOCK PRICE TOOL
@@ -79,8 +119,26 @@ class StockInput(BaseModel):
         description="Stock ticker symbol (e.g., 'AAPL', 'GOOGL', 'TSLA')"
     )
 
+def _fetch_stock_price(symbol: str) -> str:
+    # yfinance pulls in pandas: imported on the first lookup, not at startup
+    import yfinance as yf
+
+    ticker = yf.Ticker(symbol)
+    price = ticker.fast_info.get('last_price')
+    
+    if price is None:
+        hist = ticker.history(period="1d")
+        if not hist.empty:
+            price = hist['Close'].iloc[-1]
+    
+    if price:
+        currency = ticker.fast_info.get('currency', 'USD')
+        return f"{symbol} is currently trading at {round(price, 2)} {currency}"
+    else:
+        raise ToolResultError(f"Could not retrieve price for {symbol}. Verify the ticker symbol.")
+
 @tool("get_stock_price", args_schema=StockInput)
-def get_stock_price(symbol: str) -> str:
+async def get_stock_price(symbol: str) -> str:
     """
     Get current stock price for a ticker symbol.
     
@@ -89,22 +147,17 @@ def get_stock_price(symbol: str) -> str:
     Returns: Current stock price and currency
     """
     try:
-        ticker = yf.Ticker(symbol.upper())
-        price = ticker.fast_info.get('last_price')
-        
-        if price is None:
-            hist = ticker.history(period="1d")
-            if not hist.empty:
-                price = hist['Close'].iloc[-1]
-        
-        if price:
-            currency = ticker.fast_info.get('currency', 'USD')
-            return f"{symbol.upper()} is currently trading at {round(price, 2)} {currency}"
-        else:
-            return f"Could not retrieve price for {symbol.upper()}. Verify the ticker symbol."
+        symbol = symbol.strip().upper()
+        return await tool_cache("get_stock_price").get_or_compute(
+            symbol, lambda: run_blocking("get_stock_price", _fetch_stock_price, symbol)
+        )
     
+    except ToolResultError as e:
+        raise ToolException(str(e))
+    except asyncio.TimeoutError:
+        raise ToolException(f"Stock price lookup for {symbol} timed out. Please try again.")
     except Exception as e:
-        return f"Error fetching stock price: {str(e)}"
+        raise ToolException(f"Error fetching stock price: {str(e)}")
 
 # ==========================================
 # 4. WEATHER TOOL
@@ -114,32 +167,42 @@ class WeatherInput(BaseModel):
         description="City name (e.g., 'London', 'New York', 'Tokyo')"
     )
 
+async def _fetch_weather(city: str) -> str:
+    url = f"{WEATHER_API_BASE}/{city}?format=j1"
+    response = await get_http_client().get(url, timeout=tool_timeout("get_weather"))
+    
+    if response.status_code == 200:
+        data = response.json()
+        current = data['current_condition'][0]
+        
+        temp_c = current['temp_C']
+        temp_f = current['temp_F']
+        condition = current['weatherDesc'][0]['value']
+        humidity = current['humidity']
+        
+        return f"Weather in {city.title()}: {temp_c}°C ({temp_f}°F), {condition}, Humidity: {humidity}%"
+    else:
+        raise ToolResultError(f"Could not find weather for '{city}'.")
+
 @tool("get_weather", args_schema=WeatherInput)
-def get_weather(city: str) -> str:
+async def get_weather(city: str) -> str:
     """
     Get current weather for a city.
     
     Returns: Temperature, condition, and humidity
     """
     try:
-        url = f"https://wttr.in/{city}?format=j1"
-        response = requests.get(url, timeout=5)
-        
-        if response.status_code == 200:
-            data = response.json()
-            current = data['current_condition'][0]
-            
-            temp_c = current['temp_C']
-            temp_f = current['temp_F']
-            condition = current['weatherDesc'][0]['value']
-            humidity = current['humidity']
-            
-            return f"Weather in {city.title()}: {temp_c}°C ({temp_f}°F), {condition}, Humidity: {humidity}%"
-        else:
-            return f"Could not find weather for '{city}'."
+        return await tool_cache("get_weather").get_or_compute(
+            " ".join(city.lower().split()),
+            lambda: asyncio.wait_for(_fetch_weather(city), tool_timeout("get_weather"))
+        )
     
+    except ToolResultError as e:
+        raise ToolException(str(e))
+    except asyncio.TimeoutError:
+        raise ToolException(f"Weather lookup for '{city}' timed out.")
     except Exception as e:
-        return f"Weather error: {str(e)}"
+        raise ToolException(f"Weather error: {str(e)}")
 
 # ==========================================
 # 5. DOCUMENT SEARCH TOOL (with config for thread_id)
@@ -150,7 +213,7 @@ class DocumentSearchInput(BaseModel):
     )
 
 @tool("search_documents", args_schema=DocumentSearchInput)
-def search_documents(query: str, config: RunnableConfig) -> str:
+async def search_documents(query: str, config: RunnableConfig) -> str:
     """
     Search through uploaded PDF documents (Knowledge Base).
     
@@ -168,13 +231,13 @@ def search_documents(query: str, config: RunnableConfig) -> str:
         thread_id = config.get("configurable", {}).get("thread_id", "")
         
         if not thread_id:
-            return "Error: No thread ID found. Cannot search documents."
+            raise ToolException("Error: No thread ID found. Cannot search documents.")
         
         # Import here to avoid circular imports
         from app.services.rag_service import search_documents as rag_search
         
         # Call the RAG search with thread_id
-        contexts = rag_search(query, thread_id, top_k=3)
+        contexts = await asyncio.wait_for(rag_search(query, thread_id, 3), tool_timeout("search_documents"))
         
         if not contexts:
             return "No relevant information found in your uploaded documents."
@@ -189,10 +252,19 @@ def search_documents(query: str, config: RunnableConfig) -> str:
         
         return "\n\n---\n\n".join(formatted_results)
     
+    except ToolException:
+        raise
+    except asyncio.TimeoutError:
+        raise ToolException("Document search timed out. Please try again.")
     except Exception as e:
-        return f"Error searching documents: {str(e)}"
+        raise ToolException(f"Error searching documents: {str(e)}")
 
 # ==========================================
 # EXPORT ALL TOOLS
 # ==========================================
-tools = [duckduckgo_search, calculator, get_stock_price, get_weather, search_documents]
\ No newline at end of file
+tools = [duckduckgo_search, calculator, get_stock_price, get_weather, search_documents]
+
+# A failed lookup still reaches the model as its message, but on a ToolMessage
+# with status="error", so callers can tell it from a result (not cached, counted)
+for _tool in tools:
+    _tool.handle_tool_error = True
\ No newline at end of file
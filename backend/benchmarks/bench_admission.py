@@ -0,0 +1,137 @@
+"""
+Admission control under a burst: concurrency cap, wait queue and 429s.
+
+Starts one uvicorn worker on benchmarks.load_app (EchoChatModel) with
+CHAT_MAX_CONCURRENT_RUNS=--slots and CHAT_MAX_QUEUED=--queue, then:
+    1. sends --burst messages on distinct threads at once: slots + queue are
+       admitted, the rest must get 429 + Retry-After without waiting;
+       admitted turns report queue wait ("queue_ms") separately from run time
+    2. sends 5 messages on one thread at once with a per-thread bucket of 3:
+       2 must be rejected (thread_rate)
+and prints /chat/admission.
+
+Run from backend/:
+    python -m benchmarks.bench_admission [--slots 4] [--queue 8] [--burst 40] [--latency 0.5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_startup import free_port, wait_for
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+THREAD_BURST = 3
+
+
+async def send(client, thread_id, message):
+    """Returns (status, seconds to response headers, seconds to end, retry_after, done data)."""
+    started = time.perf_counter()
+    async with client.stream("POST", "/chat/send", json={"message": message, "thread_id": thread_id}) as response:
+        headers_at = time.perf_counter() - started
+        if response.status_code != 200:
+            await response.aread()
+            return response.status_code, headers_at, headers_at, response.headers.get("Retry-After"), None
+        done, event = None, None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: ") and event == "done":
+                done = json.loads(line[6:])
+        return 200, headers_at, time.perf_counter() - started, None, done
+
+
+def pct(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))] if values else float("nan")
+
+
+async def drive(args, base_url):
+    async with httpx.AsyncClient(base_url=base_url, timeout=httpx.Timeout(None),
+                                 limits=httpx.Limits(max_connections=args.burst + 10)) as client:
+        async def new_thread():
+            return (await client.post("/thread/create")).json()["thread_id"]
+
+        threads = [await new_thread() for _ in range(args.burst)]
+        results = await asyncio.gather(*(send(client, t, f"burst {i}") for i, t in enumerate(threads)))
+
+        one = await new_thread()
+        thread_results = await asyncio.gather(*(send(client, one, f"same {i}") for i in range(5)))
+        stats = (await client.get("/chat/admission")).json()
+    return results, thread_results, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--slots", type=int, default=4, help="CHAT_MAX_CONCURRENT_RUNS")
+    parser.add_argument("--queue", type=int, default=8, help="CHAT_MAX_QUEUED")
+    parser.add_argument("--burst", type=int, default=40, help="messages sent at once on distinct threads")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake model time to first token (s)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_admission_")
+    env = dict(os.environ)
+    env.update(
+        PYTHONPATH=BACKEND_DIR,
+        PYTHONWARNINGS="ignore",
+        GROQ_API_KEY="offline",
+        DATABASE_PATH=os.path.join(workdir, "chatbot.db"),
+        VECTOR_STORE="local",
+        VECTOR_STORE_PATH=os.path.join(workdir, "vectors"),
+        SUMMARY_ENABLED="false",
+        RESPONSE_CACHE_ENABLED="false",
+        CHAT_MAX_CONCURRENT_RUNS=str(args.slots),
+        CHAT_MAX_QUEUED=str(args.queue),
+        CHAT_CLIENT_RATE_PER_MIN="0",
+        CHAT_THREAD_RATE_PER_MIN="6",
+        CHAT_THREAD_BURST=str(THREAD_BURST),
+        LOAD_FIRST_TOKEN_LATENCY=str(args.latency),
+    )
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.load_app:app", "--port", str(port), "--log-level", "warning"],
+        env=env, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for(f"{base_url}/ready", time.perf_counter(), timeout=120)
+        results, thread_results, stats = asyncio.run(drive(args, base_url))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    admitted = [r for r in results if r[0] == 200]
+    rejected = [r for r in results if r[0] == 429]
+    queue_ms = [r[4]["queue_ms"] for r in admitted if r[4]]
+    run_s = [r[2] - q / 1000 for r, q in zip(admitted, queue_ms)]
+    print(f"burst of {args.burst} on distinct threads, {args.slots} slots + {args.queue} queued:")
+    print(f"  admitted {len(admitted)}, rejected 429 {len(rejected)}, other {len(results) - len(admitted) - len(rejected)}")
+    if rejected:
+        print(f"  429 response time: p50 {statistics.median(r[1] for r in rejected) * 1000:.1f} ms, "
+              f"max {max(r[1] for r in rejected) * 1000:.1f} ms; Retry-After {sorted({r[3] for r in rejected})}")
+    if queue_ms:
+        print(f"  admitted turns: queue wait p50 {pct(queue_ms, 0.5):.0f} ms / max {max(queue_ms):.0f} ms, "
+              f"run p50 {pct(run_s, 0.5):.2f}s, total p50 {pct([r[2] for r in admitted], 0.5):.2f}s")
+
+    thread_rejected = [r for r in thread_results if r[0] == 429]
+    print(f"5 messages at once on one thread (bucket {THREAD_BURST}): "
+          f"admitted {len(thread_results) - len(thread_rejected)}, rejected {len(thread_rejected)}, "
+          f"Retry-After {sorted({r[3] for r in thread_rejected})}")
+    print(f"/chat/admission: {json.dumps(stats)}")
+
+    expected_admitted = min(args.burst, args.slots + args.queue)
+    if len(admitted) != expected_admitted or len(admitted) + len(rejected) != args.burst \
+            or len(thread_rejected) != 5 - THREAD_BURST:
+        print("FAILED")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Chat streaming through the real graph with a fake model at a controlled token rate.
+
+Reports time-to-first-token, token throughput and how many SSE token frames
+were sent (coalescing), then checks that a client disconnect stops generation
+(the model emits no more tokens after the stream is closed), that the
+per-request deadline cuts a slow run short while keeping the partial answer,
+and that a subscriber reconnecting with Last-Event-ID gets the full answer
+without the agent running twice.
+
+Run from backend/:
+    python -m benchmarks.bench_chat_stream [--rate 100] [--tokens 200] [--deadline 1.0]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.fakes import FakeChatModel
+
+
+async def consume(stream, stop_after=None):
+    """
+    Read (event, data) pairs; return (ttft, token frames, last event, elapsed).
+    Closes the stream early after `stop_after` token frames.
+    """
+    start = time.perf_counter()
+    ttft = None
+    frames = 0
+    last = None
+    async for event, data in stream:
+        last = event
+        if event != "token":
+            continue
+        if ttft is None:
+            ttft = time.perf_counter() - start
+        frames += 1
+        if stop_after and frames >= stop_after:
+            await stream.aclose()
+            break
+    return ttft, frames, last, time.perf_counter() - start
+
+
+def parse_frames(frames):
+    """(id, event, data) for each SSE frame; keep-alive comments come back as ("", ":", None)."""
+    parsed = []
+    for frame in frames:
+        if frame.startswith(":"):
+            parsed.append(("", ":", None))
+            continue
+        fields = dict(line.split(": ", 1) for line in frame.strip().splitlines() if ": " in line)
+        if "event" in fields:
+            parsed.append((fields.get("id", ""), fields["event"], json.loads(fields["data"])))
+    return parsed
+
+
+async def run(args):
+    os.environ.setdefault("GROQ_API_KEY", "offline")
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    from langgraph.checkpoint.memory import InMemorySaver
+    from app.db.sqlite_conn import init_db
+    from app.db.async_sqlite import close_pool
+    from app.graph import langgraph_setup
+    from app.services import chat_service, chat_runs
+    from app.utils.sse import parse_last_event_id
+    from app.services.thread_service import acreate_thread, aget_thread_messages_for_api
+    from app.services.service_registry import override_service
+
+    init_db()
+    chatbot = langgraph_setup.graph.compile(checkpointer=InMemorySaver())
+    reply = " ".join(f"tok{i}" for i in range(args.tokens))
+
+    def install(**kwargs):
+        model = FakeChatModel(reply=reply, **kwargs)
+        override_service("chat_llm", model)
+        return model
+
+    # 1. Full answer
+    model = install(tokens_per_second=args.rate, first_token_latency=args.first_token)
+    thread_id = await acreate_thread("Bench")
+    ttft, frames, last, elapsed = await consume(chat_service.stream_chat_response("hi", thread_id, chatbot))
+    print(f"full answer:   ttft {ttft * 1000:.0f} ms, {model.tokens_emitted} tokens in {elapsed:.2f}s "
+          f"({model.tokens_emitted / elapsed:.0f} tok/s, model rate {args.rate:.0f}); "
+          f"{frames} token frames; final event {last!r}")
+
+    # 2. Client disconnect after 10 frames
+    model = install(tokens_per_second=args.rate, first_token_latency=args.first_token)
+    thread_id = await acreate_thread("Bench")
+    _, frames, _, _ = await consume(chat_service.stream_chat_response("hi", thread_id, chatbot), stop_after=10)
+    at_close = model.tokens_emitted
+    await asyncio.sleep(0.5)
+    saved = (await aget_thread_messages_for_api(thread_id))["messages"]
+    print(f"disconnect:    closed after {frames} frames; model emitted {at_close} at close, "
+          f"{model.tokens_emitted} 0.5s later (of {args.tokens}); "
+          f"partial saved: {saved[-1]['role'] == 'assistant'}")
+
+    # 3. Deadline on a slow model
+    chat_service.CHAT_REQUEST_TIMEOUT = args.deadline
+    model = install(tokens_per_second=args.rate / 4, first_token_latency=args.first_token)
+    thread_id = await acreate_thread("Bench")
+    _, frames, last, elapsed = await consume(chat_service.stream_chat_response("hi", thread_id, chatbot))
+    saved = (await aget_thread_messages_for_api(thread_id))["messages"]
+    print(f"deadline {args.deadline}s: stream ended after {elapsed:.2f}s with final event {last!r}; "
+          f"model emitted {model.tokens_emitted} of {args.tokens}; "
+          f"saved answer ends with: {saved[-1]['content'][-24:]!r}")
+    chat_service.CHAT_REQUEST_TIMEOUT = 10 * args.tokens / args.rate
+
+    # 4. Reconnect with Last-Event-ID (SSE layer)
+    chat_runs.SSE_HEARTBEAT_SECONDS = 0.1
+    manager = chat_runs.ChatRunManager()
+    model = install(tokens_per_second=args.rate, first_token_latency=0.3)
+    thread_id = await acreate_thread("Bench")
+    run = manager.start(thread_id, chat_service.stream_chat_response("hi", thread_id, chatbot))
+    first, second = [], []
+    stream = manager.subscribe(run)
+    async for frame in stream:
+        first.append(frame)
+        if len([f for f in first if "event: token" in f]) >= 5:
+            break
+    await stream.aclose()
+    last_id = [i for i, _, _ in parse_frames(first) if i][-1]
+    await asyncio.sleep(0.3)  # the run keeps going while the client is away
+    async for frame in manager.subscribe(run, parse_last_event_id(last_id)):
+        second.append(frame)
+    events = parse_frames(first) + parse_frames(second)
+    text = "".join(data["text"] for _, event, data in events if event == "token")
+    print(f"resume:        {len(first)} frames, reconnect after {last_id.split(':')[1]}, {len(second)} more; "
+          f"keep-alives {sum(1 for _, e, _ in events if e == ':')}; "
+          f"answer intact: {text == reply}; model emitted {model.tokens_emitted} (one run)")
+
+    # 5. Reconnect through another worker (RUN_STATE="sqlite": events followed from the database)
+    other = chat_runs.ChatRunManager()
+    model = install(tokens_per_second=args.rate, first_token_latency=0.3)
+    thread_id = await acreate_thread("Bench")
+    run = manager.start(thread_id, chat_service.stream_chat_response("hi", thread_id, chatbot))
+    await asyncio.sleep(0.5)
+    remote = await other.aget(run.id)
+    started = time.perf_counter()
+    frames = [frame async for frame in other.subscribe(remote, 0)] if remote else []
+    events = parse_frames(frames)
+    text = "".join(data["text"] for _, event, data in events if event == "token")
+    print(f"other worker:  found run: {remote is not None}; {len(frames)} frames in "
+          f"{time.perf_counter() - started:.2f}s; answer intact: {text == reply}; "
+          f"final event {events[-1][1] if events else None!r}")
+
+    await manager.shutdown()
+    await close_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rate", type=float, default=100.0, help="model tokens per second")
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--first-token", type=float, default=0.2, help="model first-token latency (s)")
+    parser.add_argument("--deadline", type=float, default=1.0, help="request deadline for the slow run (s)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_chat_")
+    os.chdir(workdir)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Checkpoint storage growth over one long thread.
+
+Runs N turns through the real graph (fake model, no summarization, so the
+state keeps every message) with the stock AsyncSqliteSaver, the delta saver,
+and the delta saver with periodic compaction. Reports the live database size,
+bytes written by the process (includes the WAL) and write amplification
+(bytes written / bytes of conversation text), plus the cost of the last turns.
+
+Run from backend/:
+    python -m benchmarks.bench_checkpoint_storage [--turns 500] [--compact-every 50]
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from benchmarks.fakes import FakeChatModel
+
+
+def bytes_written() -> int:
+    """Bytes this process passed to write() so far (Linux)."""
+    with open("/proc/self/io") as f:
+        for line in f:
+            if line.startswith("wchar:"):
+                return int(line.split()[1])
+    return 0
+
+
+def live_size(path) -> int:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    conn.close()
+    return (pages - free) * page_size
+
+
+async def run_thread(saver_class, path, args, compact_every=0):
+    from langchain_core.messages import HumanMessage
+    from app.graph import langgraph_setup
+    from app.services.service_registry import override_service
+
+    reply = " ".join(f"word{i}" for i in range(args.reply_words))
+    override_service("chat_llm", FakeChatModel(reply=reply, tokens_per_second=1e9, first_token_latency=0))
+
+    config = {"configurable": {"thread_id": "bench-thread"}}
+    text_bytes = 0
+    turn_times = []
+    async with saver_class.from_conn_string(path) as saver:
+        await saver.setup()
+        chatbot = langgraph_setup.graph.compile(checkpointer=saver)
+        start_written = bytes_written()
+        for turn in range(args.turns):
+            question = f"question {turn} " + "lorem ipsum " * (args.question_words // 2)
+            started = time.perf_counter()
+            await chatbot.ainvoke({"messages": [HumanMessage(content=question)]}, config)
+            turn_times.append(time.perf_counter() - started)
+            text_bytes += len(question.encode()) + len(reply.encode())
+            if compact_every and (turn + 1) % compact_every == 0:
+                await saver.compact(["bench-thread"])
+        written = bytes_written() - start_written
+        state = await chatbot.aget_state(config)
+        assert len(state.values["messages"]) == 2 * args.turns
+    return {
+        "size": live_size(path),
+        "written": written,
+        "amplification": written / text_bytes,
+        "text": text_bytes,
+        "last_turns_ms": statistics.mean(turn_times[-50:]) * 1000,
+    }
+
+
+async def run(args):
+    os.environ.setdefault("GROQ_API_KEY", "offline")
+    os.environ["SUMMARY_ENABLED"] = "false"
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    from app.graph.checkpointer import DeltaSqliteSaver
+
+    workdir = tempfile.mkdtemp(prefix="bench_ckpt_")
+    configs = [
+        ("full (stock saver)", AsyncSqliteSaver, 0),
+        ("delta", DeltaSqliteSaver, 0),
+        (f"delta + compaction/{args.compact_every}", DeltaSqliteSaver, args.compact_every),
+    ]
+    print(f"{args.turns} turns, {args.question_words}-word questions, {args.reply_words}-word answers")
+    for name, saver_class, compact_every in configs:
+        path = os.path.join(workdir, f"{name.split()[0]}-{compact_every}.db")
+        r = await run_thread(saver_class, path, args, compact_every)
+        print(f"{name:28s} db {r['size'] / 1e6:8.2f} MB   written {r['written'] / 1e6:9.2f} MB   "
+              f"amplification {r['amplification']:8.1f}x   last-50 turns {r['last_turns_ms']:6.1f} ms/turn")
+    print(f"conversation text: {r['text'] / 1e6:.2f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--question-words", type=int, default=30)
+    parser.add_argument("--reply-words", type=int, default=80)
+    parser.add_argument("--compact-every", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Embedding pipeline throughput vs batch size and concurrency.
+
+Run from backend/:
+    python -m benchmarks.bench_embedding_pipeline [--chunks 1000] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import time
+
+from app.services.embedding_pipeline import embed_and_upsert
+from benchmarks.fakes import FakeEmbedder, FakeIndex
+
+
+def make_records(n: int):
+    return [
+        {"id": f"bench_doc.pdf_{i}", "text": f"chunk {i} " * 50, "metadata": {"chunk_index": i}}
+        for i in range(n)
+    ]
+
+
+async def run_once(records, batch_size, concurrency, latency):
+    embedder = FakeEmbedder(call_latency=latency)
+    index = FakeIndex()
+    start = time.perf_counter()
+    upserted = await embed_and_upsert(
+        records, embedder, index, batch_size=batch_size, concurrency=concurrency
+    )
+    elapsed = time.perf_counter() - start
+    assert upserted == len(records) == len(index.vectors)
+    return elapsed, embedder.calls
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per embedding call")
+    args = parser.parse_args()
+
+    records = make_records(args.chunks)
+    print(f"{args.chunks} chunks, {args.latency * 1000:.0f} ms per embedding call\n")
+    print(f"{'batch':>6} {'conc':>5} {'calls':>6} {'seconds':>8} {'chunks/s':>10}")
+
+    # batch=1, concurrency=1 is the old serial embed_query loop
+    for batch_size in (1, 16, 64, 128):
+        for concurrency in (1, 4, 8):
+            if batch_size == 1 and concurrency > 1 and args.chunks > 200:
+                continue
+            elapsed, calls = asyncio.run(run_once(records, batch_size, concurrency, args.latency))
+            print(f"{batch_size:>6} {concurrency:>5} {calls:>6} {elapsed:>8.2f} {args.chunks / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
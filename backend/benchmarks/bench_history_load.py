@@ -0,0 +1,107 @@
+"""
+History-load latency before/after the schema migrations (indexes, cascade, summary).
+
+Builds a v1 (unindexed) database with N messages, times
+`WHERE thread_id=? ORDER BY created_at, id` and a thread delete, then migrates
+the same file in place and times them again.
+
+Run from backend/:
+    python -m benchmarks.bench_history_load [--messages 1000000] [--threads 10000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from app.db.migrations import run_migrations
+from app.services.thread_service import MESSAGES_PAGE_SQL, DELETE_THREAD_SQL
+
+# Full-history load (what GET /thread/{id}/messages did before pagination)
+FULL_HISTORY_SQL = "SELECT id, role, content, created_at FROM messages WHERE thread_id=? ORDER BY created_at, id"
+# Latest page, as served by the paginated endpoint
+LATEST_PAGE_SQL = MESSAGES_PAGE_SQL[None]
+
+
+def build_v1_database(path, n_messages, n_threads):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    run_migrations(conn, target=1)
+    thread_ids = [f"thread-{i}" for i in range(n_threads)]
+    conn.executemany(
+        "INSERT INTO threads (id, name, created_at) VALUES (?, ?, datetime('now', ?))",
+        ((tid, "Bench", f"-{i} minutes") for i, tid in enumerate(thread_ids)),
+    )
+    rows = (
+        (random.choice(thread_ids), "user" if i % 2 else "assistant", "x" * 200, f"-{n_messages - i} seconds")
+        for i in range(n_messages)
+    )
+    conn.executemany(
+        "INSERT INTO messages (thread_id, role, content, created_at) VALUES (?, ?, ?, datetime('now', ?))",
+        rows,
+    )
+    conn.commit()
+    return conn, thread_ids
+
+
+def time_history(conn, thread_ids, samples, sql=FULL_HISTORY_SQL, params=()):
+    latencies = []
+    for tid in random.sample(thread_ids, samples):
+        start = time.perf_counter()
+        conn.execute(sql, (tid, *params)).fetchall()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+def time_delete(conn, thread_ids, samples, cascade):
+    latencies = []
+    for tid in random.sample(thread_ids, samples):
+        start = time.perf_counter()
+        if not cascade:
+            conn.execute("DELETE FROM messages WHERE thread_id=?", (tid,))
+        conn.execute(DELETE_THREAD_SQL, (tid,))
+        conn.commit()
+        thread_ids.remove(tid)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--threads", type=int, default=10_000)
+    parser.add_argument("--samples", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        start = time.perf_counter()
+        conn, thread_ids = build_v1_database(path, args.messages, args.threads)
+        print(f"Built {args.messages} messages / {args.threads} threads in {time.perf_counter() - start:.1f}s\n")
+
+        before = time_history(conn, thread_ids, args.samples)
+        page_before = time_history(conn, thread_ids, args.samples, LATEST_PAGE_SQL, (51,))
+        delete_before = time_delete(conn, thread_ids, 5, cascade=False)
+
+        start = time.perf_counter()
+        run_migrations(conn)
+        migrate_s = time.perf_counter() - start
+
+        after = time_history(conn, thread_ids, args.samples)
+        page_after = time_history(conn, thread_ids, args.samples, LATEST_PAGE_SQL, (51,))
+        delete_after = time_delete(conn, thread_ids, 5, cascade=True)
+
+        print(f"{'':22} {'v1 (no index)':>14} {'latest':>10}")
+        print(f"{'history p50 (ms)':22} {before[0]:>14.2f} {after[0]:>10.2f}")
+        print(f"{'history p99 (ms)':22} {before[1]:>14.2f} {after[1]:>10.2f}")
+        print(f"{'latest page p50 (ms)':22} {page_before[0]:>14.2f} {page_after[0]:>10.2f}")
+        print(f"{'delete thread (ms)':22} {delete_before:>14.2f} {delete_after:>10.2f}")
+        print(f"\nIn-place migration took {migrate_s:.1f}s")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Ingestion throughput per document format.
+
+Writes the same generated prose as PDF, DOCX, TXT, Markdown, HTML and CSV
+files (default 8 files per format, 40 pages of text each) and parses them in
+a spawned process pool, as the ingestion manager does, for each pool size in
+--workers. Reports files/s, input MB/s and chunks/s per format and for a mixed
+load (every format at once). A last row runs the mixed load end to end through
+process_and_store_document (zero-latency fake embedder, local vector store),
+so the parse share of ingestion time is visible.
+
+Run from backend/:
+    python -m benchmarks.bench_ingest_formats [--files 8] [--pages 40] [--workers 1,4]
+"""
+import argparse
+import asyncio
+import csv
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from html import escape
+
+from benchmarks.fakes import FakeEmbedder, write_docx, write_pdf
+
+FORMATS = ["pdf", "docx", "txt", "markdown", "html", "csv"]
+EXTENSIONS = {"pdf": ".pdf", "docx": ".docx", "txt": ".txt", "markdown": ".md", "html": ".html", "csv": ".csv"}
+
+
+def document_pages(n, seed):
+    rng = random.Random(seed)
+    words = "vector index chunk thread upload embed cache query latency model token page table column".split()
+    return [
+        [" ".join(rng.choice(words) for _ in range(90)).capitalize() + "." for _ in range(6)]
+        for _ in range(n)
+    ]
+
+
+def write_document(path, fmt, pages):
+    """`pages` is a list of pages, each a list of paragraphs."""
+    paragraphs = [p for page in pages for p in page]
+    if fmt == "pdf":
+        write_pdf(path, [" ".join(page) for page in pages])
+    elif fmt == "docx":
+        write_docx(path, paragraphs)
+    elif fmt == "txt":
+        with open(path, "w") as f:
+            f.write("\n\n".join(paragraphs))
+    elif fmt == "markdown":
+        with open(path, "w") as f:
+            f.write("\n\n".join(f"## Section {i}\n\n" + "\n\n".join(page) for i, page in enumerate(pages)))
+    elif fmt == "html":
+        body = "".join(f"<h2>Section {i}</h2>" + "".join(f"<p>{escape(p)}</p>" for p in page)
+                       for i, page in enumerate(pages))
+        with open(path, "w") as f:
+            f.write(f"<html><head><style>p {{ margin: 0 }}</style></head><body>{body}</body></html>")
+    elif fmt == "csv":
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["section", "paragraph", "text"])
+            writer.writerows((i, j, p) for i, page in enumerate(pages) for j, p in enumerate(page))
+
+
+def parse_all(pool, files):
+    """Parse `files` [(path, fmt)] concurrently in `pool`. Returns (seconds, chunks)."""
+    from app.services.document_parser import parse_document
+
+    started = time.perf_counter()
+    futures = [pool.submit(parse_document, path, os.path.basename(path), "bench", fmt) for path, fmt in files]
+    chunks = sum(len(f.result()[1]) for f in futures)
+    return time.perf_counter() - started, chunks
+
+
+def report(label, workers, files, elapsed, chunks):
+    mb = sum(os.path.getsize(path) for path, _ in files) / 1e6
+    print(f"{label:9s} {workers:7d} {len(files):6d} {mb:8.1f} {chunks:7d} {elapsed:8.2f}s "
+          f"{len(files) / elapsed:8.1f} {mb / elapsed:7.1f} {chunks / elapsed:9.0f}")
+
+
+async def end_to_end(pool, files):
+    from app.db.sqlite_conn import init_db
+    from app.db.async_sqlite import close_pool
+    import app.services.rag_service as rs
+    from app.services.service_registry import override_service
+    from app.services.vector_store import get_vector_store
+
+    init_db()
+    override_service("embeddings", FakeEmbedder(call_latency=0.0, per_item_latency=0.0))
+    rs.EMBED_CACHE_ENABLED = False
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        rs.process_and_store_document(path, os.path.basename(path), "bench-e2e", executor=pool, fmt=fmt)
+        for path, fmt in files
+    ))
+    elapsed = time.perf_counter() - started
+    await close_pool()
+    assert all(ok for ok, _ in results), [m for ok, m in results if not ok]
+    return elapsed, sum(len(page) for page in get_vector_store().list(prefix="bench-e2e_"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=8, help="files per format")
+    parser.add_argument("--pages", type=int, default=40, help="pages of text per file")
+    parser.add_argument("--workers", default=f"1,{min(4, os.cpu_count() or 1)}", help="process pool sizes")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_formats_")
+    os.chdir(workdir)
+    os.environ["VECTOR_STORE"] = "local"
+    os.environ["VECTOR_STORE_PATH"] = os.path.join(workdir, "vectors")
+    os.environ.setdefault("GOOGLE_API_KEY", "offline")
+
+    corpus = {fmt: [] for fmt in FORMATS}
+    for i in range(args.files):
+        pages = document_pages(args.pages, seed=i)
+        for fmt in FORMATS:
+            path = os.path.join(workdir, f"doc{i}{EXTENSIONS[fmt]}")
+            write_document(path, fmt, pages)
+            corpus[fmt].append((path, fmt))
+    mixed = [item for fmt in FORMATS for item in corpus[fmt]]
+
+    print(f"{'format':9s} {'workers':>7s} {'files':>6s} {'MB':>8s} {'chunks':>7s} {'time':>9s} "
+          f"{'files/s':>8s} {'MB/s':>7s} {'chunks/s':>9s}")
+    spawn = multiprocessing.get_context("spawn")
+    sizes = sorted({int(w) for w in args.workers.split(",")})
+    for workers in sizes:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=spawn) as pool:
+            parse_all(pool, corpus["txt"][:workers])  # start the processes and import the parsers
+            for fmt in FORMATS:
+                report(fmt, workers, corpus[fmt], *parse_all(pool, corpus[fmt]))
+            report("mixed", workers, mixed, *parse_all(pool, mixed))
+            if workers == sizes[-1]:
+                report("mixed e2e", workers, mixed, *asyncio.run(end_to_end(pool, mixed)))
+
+
+if __name__ == "__main__":
+    main()
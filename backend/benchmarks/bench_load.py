@@ -0,0 +1,168 @@
+"""
+Load test: many threads chatting at once against N uvicorn workers.
+
+Starts `uvicorn benchmarks.load_app:app --workers N` (EchoChatModel, local
+vector store, databases in a temp directory), creates --threads threads and
+sends --turns messages to every thread at the same time, so turns on one
+thread race each other across workers. At most --concurrency streams are
+open at once.
+
+Checks, per thread, that the stored messages alternate user/assistant and
+that the k-th answer is "turn k re <the question just before it>": a turn
+that ran concurrently with another on the same thread, or on stale history,
+fails the check. Also checks every stream ended with "done" and matches the
+stored answer. Reports turns/s and latency (send -> done).
+
+Run from backend/:
+    python -m benchmarks.bench_load [--workers 2] [--threads 40] [--turns 3] [--locks sqlite]
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_startup import free_port, wait_for
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ANSWER = re.compile(r"turn (\d+) re (.*?) pad0\b")
+
+
+def server_env(args, workdir):
+    env = dict(os.environ)
+    env.update(
+        PYTHONPATH=BACKEND_DIR,
+        PYTHONWARNINGS="ignore",
+        GROQ_API_KEY="offline",
+        DATABASE_PATH=os.path.join(workdir, "chatbot.db"),
+        CHECKPOINT_DB_PATH=os.path.join(workdir, "checkpoints.db"),
+        VECTOR_STORE="local",
+        VECTOR_STORE_PATH=os.path.join(workdir, "vectors"),
+        THREAD_LOCKS=args.locks,
+        SUMMARY_ENABLED="false",
+        RESPONSE_CACHE_ENABLED="false",
+        # Every turn is admitted: this measures serialization, not admission control
+        CHAT_CLIENT_RATE_PER_MIN="0",
+        CHAT_THREAD_RATE_PER_MIN="0",
+        CHAT_MAX_QUEUED=str(args.threads * args.turns),
+        LOAD_FIRST_TOKEN_LATENCY=str(args.latency),
+        LOAD_TOKENS_PER_SECOND=str(args.rate),
+    )
+    return env
+
+
+async def send(client, limit, thread_id, message):
+    """POST /chat/send and read the stream. Returns (seconds, final event, answer text)."""
+    async with limit:
+        started = time.perf_counter()
+        text, last = "", None
+        async with client.stream("POST", "/chat/send", json={"message": message, "thread_id": thread_id}) as response:
+            response.raise_for_status()
+            event = None
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[7:]
+                elif line.startswith("data: "):
+                    last = event
+                    if event == "token":
+                        text += json.loads(line[6:])["text"]
+                    elif event == "error":
+                        text = json.loads(line[6:])["message"]
+        return time.perf_counter() - started, last, text
+
+
+def check_thread(messages, turns):
+    """Problems in one thread's stored messages (empty if the turns were serialized)."""
+    problems = []
+    if len(messages) != 2 * turns:
+        problems.append(f"{len(messages)} messages, expected {2 * turns}")
+    for k, (question, answer) in enumerate(zip(messages[0::2], messages[1::2]), start=1):
+        if question["role"] != "user" or answer["role"] != "assistant":
+            problems.append(f"turn {k}: roles {question['role']}/{answer['role']}")
+            continue
+        match = ANSWER.match(answer["content"])
+        if not match or int(match.group(1)) != k or match.group(2) != question["content"]:
+            problems.append(f"turn {k}: answer {answer['content'][:40]!r} to {question['content']!r}")
+    return problems
+
+
+async def drive(args, base_url):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=httpx.Timeout(None)) as client:
+        thread_ids = [
+            (await client.post("/thread/create", params={"name": f"load {i}"})).json()["thread_id"]
+            for i in range(args.threads)
+        ]
+        limit = asyncio.Semaphore(args.concurrency)
+        requests = [(t, f"q{i}-{k}") for i, t in enumerate(thread_ids) for k in range(args.turns)]
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(send(client, limit, t, m) for t, m in requests))
+        elapsed = time.perf_counter() - started
+
+        threads = {}
+        for t in thread_ids:
+            page = (await client.get(f"/thread/{t}/messages", params={"limit": 2 * args.turns + 10})).json()
+            threads[t] = page["messages"]
+    return requests, results, elapsed, threads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=2, help="uvicorn worker processes")
+    parser.add_argument("--threads", type=int, default=40)
+    parser.add_argument("--turns", type=int, default=3, help="messages sent to each thread at once")
+    parser.add_argument("--concurrency", type=int, default=64, help="max open streams")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake model time to first token (s)")
+    parser.add_argument("--rate", type=float, default=200, help="fake model tokens/s")
+    parser.add_argument("--locks", default="sqlite", choices=["sqlite", "local"], help="THREAD_LOCKS")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_load_")
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.load_app:app", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        env=server_env(args, workdir), cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for(f"{base_url}/ready", time.perf_counter(), timeout=120)
+        requests, results, elapsed, threads = asyncio.run(drive(args, base_url))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    latencies = sorted(seconds for seconds, _, _ in results)
+    failed = [(m, last, text) for (_, m), (_, last, text) in zip(requests, results) if last != "done"]
+    stored = {m["content"]: a["content"] for ms in threads.values() for m, a in zip(ms[0::2], ms[1::2])}
+    mismatched = [m for (_, m), (_, last, text) in zip(requests, results) if last == "done" and stored.get(m) != text]
+    broken = {t: p for t, ms in threads.items() if (p := check_thread(ms, args.turns))}
+
+    print(f"{args.workers} workers, locks={args.locks}: {args.threads} threads x {args.turns} turns "
+          f"sent at once, {args.concurrency} streams max")
+    print(f"turns: {len(requests)} in {elapsed:.2f}s = {len(requests) / elapsed:.1f} turns/s")
+    print(f"latency: p50 {statistics.median(latencies):.2f}s  "
+          f"p95 {latencies[int(0.95 * (len(latencies) - 1))]:.2f}s  max {latencies[-1]:.2f}s")
+    print(f"streams not ending in done: {len(failed)}")
+    for message, last, text in failed[:5]:
+        print(f"  {message}: {last} {text[:80]!r}")
+    print(f"streamed answer != stored answer: {len(mismatched)}")
+    print(f"threads with interleaved or stale turns: {len(broken)} / {args.threads}")
+    for thread_id, problems in list(broken.items())[:5]:
+        print(f"  {thread_id}: {'; '.join(problems[:3])}")
+
+    if failed or mismatched or broken:
+        print("FAILED")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
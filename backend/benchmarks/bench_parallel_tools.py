@@ -0,0 +1,97 @@
+"""
+Turn latency when the model emits several tool calls at once.
+
+Backends are stubbed: a local slow weather server plus slow stock/search
+lookups. With async tools, ToolNode runs the calls concurrently, so the
+turn takes about as long as the slowest tool rather than the sum.
+
+Run from backend/:
+    python -m benchmarks.bench_parallel_tools [--weather 0.3] [--stock 0.5] [--search 0.4]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from langchain_core.messages import AIMessage
+
+from benchmarks.fakes import StubWeatherServer
+
+
+async def run(args):
+    from langgraph.graph import StateGraph, MessagesState, START, END
+    from langgraph.prebuilt import ToolNode
+    from app.utils import tools as tools_module
+    from app.utils.tool_runtime import tool_cache, close_http_client
+
+    def slow_stock(symbol):
+        time.sleep(args.stock)
+        return f"{symbol} is currently trading at 123.45 USD"
+
+    def slow_search(query):
+        time.sleep(args.search)
+        return f"Results for {query}"
+
+    tools_module._fetch_stock_price = slow_stock
+    tools_module._fetch_search = slow_search
+
+    tool_node = ToolNode([tools_module.get_weather, tools_module.get_stock_price,
+                          tools_module.duckduckgo_search, tools_module.calculator])
+    # ToolNode needs a graph runtime; run it as a single-node graph
+    builder = StateGraph(MessagesState)
+    builder.add_node("tools", tool_node)
+    builder.add_edge(START, "tools")
+    builder.add_edge("tools", END)
+    turn = builder.compile()
+    calls = [
+        {"name": "get_weather", "args": {"city": "London"}, "id": "call_1"},
+        {"name": "get_stock_price", "args": {"symbol": "AAPL"}, "id": "call_2"},
+        {"name": "duckduckgo_search", "args": {"query": "news"}, "id": "call_3"},
+        {"name": "calculator", "args": {"expression": "2 * 21"}, "id": "call_4"},
+    ]
+
+    def clear_caches():
+        for name in ("get_weather", "get_stock_price", "duckduckgo_search"):
+            tool_cache(name).clear()
+
+    # Sequential: one tool after another (what a blocking loop would cost)
+    clear_caches()
+    start = time.perf_counter()
+    for call in calls:
+        tool = next(t for t in tool_node.tools_by_name.values() if t.name == call["name"])
+        await tool.ainvoke(call["args"])
+    sequential = time.perf_counter() - start
+
+    # One agent turn with all four tool calls
+    clear_caches()
+    start = time.perf_counter()
+    result = await turn.ainvoke({"messages": [AIMessage(content="", tool_calls=calls)]})
+    concurrent = time.perf_counter() - start
+    tool_messages = result["messages"][1:]
+    assert len(tool_messages) == len(calls)
+
+    slowest = max(args.weather, args.stock, args.search)
+    total = args.weather + args.stock + args.search
+    print(f"backend latencies: weather {args.weather}s, stock {args.stock}s, search {args.search}s")
+    print(f"sum of tools    : {total:.2f}s   slowest tool: {slowest:.2f}s\n")
+    print(f"sequential calls: {sequential:.2f}s")
+    print(f"ToolNode turn   : {concurrent:.2f}s")
+    for m in tool_messages:
+        print(f"  {m.name}: {m.content}")
+    await close_http_client()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--weather", type=float, default=0.3)
+    parser.add_argument("--stock", type=float, default=0.5)
+    parser.add_argument("--search", type=float, default=0.4)
+    args = parser.parse_args()
+
+    with StubWeatherServer(latency=args.weather) as server:
+        os.environ["WEATHER_API_BASE"] = server.base_url
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Peak memory of PDF ingestion versus document length.
+
+For each generated PDF (default 100 / 400 / 1600 pages), a fresh process
+ingests it with a zero-latency fake embedder and an index that discards
+vectors, and reports its peak RSS growth:
+    whole-file - the previous path: PyPDFLoader.load() + split, then embed
+    streaming  - process_and_store_document: page windows fed to the embedding queue
+Memory is the process's anonymous RSS (heap), sampled every few milliseconds;
+file-backed pages (the SQLite mmap, the PDF in the page cache) are excluded.
+Streaming peak memory should stay flat as the page count grows (asserted with
+tracemalloc in tests/test_memory_bounds.py).
+
+Run from backend/:
+    python -m benchmarks.bench_pdf_memory [--pages 100,400,1600]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+
+from benchmarks.fakes import FakeEmbedder, write_pdf
+
+
+class NullIndex:
+    def upsert(self, vectors):
+        pass
+
+
+def anon_rss_kb() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1])
+    return 0
+
+
+class PeakSampler(threading.Thread):
+    def __init__(self, interval=0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = anon_rss_kb()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, anon_rss_kb())
+
+
+def measure(mode, path, workdir, results):
+    os.chdir(workdir)
+    os.environ["VECTOR_STORE"] = "local"
+    os.environ["VECTOR_STORE_PATH"] = os.path.join(workdir, "vectors")
+    os.environ.setdefault("GOOGLE_API_KEY", "offline")
+    os.environ["EMBED_CACHE_ENABLED"] = "false"
+
+    from langchain_community.document_loaders import PyPDFLoader
+    from app.db.sqlite_conn import init_db
+    from app.db.async_sqlite import close_pool
+    from app.services.document_parser import text_splitter, chunk_id, chunk_hash
+    from app.services.embedding_pipeline import embed_and_upsert
+    import app.services.rag_service as rs
+    from app.services.service_registry import override_service
+
+    init_db()
+    embedder = FakeEmbedder(call_latency=0, per_item_latency=0)
+    index = NullIndex()
+    override_service("embeddings", embedder)
+    override_service("vector_store", index)
+
+    def whole_file_records(thread_id, filename):
+        documents = PyPDFLoader(path).load()
+        chunks = text_splitter.split_documents(documents)
+        return [
+            {"id": chunk_id(thread_id, filename, i), "text": d.page_content, "hash": chunk_hash(d.page_content),
+             "metadata": {"text": d.page_content, "source": filename, "thread_id": thread_id,
+                          "chunk_index": i, "page": d.metadata.get("page", 0)}}
+            for i, d in enumerate(chunks)
+        ]
+
+    async def run():
+        if mode == "whole-file":
+            records = await asyncio.to_thread(whole_file_records, "thread", "doc.pdf")
+            count = await embed_and_upsert(records, embedder, index)
+        else:
+            ok, message = await rs.process_and_store_document(path, "doc.pdf", "thread")
+            assert ok, message
+            count = None
+        await close_pool()
+        return count
+
+    baseline = anon_rss_kb()
+    sampler = PeakSampler()
+    sampler.start()
+    started = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - started
+    sampler.stopped.set()
+    sampler.join()
+    results.put((max(0, sampler.peak - baseline) / 1024, elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=lambda s: [int(x) for x in s.split(",")], default=[100, 400, 1600])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_pdf_mem_")
+    rng = random.Random(0)
+    words = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt".split()
+    context = multiprocessing.get_context("spawn")
+
+    print(f"{'pages':>6s} {'file MB':>8s}   {'mode':10s} {'peak heap growth':>17s} {'time':>7s}")
+    for pages in args.pages:
+        path = os.path.join(workdir, f"doc-{pages}.pdf")
+        write_pdf(path, [f"Page {p}. " + " ".join(rng.choice(words) for _ in range(700)) for p in range(pages)])
+        for mode in ("whole-file", "streaming"):
+            results = context.Queue()
+            child = context.Process(target=measure, args=(mode, path, os.path.join(workdir, f"{mode}-{pages}"), results))
+            os.makedirs(os.path.join(workdir, f"{mode}-{pages}"))
+            child.start()
+            peak_mb, elapsed = results.get()
+            child.join()
+            print(f"{pages:6d} {os.path.getsize(path) / 1e6:8.1f}   {mode:10s} {peak_mb:14.1f} MB {elapsed:6.1f}s")
+
+
+if __name__ == "__main__":
+    main()
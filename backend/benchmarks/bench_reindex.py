@@ -0,0 +1,93 @@
+"""
+Re-upload cost with content hashing and the embedding cache.
+
+Runs process_and_store_document (local vector store, fake embedder with a remote-
+like latency) on a generated PDF:
+    1. first upload to thread A
+    2. the identical file again to thread A
+    3. a revised version (a few pages edited) to thread A
+    4. the original file to a new thread B (cross-thread duplicate)
+    5. the original file to thread C with the cache disabled (baseline)
+and reports wall time, embedding calls, and chunks embedded / reused / skipped.
+
+Run from backend/:
+    python -m benchmarks.bench_reindex [--pages 200] [--edited 3] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from types import SimpleNamespace
+
+from benchmarks.fakes import FakeEmbedder, write_pdf
+
+
+def pages_text(n, seed=0):
+    rng = random.Random(seed)
+    words = "vector index chunk thread upload embed cache query latency model token page table column".split()
+    return [f"Page {p}. " + " ".join(rng.choice(words) for _ in range(550)) for p in range(n)]
+
+
+async def upload(rs, path, thread_id, embedder):
+    progress = SimpleNamespace(pages_parsed=0, chunks_total=0, chunks_embedded=0, vectors_upserted=0,
+                               chunks_cached=0, chunks_unchanged=0)
+    calls = embedder.calls
+    started = time.perf_counter()
+    ok, message = await rs.process_and_store_document(path, "report.pdf", thread_id, progress=progress)
+    assert ok, message
+    return time.perf_counter() - started, embedder.calls - calls, progress
+
+
+async def run(args, workdir):
+    from app.db.sqlite_conn import init_db
+    from app.db.async_sqlite import close_pool
+    import app.services.rag_service as rs
+    from app.services.service_registry import override_service
+
+    init_db()
+    embedder = FakeEmbedder(call_latency=args.latency)
+    override_service("embeddings", embedder)
+
+    original = pages_text(args.pages)
+    revised = list(original)
+    for p in random.Random(1).sample(range(args.pages), args.edited):
+        revised[p] = revised[p].replace("cache", "store", 3)
+    write_pdf(os.path.join(workdir, "v1.pdf"), original)
+    write_pdf(os.path.join(workdir, "v2.pdf"), revised)
+
+    scenarios = [
+        ("first upload (thread A)", "v1.pdf", "thread-a", True),
+        ("identical re-upload (A)", "v1.pdf", "thread-a", True),
+        (f"revised, {args.edited} pages edited (A)", "v2.pdf", "thread-a", True),
+        ("same file, new thread B", "v1.pdf", "thread-b", True),
+        ("same file, thread C, no cache", "v1.pdf", "thread-c", False),
+    ]
+    for name, filename, thread_id, cache in scenarios:
+        rs.EMBED_CACHE_ENABLED = cache
+        elapsed, calls, p = await upload(rs, os.path.join(workdir, filename), thread_id, embedder)
+        print(f"{name:34s} {elapsed:6.2f}s  {calls:3d} embed calls  chunks {p.chunks_total:4d}: "
+              f"{p.chunks_embedded - p.chunks_cached:4d} embedded, {p.chunks_cached:4d} cached, "
+              f"{p.chunks_unchanged:4d} unchanged, {p.vectors_upserted:4d} upserted")
+
+    await close_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--edited", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="per-call embedding latency (s)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_reindex_")
+    os.chdir(workdir)
+    os.environ["VECTOR_STORE"] = "local"
+    os.environ["VECTOR_STORE_PATH"] = os.path.join(workdir, "vectors")
+    os.environ.setdefault("GOOGLE_API_KEY", "offline")
+    asyncio.run(run(args, workdir))
+
+
+if __name__ == "__main__":
+    main()
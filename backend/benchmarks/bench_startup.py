@@ -0,0 +1,119 @@
+"""
+Cold-start cost: import time of app.main and time until a worker answers.
+
+1. `python -X importtime -c "import app.main"` in a fresh interpreter with no
+   API keys set: total import time against --budget-ms, the slowest imports,
+   and a check that no provider SDK (Groq, Gemini, Pinecone, yfinance/pandas,
+   pypdf) is imported at startup.
+2. uvicorn is started on a free port (local vector store, temp directory) and
+   polled until /health answers, then until /ready reports the agent is up.
+
+Exits with status 1 when the budget is exceeded or an SDK is imported eagerly,
+so it can gate CI.
+
+Run from backend/:
+    python -m benchmarks.bench_startup [--budget-ms 1000] [--top 10]
+"""
+import argparse
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Created on first use (app/services/service_registry.py, app/utils/tools.py, app/services/document_parser.py)
+LAZY_MODULES = ["langchain_groq", "langchain_google_genai", "pinecone", "yfinance", "pandas", "pypdf"]
+KEY_VARS = ["GROQ_API_KEY", "GOOGLE_API_KEY", "GEMINI_API_KEY", "PINECONE_API_KEY"]
+
+
+def clean_env(workdir):
+    env = {k: v for k, v in os.environ.items() if k not in KEY_VARS}
+    env.update(
+        PYTHONPATH=BACKEND_DIR,
+        VECTOR_STORE="local",
+        VECTOR_STORE_PATH=os.path.join(workdir, "vectors"),
+        PYTHONWARNINGS="ignore",
+    )
+    return env
+
+
+def import_times(env, cwd):
+    """[(cumulative_us, self_us, depth, module)] from -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=env, cwd=cwd, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"import app.main failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", line)
+        if match:
+            rows.append((int(match.group(2)), int(match.group(1)), len(match.group(3)) // 2, match.group(4)))
+    return rows
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, started, timeout=60.0, status=200):
+    """Seconds from `started` until `url` returns `status`."""
+    while time.perf_counter() - started < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == status:
+                    return time.perf_counter() - started
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    raise SystemExit(f"{url} did not return {status} within {timeout}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget-ms", type=float, default=1000, help="max import time of app.main")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports of app.main to show")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_startup_")
+    env = clean_env(workdir)
+
+    rows = import_times(env, workdir)
+    total_ms = next(cumulative for cumulative, _, _, name in rows if name == "app.main") / 1000
+    eager = sorted({name.split(".")[0] for *_, name in rows} & set(LAZY_MODULES))
+    print(f"import app.main: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    print("slowest direct imports of app.main:")
+    for cumulative, _, _, name in sorted((r for r in rows if r[2] == 1), reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+    print(f"provider SDKs imported at startup: {', '.join(eager) or 'none'}")
+
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        health = wait_for(f"http://127.0.0.1:{port}/health", started)
+        ready = wait_for(f"http://127.0.0.1:{port}/ready", started)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    print(f"uvicorn start -> /health 200: {health:.2f}s")
+    print(f"uvicorn start -> /ready 200:  {ready:.2f}s")
+
+    if total_ms > args.budget_ms or eager:
+        print("FAILED: over the import budget or an SDK was imported eagerly")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
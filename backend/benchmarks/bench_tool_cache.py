@@ -0,0 +1,68 @@
+"""
+Tool execution layer against a local stub weather server:
+pooled client, TTL cache hits and coalescing of concurrent identical lookups.
+
+Run from backend/:
+    python -m benchmarks.bench_tool_cache [--latency 0.2] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.fakes import StubWeatherServer
+
+
+async def run(args, server):
+    from app.utils.tools import get_weather
+    from app.utils.tool_runtime import tool_cache, close_http_client
+
+    cache = tool_cache("get_weather")
+
+    async def call(city):
+        return await get_weather.ainvoke({"city": city})
+
+    # 1. Burst of identical lookups -> one upstream request
+    start = time.perf_counter()
+    results = await asyncio.gather(*(call("London") for _ in range(args.concurrency)))
+    burst = time.perf_counter() - start
+    assert len(set(results)) == 1, results
+    print(f"{args.concurrency} concurrent 'London' lookups: {burst * 1000:.0f} ms, "
+          f"{server.requests} upstream request(s)")
+
+    # 2. Repeats within the TTL are cache hits
+    start = time.perf_counter()
+    for _ in range(1000):
+        await call("london ")
+    print(f"1000 cached lookups: {(time.perf_counter() - start) * 1000:.1f} ms total, "
+          f"{server.requests} upstream request(s)")
+
+    # 3. Distinct cities go upstream concurrently over pooled keep-alive connections
+    start = time.perf_counter()
+    await asyncio.gather(*(call(f"City{i}") for i in range(20)))
+    print(f"20 distinct cities: {(time.perf_counter() - start) * 1000:.0f} ms, "
+          f"{server.requests} upstream request(s)")
+
+    # 4. Failures are not cached
+    await call("Nowhere")
+    await call("Nowhere")
+    print(f"2 failing lookups: {server.requests} upstream request(s) total")
+
+    print(f"\nget_weather cache stats: {cache.stats()}")
+    await close_http_client()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    with StubWeatherServer(latency=args.latency) as server:
+        # Must be set before the tools module reads its config
+        os.environ["WEATHER_API_BASE"] = server.base_url
+        asyncio.run(run(args, server))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Thread vector deletion against an in-memory index stand-in.
+
+Indexes one large thread (default 25,000 chunks over 5 files) next to a
+neighbour thread, then compares the old dummy-vector query (top_k=10000)
+with the manifest-driven batched delete, and checks the fallbacks for
+threads indexed before the manifest existed (prefix listing on serverless
+indexes, metadata-filter delete on pod-based indexes).
+
+Run from backend/:
+    python -m benchmarks.bench_vector_delete [--chunks 25000] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.fakes import FakeIndex
+
+
+def fill(index, thread_id, files, chunks):
+    from app.services.document_parser import chunk_id
+
+    per_file = chunks // files
+    for f in range(files):
+        filename = f"doc{f}.pdf"
+        index.upsert([
+            {"id": chunk_id(thread_id, filename, i), "values": [0.0] * 8,
+             "metadata": {"thread_id": thread_id, "source": filename, "chunk_index": i}}
+            for i in range(per_file)
+        ])
+    return [(f"doc{f}.pdf", per_file) for f in range(files)]
+
+
+def remaining(index, thread_id):
+    return sum(1 for v in index.vectors.values() if v["metadata"]["thread_id"] == thread_id)
+
+
+def legacy_delete(index, thread_id):
+    """The previous implementation: list ids with a zero-vector similarity query."""
+    results = index.query(vector=[0.0] * 768, top_k=10000, include_metadata=True, filter={"thread_id": thread_id})
+    ids = [m["id"] for m in results.get("matches", [])]
+    if ids:
+        index.delete(ids=ids)
+
+
+async def run(args):
+    from app.db.sqlite_conn import init_db
+    from app.db.async_sqlite import close_pool
+    from app.services.document_manifest import arecord_document, delete_thread_vectors
+
+    init_db()
+    target, neighbour = "thread-big", "thread-neighbour"
+
+    def make_index(**kwargs):
+        index = FakeIndex(upsert_latency=0, **kwargs)
+        documents = fill(index, target, args.files, args.chunks)
+        fill(index, neighbour, 1, 1000)
+        index.op_latency = args.latency
+        return index, documents
+
+    # 1. Old path
+    index, _ = make_index()
+    started = time.perf_counter()
+    try:
+        legacy_delete(index, target)
+        outcome = "ok"
+    except ValueError as e:
+        outcome = f"failed: {e}"
+    elapsed = time.perf_counter() - started
+    print(f"dummy-vector query : {elapsed:6.2f}s  calls {index.calls['query']} query + {index.calls['delete']} delete ({outcome}); "
+          f"left behind {remaining(index, target)} of {args.chunks}")
+
+    # 2. Manifest
+    index, documents = make_index()
+    for filename, count in documents:
+        await arecord_document(target, filename, count)
+    started = time.perf_counter()
+    deleted = await delete_thread_vectors(target, index)
+    elapsed = time.perf_counter() - started
+    print(f"manifest           : {elapsed:6.2f}s  {index.calls['delete']} delete calls, {deleted} ids; "
+          f"left behind {remaining(index, target)}; neighbour intact: {remaining(index, neighbour) == 1000}")
+
+    # 3. No manifest, serverless: list by prefix
+    index, _ = make_index()
+    started = time.perf_counter()
+    deleted = await delete_thread_vectors(target, index)
+    elapsed = time.perf_counter() - started
+    print(f"prefix listing     : {elapsed:6.2f}s  {index.calls['list']} list pages + {index.calls['delete']} delete calls; "
+          f"left behind {remaining(index, target)}; neighbour intact: {remaining(index, neighbour) == 1000}")
+
+    # 4. No manifest, pod-based: delete by metadata filter
+    index, _ = make_index(serverless=False)
+    started = time.perf_counter()
+    deleted = await delete_thread_vectors(target, index)
+    elapsed = time.perf_counter() - started
+    print(f"filter delete      : {elapsed:6.2f}s  {index.calls['delete']} delete call; "
+          f"left behind {remaining(index, target)}; neighbour intact: {remaining(index, neighbour) == 1000}")
+
+    await close_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=25000)
+    parser.add_argument("--files", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="per-call index latency (s)")
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="bench_delete_"))
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Local vector store query latency and IVF recall.
+
+Fills one LocalVectorStore partition per corpus size with clustered synthetic
+embeddings (768-d, like text-embedding-004), then times thread-filtered
+top-k queries. Corpora below LOCAL_ANN_THRESHOLD are searched exactly; larger
+ones go through the IVF index, whose recall@k is measured against an exact
+scan. Also reports the cold open (memory-map + log replay) after a restart.
+
+Run from backend/:
+    python -m benchmarks.bench_vector_store [--sizes 200,2000,20000,100000] [--queries 200]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+
+def corpus(n, dim, rng, clusters=256):
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(0, clusters, n)] + 0.35 * rng.normal(size=(n, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def run(args):
+    from app.services.vector_store import LocalVectorStore
+
+    rng = np.random.default_rng(0)
+    print(f"dim {args.dim}, top_k {args.top_k}, {args.queries} queries, ANN threshold {args.ann_threshold}, nprobe {args.nprobe}")
+    for n in args.sizes:
+        root = tempfile.mkdtemp(prefix="bench_vstore_")
+        store = LocalVectorStore(root, ann_threshold=args.ann_threshold, nprobe=args.nprobe)
+        thread_id = f"thread-{n}"
+        vectors = corpus(n, args.dim, rng)
+        started = time.perf_counter()
+        for start in range(0, n, 1000):
+            store.upsert([
+                {"id": f"{thread_id}_doc.pdf_{i}", "values": vectors[i],
+                 "metadata": {"thread_id": thread_id, "source": "doc.pdf", "chunk_index": i}}
+                for i in range(start, min(n, start + 1000))
+            ])
+        upsert_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        store = LocalVectorStore(root, ann_threshold=args.ann_threshold, nprobe=args.nprobe)
+        query = lambda v: store.query(vector=v, top_k=args.top_k, filter={"thread_id": thread_id}, include_metadata=True)
+        query(vectors[0])  # open the partition (and build the IVF index if any)
+        cold_ms = (time.perf_counter() - started) * 1000
+
+        latencies, hits = [], 0
+        for q in range(args.queries):
+            v = vectors[rng.integers(0, n)] + 0.1 * rng.normal(size=args.dim).astype(np.float32)
+            v /= np.linalg.norm(v)
+            started = time.perf_counter()
+            matches = query(v)["matches"]
+            latencies.append(time.perf_counter() - started)
+            exact = set(np.argpartition(-(vectors @ v), args.top_k)[:args.top_k])
+            hits += len(exact & {int(m["id"].rsplit("_", 1)[1]) for m in matches})
+
+        latencies.sort()
+        engine = "ivf" if n >= args.ann_threshold else "exact"
+        print(f"{n:>8} vectors [{engine:5s}]  p50 {statistics.median(latencies) * 1e6:8.0f} us  "
+              f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1e6:8.0f} us  "
+              f"recall@{args.top_k} {hits / (args.queries * args.top_k):.3f}  "
+              f"cold open {cold_ms:7.1f} ms  ingest {n / upsert_s:8.0f} vec/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[200, 2000, 20000, 100000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--ann-threshold", type=int, default=20000)
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""
+Offline stand-ins for external services used by the benchmarks.
+Latencies are injected with time.sleep so they behave like blocking network calls
+(the chat model uses asyncio.sleep, like a streaming HTTP response).
+"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import uuid
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeEmbedder:
+    """
+    Deterministic embedder with a fixed per-call latency plus a per-text cost,
+    mimicking a remote embedding API (one round-trip per call).
+    """
+
+    def __init__(self, dim: int = 768, call_latency: float = 0.05, per_item_latency: float = 0.0005):
+        self.dim = dim
+        self.call_latency = call_latency
+        self.per_item_latency = per_item_latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _vector(self, text: str):
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return [digest[i % len(digest)] / 255.0 for i in range(self.dim)]
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.call_latency + self.per_item_latency * len(texts))
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class BagOfWordsEmbedder(FakeEmbedder):
+    """
+    Embedder with crude semantics for retrieval-quality benchmarks: a hashed
+    bag of words, where words in `synonyms` map to a shared concept (so
+    paraphrases match, as with a real dense model). Like dense models, it
+    blurs identifiers: they are split into sub-words and numbers are dropped.
+    """
+
+    def __init__(self, synonyms=None, **kwargs):
+        super().__init__(**kwargs)
+        self.synonyms = synonyms or {}
+
+    def _vector(self, text: str):
+        import re
+
+        vector = [0.0] * self.dim
+        for word in re.findall(r"[a-z]+", text.lower()):
+            word = self.synonyms.get(word, word)
+            digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dim] += 1.0 if digest[4] & 1 else -1.0
+        return vector
+
+
+class FakeIndex:
+    """
+    In-memory Pinecone index stand-in. `upsert_latency` applies to upserts,
+    `op_latency` to every other call. Supports delete by ids or filter,
+    prefix listing (100 ids per page, like serverless indexes) and filtered
+    queries; `serverless=False` makes list() raise like a pod-based index.
+    """
+
+    def __init__(self, upsert_latency: float = 0.01, op_latency: float = 0.0, serverless: bool = True):
+        self.upsert_latency = upsert_latency
+        self.op_latency = op_latency
+        self.serverless = serverless
+        self.vectors = {}
+        self.calls = {"upsert": 0, "delete": 0, "list": 0, "query": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, op):
+        with self._lock:
+            self.calls[op] += 1
+
+    @staticmethod
+    def _matches(metadata, filter):
+        return all(metadata.get(k) == v for k, v in (filter or {}).items())
+
+    def upsert(self, vectors):
+        self._count("upsert")
+        time.sleep(self.upsert_latency)
+        with self._lock:
+            for v in vectors:
+                self.vectors[v["id"]] = v
+
+    def delete(self, ids=None, filter=None):
+        self._count("delete")
+        time.sleep(self.op_latency)
+        with self._lock:
+            if ids is not None:
+                if len(ids) > 1000:
+                    raise ValueError("Pinecone deletes at most 1000 ids per call")
+                for vector_id in ids:
+                    self.vectors.pop(vector_id, None)
+            elif filter:
+                for vector_id in [i for i, v in self.vectors.items() if self._matches(v["metadata"], filter)]:
+                    del self.vectors[vector_id]
+
+    def list(self, prefix="", limit=100):
+        if not self.serverless:
+            raise RuntimeError("list() is only supported on serverless indexes")
+        with self._lock:
+            ids = sorted(i for i in self.vectors if i.startswith(prefix))
+        for start in range(0, len(ids), limit):
+            self._count("list")
+            time.sleep(self.op_latency)
+            yield ids[start:start + limit]
+
+    def query(self, vector, top_k=10, filter=None, include_metadata=False, **kwargs):
+        self._count("query")
+        time.sleep(self.op_latency)
+        with self._lock:
+            hits = [v for v in self.vectors.values() if self._matches(v["metadata"], filter)]
+        return {"matches": [
+            {"id": v["id"], "score": 0.0, "metadata": v["metadata"] if include_metadata else None}
+            for v in hits[:min(top_k, 10000)]
+        ]}
+
+
+class SlowVectorStore:
+    """
+    Wraps a real vector store (LocalVectorStore) and adds a fixed latency per
+    call, so results are ranked for real while timing behaves like a remote
+    index. `query_latency` applies to queries, `write_latency` to upserts and
+    deletes.
+    """
+
+    def __init__(self, store, query_latency: float = 0.02, write_latency: float = 0.01):
+        self.store = store
+        self.query_latency = query_latency
+        self.write_latency = write_latency
+
+    def upsert(self, vectors, **kwargs):
+        time.sleep(self.write_latency)
+        return self.store.upsert(vectors, **kwargs)
+
+    def delete(self, ids=None, filter=None, **kwargs):
+        time.sleep(self.write_latency)
+        return self.store.delete(ids=ids, filter=filter, **kwargs)
+
+    def query(self, vector, **kwargs):
+        time.sleep(self.query_latency)
+        return self.store.query(vector, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+
+def write_pdf(path: str, pages, lines_per_page: int = 60):
+    """
+    Write a minimal text PDF (one Helvetica text block per page), enough for
+    pypdf to extract. `pages` is a list of page texts; long pages are wrapped.
+    """
+    import textwrap
+
+    def escape(text):
+        return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    objects = []  # bodies; object n is objects[n - 1]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(None)  # page tree, filled in below
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    page_ids = []
+    for text in pages:
+        lines = textwrap.wrap(text, 95)[:lines_per_page]
+        stream = "BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(f"({escape(l)}) '" for l in lines) + " ET"
+        stream = stream.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects)
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{n} 0 R" for n in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for n, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % n + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_docx(path: str, paragraphs):
+    """Write a minimal .docx (just word/document.xml and its package parts), one run per paragraph."""
+    import zipfile
+    from xml.sax.saxutils import escape
+
+    w = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+    body = "".join(f'<w:p><w:r><w:t xml:space="preserve">{escape(p)}</w:t></w:r></w:p>' for p in paragraphs)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>'
+        ))
+        archive.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+            'relationships/officeDocument" Target="word/document.xml"/></Relationships>'
+        ))
+        archive.writestr("word/document.xml", (
+            f'<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="{w}"><w:body>{body}</w:body></w:document>'
+        ))
+
+
+class StubWeatherServer:
+    """
+    Local wttr.in stand-in (format=j1) with injected latency.
+    Use as a context manager; `base_url` goes into WEATHER_API_BASE.
+    """
+
+    def __init__(self, latency: float = 0.2):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        import json
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                time.sleep(server.latency)
+                city = self.path.split("?")[0].strip("/")
+                if city.lower() == "nowhere":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = json.dumps({"current_condition": [{
+                    "temp_C": "18", "temp_F": "64", "humidity": "70",
+                    "weatherDesc": [{"value": "Partly cloudy"}],
+                }]}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Streaming chat model stand-in: emits `reply` word by word at a fixed token
+    rate after `first_token_latency`. `tokens_emitted` counts what was actually
+    generated, so cancellation can be observed from outside.
+    """
+
+    reply: str = " ".join(f"token{i}" for i in range(200))
+    tokens_per_second: float = 50.0
+    first_token_latency: float = 0.2
+    tokens_emitted: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _reply(self, messages) -> str:
+        return self.reply
+
+    def _pieces(self, reply):
+        words = reply.split(" ")
+        return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        reply = self._reply(messages)
+        pieces = self._pieces(reply)
+        time.sleep(self.first_token_latency + len(pieces) / self.tokens_per_second)
+        self.tokens_emitted += len(pieces)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=reply))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.first_token_latency)
+        for piece in self._pieces(self._reply(messages)):
+            self.tokens_emitted += 1
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+            await asyncio.sleep(1.0 / self.tokens_per_second)
+
+
+class EchoChatModel(FakeChatModel):
+    """
+    FakeChatModel whose answer says what it was given:
+    "turn <n> re <last user message> <padding>", where n is the number of user
+    messages in the prompt. A turn that ran on stale history (a lost or
+    interleaved write) answers with the wrong n.
+    """
+
+    padding_tokens: int = 20
+
+    def _reply(self, messages) -> str:
+        questions = [m.content for m in messages if m.type == "human"]
+        padding = " ".join(f"pad{i}" for i in range(self.padding_tokens))
+        return f"turn {len(questions)} re {questions[-1] if questions else ''} {padding}".strip()
+
+
+class ToolCallingChatModel(FakeChatModel):
+    """
+    FakeChatModel that answers a user message with `tool_calls` first (one
+    streamed chunk carrying every call, like a parallel tool-calling model),
+    then streams `reply` once the tool results are in the prompt.
+    """
+
+    tool_calls: list = []
+
+    def _wants_tools(self, messages) -> bool:
+        return bool(self.tool_calls) and bool(messages) and messages[-1].type == "human"
+
+    def _calls(self):
+        return [{**call, "id": f"call_{i}_{uuid.uuid4().hex[:8]}"} for i, call in enumerate(self.tool_calls)]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if not self._wants_tools(messages):
+            return super()._generate(messages, stop, run_manager, **kwargs)
+        time.sleep(self.first_token_latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="", tool_calls=self._calls()))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        if not self._wants_tools(messages):
+            async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+                yield chunk
+            return
+        await asyncio.sleep(self.first_token_latency)
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+            {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+            for i, call in enumerate(self._calls())
+        ]))
@@ -0,0 +1,17 @@
+"""
+ASGI app for bench_load: app.main with the chat model replaced by EchoChatModel.
+Imported by every uvicorn worker, so each worker gets its own fake model.
+
+    uvicorn benchmarks.load_app:app --workers 4
+"""
+import os
+
+from app.main import app
+from app.services.service_registry import override_service
+from benchmarks.fakes import EchoChatModel
+
+override_service("chat_llm", EchoChatModel(
+    first_token_latency=float(os.getenv("LOAD_FIRST_TOKEN_LATENCY", "0.2")),
+    tokens_per_second=float(os.getenv("LOAD_TOKENS_PER_SECOND", "200")),
+    padding_tokens=int(os.getenv("LOAD_PADDING_TOKENS", "20")),
+))
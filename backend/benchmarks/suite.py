@@ -0,0 +1,416 @@
+"""
+End-to-end benchmark suite against offline stand-ins, saved as JSON for comparison.
+
+Every external service is replaced by a fake with configurable latency
+(benchmarks.fakes): the Groq chat model (FakeChatModel / ToolCallingChatModel),
+the Gemini embedder (FakeEmbedder), the vector store (LocalVectorStore behind
+SlowVectorStore) and the tool backends (StubWeatherServer, stock and search
+lookups). Databases live in a temp directory. Scenarios, in order:
+    ingest     - a --pages page PDF through process_and_store_document with a
+                 spawned parse pool: pages/s, chunks/s; then the unchanged re-upload
+    retrieval  - search_documents (hybrid) over that document: questions with a
+                 cold and a warm query embedding cache, and bare keyword queries
+    chat       - --threads threads x --turns turns through the compiled graph and
+                 the SQLite checkpointer: turn latency, TTFT, streamed tokens/s;
+                 then --tool-turns turns calling weather, stock, web search and
+                 document search at once
+    history    - --messages messages over --history-threads threads: latest
+                 page and full-history load p50/p99, concurrent page loads/s
+
+Results are written to --output (default suite-<timestamp>.json). With
+--compare <earlier.json>, metrics that got worse by more than --tolerance are
+listed and the exit status is 1.
+
+Run from backend/:
+    python -m benchmarks.suite [--pages 100] [--threads 4] [--turns 5] [--messages 200000]
+    python -m benchmarks.suite --compare suite-20260101-120000.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from benchmarks.fakes import (
+    FakeChatModel,
+    FakeEmbedder,
+    SlowVectorStore,
+    StubWeatherServer,
+    ToolCallingChatModel,
+    write_pdf,
+)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORDS = ("vector index chunk thread upload embed cache query latency model token page table column "
+         "schema backup session trigger archive restore server storage engine permission").split()
+# Millisecond differences below this are noise, whatever the ratio
+NOISE_FLOOR_MS = 0.5
+
+
+def summarize(name, seconds, results):
+    """Add <name>.p50 / .p99 / .mean (ms) for a list of durations in seconds."""
+    values = sorted(seconds)
+    results[f"{name}.p50"] = round(values[len(values) // 2] * 1000, 3)
+    results[f"{name}.p99"] = round(values[int(0.99 * (len(values) - 1))] * 1000, 3)
+    results[f"{name}.mean"] = round(sum(values) / len(values) * 1000, 3)
+
+
+def higher_is_better(metric: str) -> bool:
+    return "_per_s" in metric
+
+
+def corpus(pages, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(400)).capitalize() + "." for _ in range(pages)]
+
+
+def _warm(_):
+    import app.services.document_parser  # noqa: F401 (what the first window would pay for)
+    return os.getpid()
+
+
+# ==========================================
+# SCENARIOS
+# ==========================================
+
+async def bench_ingest(args, workdir, thread_id, results):
+    from app.services.rag_service import process_and_store_document
+
+    path = os.path.join(workdir, "manual.pdf")
+    write_pdf(path, corpus(args.pages))
+    pool = ProcessPoolExecutor(max_workers=args.parse_workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        # Pool start-up is paid once per server, not per document
+        list(pool.map(_warm, range(args.parse_workers)))
+
+        progress = SimpleNamespace(pages_parsed=0, chunks_total=0, chunks_embedded=0, vectors_upserted=0,
+                                   chunks_cached=0, chunks_unchanged=0)
+        started = time.perf_counter()
+        ok, message = await process_and_store_document(path, "manual.pdf", thread_id, progress, pool)
+        elapsed = time.perf_counter() - started
+        if not ok:
+            raise RuntimeError(message)
+        chunks = progress.chunks_total
+        results["ingest.seconds"] = round(elapsed, 3)
+        results["ingest.pages_per_s"] = round(args.pages / elapsed, 2)
+        results["ingest.chunks_per_s"] = round(chunks / elapsed, 2)
+
+        started = time.perf_counter()
+        await process_and_store_document(path, "manual.pdf", thread_id, executor=pool)
+        results["ingest.unchanged_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    finally:
+        pool.shutdown()
+    print(f"ingest:    {args.pages} pages, {chunks} chunks in {elapsed:.2f}s "
+          f"({results['ingest.pages_per_s']} pages/s); unchanged re-upload {results['ingest.unchanged_ms']:.1f} ms")
+
+
+async def bench_retrieval(args, thread_id, results):
+    from app.services.rag_service import search_documents
+    from app.services.retrieval import query_embedding_cache
+
+    rng = random.Random(1)
+    # Questions go through BM25 + embedding + vector query; a few bare terms are
+    # answered by the keyword index alone when it has hits
+    questions = [f"how does the {rng.choice(WORDS)} {rng.choice(WORDS)} affect {rng.choice(WORDS)}?"
+                 for _ in range(args.queries)]
+    keywords = [" ".join(rng.sample(WORDS, 2)) for _ in range(args.queries)]
+
+    async def timings(queries, cold):
+        seconds = []
+        for query in queries:
+            if cold:
+                query_embedding_cache.clear()
+            started = time.perf_counter()
+            await search_documents(query, thread_id, 3)
+            seconds.append(time.perf_counter() - started)
+        return seconds
+
+    summarize("retrieval.cold_ms", await timings(questions, cold=True), results)
+    # The cold pass left one entry; repeat the questions once so every embedding is cached
+    await timings(questions, cold=False)
+    summarize("retrieval.cached_ms", await timings(questions, cold=False), results)
+    summarize("retrieval.keyword_ms", await timings(keywords, cold=True), results)
+    print(f"retrieval: {len(questions)} questions, cold p50 {results['retrieval.cold_ms.p50']:.1f} ms / "
+          f"p99 {results['retrieval.cold_ms.p99']:.1f} ms, cached embedding p50 {results['retrieval.cached_ms.p50']:.1f} ms; "
+          f"keyword queries p50 {results['retrieval.keyword_ms.p50']:.1f} ms")
+
+
+async def run_turn(chat_service, chatbot, thread_id, message):
+    """One turn through stream_chat_response: (seconds, ttft, streamed tokens, final event)."""
+    started = time.perf_counter()
+    ttft, text, last = None, "", None
+    async for event, data in chat_service.stream_chat_response(message, thread_id, chatbot):
+        last = event
+        if event == "token":
+            if ttft is None:
+                ttft = time.perf_counter() - started
+            text += data["text"]
+    return time.perf_counter() - started, ttft, len(text.split()), last
+
+
+def stream_rates(turns):
+    return [tokens / (seconds - ttft) for seconds, ttft, tokens, _ in turns if ttft is not None and seconds > ttft]
+
+
+async def bench_chat(args, chatbot, doc_thread, results):
+    from app.services import chat_service
+    from app.services.service_registry import override_service
+    from app.services.thread_service import acreate_thread
+
+    reply = " ".join(f"tok{i}" for i in range(args.tokens))
+    override_service("chat_llm", FakeChatModel(
+        reply=reply, first_token_latency=args.first_token, tokens_per_second=args.rate,
+    ))
+    threads = [await acreate_thread(f"Bench {i}") for i in range(args.threads)]
+
+    async def conversation(thread_id):
+        return [await run_turn(chat_service, chatbot, thread_id, f"question {k}") for k in range(args.turns)]
+
+    started = time.perf_counter()
+    turns = [t for conv in await asyncio.gather(*(conversation(t) for t in threads)) for t in conv]
+    elapsed = time.perf_counter() - started
+    failed = [t for t in turns if t[3] != "done"]
+    if failed:
+        raise RuntimeError(f"{len(failed)} chat turns did not finish: {failed[:3]}")
+    summarize("chat.turn_ms", [t[0] for t in turns], results)
+    summarize("chat.ttft_ms", [t[1] for t in turns], results)
+    rates = sorted(stream_rates(turns))
+    results["chat.stream_tokens_per_s.p50"] = round(rates[len(rates) // 2], 2)
+    results["chat.turns_per_s"] = round(len(turns) / elapsed, 3)
+    print(f"chat:      {len(turns)} turns ({args.threads} threads at once), turn p50 {results['chat.turn_ms.p50']:.0f} ms "
+          f"/ p99 {results['chat.turn_ms.p99']:.0f} ms, TTFT p50 {results['chat.ttft_ms.p50']:.0f} ms, "
+          f"{results['chat.stream_tokens_per_s.p50']:.0f} tok/s (model {args.rate:.0f})")
+
+    if not args.tool_turns:
+        return
+    model = ToolCallingChatModel(reply=reply, first_token_latency=args.first_token, tokens_per_second=args.rate)
+    override_service("chat_llm", model)
+    turns = []
+    for k in range(args.tool_turns):
+        # New arguments every turn, so the tool caches do not answer
+        model.tool_calls = [
+            {"name": "get_weather", "args": {"city": f"City{k}"}},
+            {"name": "get_stock_price", "args": {"symbol": f"SYM{k}"}},
+            {"name": "duckduckgo_search", "args": {"query": f"news {k}"}},
+            {"name": "search_documents", "args": {"query": f"{WORDS[k % len(WORDS)]} cache latency"}},
+        ]
+        turns.append(await run_turn(chat_service, chatbot, doc_thread, f"tools {k}"))
+    failed = [t for t in turns if t[3] != "done"]
+    if failed:
+        raise RuntimeError(f"{len(failed)} tool turns did not finish: {failed[:3]}")
+    summarize("chat.tool_turn_ms", [t[0] for t in turns], results)
+    summarize("chat.tool_ttft_ms", [t[1] for t in turns], results)
+    slowest = max(args.weather_latency, args.stock_latency, args.search_latency)
+    print(f"tools:     {len(turns)} turns with 4 tool calls each, turn p50 {results['chat.tool_turn_ms.p50']:.0f} ms, "
+          f"TTFT p50 {results['chat.tool_ttft_ms.p50']:.0f} ms (slowest backend {slowest * 1000:.0f} ms)")
+
+
+def seed_history(db_path, n_messages, n_threads):
+    conn = sqlite3.connect(db_path)
+    thread_ids = [f"history-{i}" for i in range(n_threads)]
+    conn.executemany("INSERT INTO threads (id, name) VALUES (?, 'History')", ((t,) for t in thread_ids))
+    rng = random.Random(2)
+    rows = (
+        (rng.choice(thread_ids), "user" if i % 2 else "assistant", "x" * 200, f"-{n_messages - i} seconds")
+        for i in range(n_messages)
+    )
+    conn.executemany(
+        "INSERT INTO messages (thread_id, role, content, created_at) VALUES (?, ?, ?, datetime('now', ?))", rows
+    )
+    conn.commit()
+    conn.close()
+    return thread_ids
+
+
+async def bench_history(args, results):
+    from app.db.sqlite_conn import DB_PATH
+    from app.services.thread_service import aget_thread_messages, aget_thread_messages_for_api
+
+    started = time.perf_counter()
+    thread_ids = await asyncio.to_thread(seed_history, str(DB_PATH), args.messages, args.history_threads)
+    seeded = time.perf_counter() - started
+    rng = random.Random(3)
+    sample = [rng.choice(thread_ids) for _ in range(args.loads)]
+
+    page, full = [], []
+    for thread_id in sample:
+        started = time.perf_counter()
+        await aget_thread_messages_for_api(thread_id, limit=50)
+        page.append(time.perf_counter() - started)
+    for thread_id in sample:
+        started = time.perf_counter()
+        await aget_thread_messages(thread_id)
+        full.append(time.perf_counter() - started)
+    summarize("history.page_ms", page, results)
+    summarize("history.full_ms", full, results)
+
+    limit = asyncio.Semaphore(args.history_concurrency)
+
+    async def load(thread_id):
+        async with limit:
+            await aget_thread_messages_for_api(thread_id, limit=50)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(load(t) for t in sample))
+    results["history.concurrent_pages_per_s"] = round(len(sample) / (time.perf_counter() - started), 2)
+    print(f"history:   {args.messages} messages / {args.history_threads} threads (seeded in {seeded:.1f}s), "
+          f"latest page p50 {results['history.page_ms.p50']:.2f} ms / p99 {results['history.page_ms.p99']:.2f} ms, "
+          f"full thread p50 {results['history.full_ms.p50']:.2f} ms, "
+          f"{results['history.concurrent_pages_per_s']:.0f} pages/s at {args.history_concurrency} concurrent")
+
+
+async def run(args, workdir):
+    from app.db.sqlite_conn import init_db, CHECKPOINT_PATH
+    from app.db.async_sqlite import close_pool
+    from app.config import CHECKPOINT_STORAGE
+    from app.graph import checkpointer as checkpoint, langgraph_setup
+    from app.services.service_registry import override_service
+    from app.services.thread_service import acreate_thread
+    from app.services.vector_store import LocalVectorStore
+    from app.utils import tools as tools_module
+    from app.utils.tool_runtime import close_http_client
+
+    def slow_stock(symbol):
+        time.sleep(args.stock_latency)
+        return f"{symbol} is currently trading at 123.45 USD"
+
+    def slow_search(query):
+        time.sleep(args.search_latency)
+        return f"Results for {query}"
+
+    init_db()
+    tools_module._fetch_stock_price = slow_stock
+    tools_module._fetch_search = slow_search
+    override_service("embeddings", FakeEmbedder(call_latency=args.embed_latency, per_item_latency=0.0005))
+    override_service("vector_store", SlowVectorStore(
+        LocalVectorStore(os.path.join(workdir, "vectors")),
+        query_latency=args.vector_latency, write_latency=args.vector_latency,
+    ))
+    override_service("summary_llm", FakeChatModel(reply="Summary of the earlier turns.", first_token_latency=args.first_token))
+
+    results = {}
+    doc_thread = await acreate_thread("Documents")
+    await bench_ingest(args, workdir, doc_thread, results)
+    await bench_retrieval(args, doc_thread, results)
+
+    saver_class = checkpoint.DeltaSqliteSaver if CHECKPOINT_STORAGE == "delta" else checkpoint.AsyncSqliteSaver
+    async with checkpoint.with_timing(saver_class).from_conn_string(str(CHECKPOINT_PATH)) as saver:
+        await saver.setup()
+        chatbot = langgraph_setup.graph.compile(checkpointer=saver)
+        await bench_chat(args, chatbot, doc_thread, results)
+
+    await bench_history(args, results)
+    await close_http_client()
+    await close_pool()
+    return results
+
+
+# ==========================================
+# RESULTS
+# ==========================================
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=10,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Print every shared metric against `baseline`; return the ones worse by more than `tolerance`."""
+    regressions = []
+    print(f"\n{'metric':36s} {'baseline':>12s} {'now':>12s} {'change':>8s}")
+    for metric in sorted(set(results) & set(baseline)):
+        old, new = baseline[metric], results[metric]
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better(metric) else change
+        noise = metric.endswith(("_ms", ".p50", ".p99", ".mean")) and abs(new - old) < NOISE_FLOOR_MS
+        flag = ""
+        if worse > tolerance and not noise:
+            regressions.append(metric)
+            flag = "  REGRESSION"
+        print(f"{metric:36s} {old:12.3f} {new:12.3f} {change * 100:+7.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", help="results file (default suite-<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown before flagging")
+    size = parser.add_argument_group("scenario sizes")
+    size.add_argument("--pages", type=int, default=100, help="pages in the ingested PDF")
+    size.add_argument("--parse-workers", type=int, default=2, help="ingestion parse processes")
+    size.add_argument("--queries", type=int, default=100, help="retrieval queries")
+    size.add_argument("--threads", type=int, default=4, help="chat threads talking at once")
+    size.add_argument("--turns", type=int, default=5, help="turns per chat thread")
+    size.add_argument("--tool-turns", type=int, default=5, help="turns with four tool calls each")
+    size.add_argument("--tokens", type=int, default=60, help="tokens per answer")
+    size.add_argument("--messages", type=int, default=200_000, help="messages in the history database")
+    size.add_argument("--history-threads", type=int, default=2000)
+    size.add_argument("--loads", type=int, default=500, help="history loads per measurement")
+    size.add_argument("--history-concurrency", type=int, default=32)
+    fake = parser.add_argument_group("fake service latencies (seconds)")
+    fake.add_argument("--first-token", type=float, default=0.15, help="chat model time to first token")
+    fake.add_argument("--rate", type=float, default=200.0, help="chat model tokens per second")
+    fake.add_argument("--embed-latency", type=float, default=0.05, help="per embedding call")
+    fake.add_argument("--vector-latency", type=float, default=0.02, help="per vector store call")
+    fake.add_argument("--weather-latency", type=float, default=0.2)
+    fake.add_argument("--stock-latency", type=float, default=0.3)
+    fake.add_argument("--search-latency", type=float, default=0.25)
+    args = parser.parse_args()
+
+    stamp = datetime.now(timezone.utc)
+    output = os.path.abspath(args.output or f"suite-{stamp:%Y%m%d-%H%M%S}.json")
+    workdir = tempfile.mkdtemp(prefix="bench_suite_")
+    with StubWeatherServer(latency=args.weather_latency) as weather:
+        # Read by app.config at import time
+        os.environ.update(
+            GROQ_API_KEY=os.environ.get("GROQ_API_KEY", "offline"),
+            DATABASE_PATH=os.path.join(workdir, "chatbot.db"),
+            CHECKPOINT_DB_PATH=os.path.join(workdir, "checkpoints.db"),
+            VECTOR_STORE="local",
+            RESPONSE_CACHE_ENABLED="false",
+            WEATHER_API_BASE=weather.base_url,
+        )
+        results = asyncio.run(run(args, workdir))
+
+    report = {
+        "suite": "benchmarks.suite",
+        "created_at": stamp.isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "tolerance")},
+        "results": results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"\nresults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("args") != report["args"]:
+            print("note: the baseline was run with different arguments")
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metrics regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
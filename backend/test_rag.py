@@ -1,18 +1,25 @@
-import os
+import sys
 from dotenv import load_dotenv
 # .env load karna zaroori hai
 load_dotenv()
 
 from app.utils.rag_tools import rag_manager
 
+# Live check against the configured vector store + embeddings (needs API keys).
+# Offline benchmarks with fake services: python -m benchmarks.suite
+#   python test_rag.py <thread_id> ["query"]
+if len(sys.argv) < 2:
+    sys.exit("usage: python test_rag.py <thread_id> [query]")
+thread_id = sys.argv[1]
+
 # PDF se juda koi sawal puchiye (SQL Commands ke baare mein)
-query = "Explain the SELECT command" 
+query = sys.argv[2] if len(sys.argv) > 2 else "Explain the SELECT command"
 
-print(f"🔎 Searching for: '{query}'...")
+print(f"🔎 Searching for: '{query}' in thread {thread_id}...")
 
-# Pinecone se search karega
-answer = rag_manager.search(query)
+# Sirf is thread ke documents mein search karega
+answer = rag_manager.search(query, thread_id)
 
-print("\n--- 📄 RESULT FROM PINECONE ---")
+print("\n--- 📄 RESULT FROM VECTOR STORE ---")
 print(answer)
-print("-------------------------------")
\ No newline at end of file
+print("-----------------------------------")
@@ -0,0 +1,31 @@
+"""Fixtures shared by the tests that need the application database."""
+import asyncio
+import sqlite3
+
+import pytest
+
+from app.db import async_sqlite
+from app.db.migrations import run_migrations
+
+
+@pytest.fixture
+def run_with_database(tmp_path, monkeypatch):
+    """Run a coroutine function with the pool pointed at a fresh, migrated database."""
+    path = tmp_path / "chatbot.db"
+    conn = sqlite3.connect(path)
+    run_migrations(conn)
+    conn.close()
+
+    def run(body):
+        async def main():
+            pool = async_sqlite.AsyncSQLitePool(path=path, size=2)
+            await pool.open()
+            monkeypatch.setattr(async_sqlite, "_pool", pool)
+            try:
+                return await body()
+            finally:
+                await pool.close()
+
+        return asyncio.run(main())
+
+    return run
@@ -0,0 +1,109 @@
+"""Admission tickets and run slots of /chat/send turns (in-process thread locks, a stand-in agent turn)."""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.db.async_sqlite import get_pool
+from app.routes.chat_routes import chat_send
+from app.schemas.chat_schema import ChatRequest
+from app.services import chat_service, thread_locks
+from app.services.admission import AdmissionController
+from app.services.chat_runs import ChatRunManager
+from app.services.thread_service import INSERT_THREAD_SQL
+
+CLIENT = Request({"type": "http", "headers": [], "client": ("10.0.0.1", 1234)})
+
+
+@pytest.fixture
+def gates(monkeypatch):
+    """message -> asyncio.Event the turn answering it waits for."""
+    gates = {}
+
+    async def answer(message, thread_id, chatbot):
+        await gates.setdefault(message, asyncio.Event()).wait()
+        yield "token", {"text": message}
+        yield "done", {"cached": False, "tools": []}
+
+    monkeypatch.setattr(chat_service, "_answer", answer)
+    monkeypatch.setattr(thread_locks, "THREAD_LOCKS", "local")
+    return gates
+
+
+async def create_threads(*thread_ids):
+    pool = await get_pool()
+    async with pool.write() as conn:
+        await conn.executemany(INSERT_THREAD_SQL, [(thread_id, "Test") for thread_id in thread_ids])
+
+
+def controller(max_concurrent=2):
+    return AdmissionController(max_concurrent=max_concurrent, max_queued=4, client_rate=(0, 1), thread_rate=(0, 1))
+
+
+async def send(admission, runs, thread_id, message):
+    response = await chat_send(ChatRequest(message=message, thread_id=thread_id), CLIENT, None, runs, admission)
+    return runs.get(response.headers["x-run-id"])
+
+
+def test_turn_waiting_for_its_thread_does_not_hold_a_run_slot(gates, run_with_database):
+    async def body():
+        await create_threads("a", "b")
+        admission, runs = controller(max_concurrent=2), ChatRunManager(shared=False)
+        first = await send(admission, runs, "a", "first")
+        await asyncio.sleep(0.01)
+        await send(admission, runs, "a", "second")
+        await asyncio.sleep(0.01)
+        other = await send(admission, runs, "b", "other")
+        await asyncio.sleep(0.01)
+        # "second" waits for thread a; the other slot goes to thread b
+        running = admission.running
+        gates.setdefault("other", asyncio.Event()).set()
+        await asyncio.wait_for(other.task, timeout=1)
+        other_done_first = not first.finished
+        for message in ("first", "second"):
+            gates.setdefault(message, asyncio.Event()).set()
+        await runs.shutdown()
+        return running, other_done_first, admission.running, admission.queued
+
+    running, other_done_first, running_after, queued_after = run_with_database(body)
+
+    assert running == 2 and other_done_first
+    assert (running_after, queued_after) == (0, 0)
+
+
+def test_ticket_released_when_the_run_cannot_start(gates, run_with_database):
+    class FailingRuns(ChatRunManager):
+        def start(self, thread_id, events):
+            raise RuntimeError("no event loop capacity")
+
+    async def body():
+        await create_threads("a")
+        admission = controller()
+        with pytest.raises(HTTPException) as raised:
+            await chat_send(ChatRequest(message="hi", thread_id="a"), CLIENT, None, FailingRuns(shared=False), admission)
+        return raised.value.status_code, admission.queued
+
+    assert run_with_database(body) == (500, 0)
+
+
+def test_ticket_released_when_the_turn_ends_before_its_slot(gates, run_with_database):
+    async def body():
+        await create_threads("a")
+        admission, runs = controller(), ChatRunManager(shared=False)
+        run = await send(admission, runs, "a", "hi")
+        run.task.cancel()  # before the task ever ran: the turn never reached admission.run()
+        await asyncio.gather(run.task, return_exceptions=True)
+        return admission.queued, admission.running
+
+    assert run_with_database(body) == (0, 0)
+
+
+def test_unknown_thread_is_rejected_before_admission(gates, run_with_database):
+    async def body():
+        admission = controller()
+        with pytest.raises(HTTPException) as raised:
+            await send(admission, ChatRunManager(shared=False), "never-created", "hi")
+        return raised.value.status_code, admission.admitted, admission.queued
+
+    assert run_with_database(body) == (404, 0, 0)
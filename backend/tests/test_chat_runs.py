@@ -0,0 +1,64 @@
+"""ChatRunManager.subscribe replay against a small, rotating replay buffer."""
+import asyncio
+from collections import deque
+
+from app.services.chat_runs import ChatRun, ChatRunManager
+
+
+def small_run(buffer: int = 3) -> ChatRun:
+    run = ChatRun("thread-1")
+    run.events = deque(maxlen=buffer)
+    return run
+
+
+async def frames_after(run: ChatRun, last_seq: int, count: int, while_suspended=None) -> list:
+    """The first `count` frames after the retry line; `while_suspended` runs after the first one."""
+    stream = ChatRunManager().subscribe(run, last_seq)
+    await stream.__anext__()  # retry: ...
+    frames = []
+    try:
+        for _ in range(count):
+            frames.append(await stream.__anext__())
+            if while_suspended and len(frames) == 1:
+                while_suspended()
+    finally:
+        await stream.aclose()
+    return frames
+
+
+def test_replay_from_the_buffer():
+    run = small_run()
+    for i in range(5):
+        run.append("token", {"text": str(i)})
+    run.finish()
+
+    frames = asyncio.run(frames_after(run, last_seq=2, count=3))
+
+    assert [f.split("\n")[0] for f in frames] == [f"id: {run.id}:{seq}" for seq in (3, 4, 5)]
+
+
+def test_gap_before_replay_starts():
+    run = small_run()
+    for i in range(5):
+        run.append("token", {"text": str(i)})
+
+    frames = asyncio.run(frames_after(run, last_seq=0, count=1))
+
+    assert "replay_unavailable" in frames[0]
+
+
+def test_buffer_rotating_during_replay_reports_the_gap():
+    run = small_run()
+    for i in range(3):
+        run.append("token", {"text": str(i)})
+
+    def rotate():
+        # A slow client is suspended on event 1 while four more arrive
+        for i in range(3, 7):
+            run.append("token", {"text": str(i)})
+
+    frames = asyncio.run(frames_after(run, last_seq=0, count=2, while_suspended=rotate))
+
+    assert frames[0].startswith(f"id: {run.id}:1")
+    assert "replay_unavailable" in frames[1]
+    assert "Events after 1 " in frames[1]
@@ -0,0 +1,154 @@
+"""stream_chat_response against a migrated database, through the real graph with a fake chat model."""
+import asyncio
+
+import pytest
+from langgraph.checkpoint.memory import InMemorySaver
+
+from app.graph import langgraph_setup
+from app.services import chat_service, response_cache, thread_locks
+from app.services.chat_service import stream_chat_response
+from app.services.service_registry import override_service
+from app.services.ingestion_jobs import FileProgress, IngestionJob, IngestionManager
+from app.services.thread_service import acreate_thread, adelete_thread, aget_thread_messages_for_api
+from benchmarks.fakes import FakeChatModel, FakeEmbedder, ToolCallingChatModel
+
+REPLY = " ".join(f"tok{i}" for i in range(200))
+
+
+@pytest.fixture
+def chatbot(monkeypatch):
+    monkeypatch.setattr(thread_locks, "THREAD_LOCKS", "local")
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_ENABLED", False)
+    yield langgraph_setup.graph.compile(checkpointer=InMemorySaver())
+    for name in ("chat_llm", "embeddings", "vector_store"):
+        override_service(name, None)
+
+
+class UnavailableIndex:
+    def query(self, *args, **kwargs):
+        raise ConnectionError("vector index unavailable")
+
+
+def install(model_class=FakeChatModel, **kwargs) -> FakeChatModel:
+    model = model_class(reply=REPLY, first_token_latency=0.01, **kwargs)
+    override_service("chat_llm", model)
+    return model
+
+
+async def answer(chatbot, stop_after=None):
+    """Run one turn on a new thread; returns (thread_id, events), closing the stream after `stop_after` tokens."""
+    thread_id = await acreate_thread("Test")
+    events = []
+    stream = stream_chat_response("hi", thread_id, chatbot)
+    async for event in stream:
+        events.append(event)
+        if stop_after and sum(kind == "token" for kind, _ in events) >= stop_after:
+            await stream.aclose()
+            break
+    return thread_id, events
+
+
+def text(events) -> str:
+    return "".join(data["text"] for kind, data in events if kind == "token")
+
+
+async def saved_answer(thread_id) -> dict:
+    return (await aget_thread_messages_for_api(thread_id))["messages"][-1]
+
+
+def test_turn_on_a_deleted_thread_ends_with_a_clean_error(run_with_database, monkeypatch):
+    monkeypatch.setattr(thread_locks, "THREAD_LOCKS", "local")
+
+    async def body():
+        thread_id = await acreate_thread("Gone")
+        await adelete_thread(thread_id)  # after /chat/send checked it, before the turn saves
+        return [event async for event in stream_chat_response("hi", thread_id, chatbot=None)]
+
+    assert run_with_database(body) == [
+        ("error", {"code": "thread_not_found", "message": "This chat no longer exists."}),
+    ]
+
+
+def test_ingestion_finishing_on_a_deleted_thread(run_with_database):
+    async def body():
+        thread_id = await acreate_thread("Gone")
+        job = IngestionJob(id="job-1", thread_id=thread_id, files=[FileProgress(filename="a.pdf", status="done")])
+        await adelete_thread(thread_id)
+        await IngestionManager(shared=False)._finish(job)
+        return job.status, (await aget_thread_messages_for_api(thread_id))["messages"]
+
+    assert run_with_database(body) == ("done", [])
+
+
+def test_client_disconnect_cancels_the_run_and_saves_the_partial_answer(run_with_database, chatbot):
+    model = install(tokens_per_second=200)
+
+    async def body():
+        thread_id, events = await answer(chatbot, stop_after=3)
+        at_close = model.tokens_emitted
+        await asyncio.sleep(0.2)
+        return events, at_close, model.tokens_emitted, await saved_answer(thread_id)
+
+    events, at_close, later, saved = run_with_database(body)
+
+    assert later == at_close < 200  # no token generated after the stream was closed
+    assert saved["role"] == "assistant"
+    assert saved["content"].startswith(text(events)) and len(saved["content"]) < len(REPLY)
+
+
+def test_run_over_the_deadline_ends_with_a_timeout_error(run_with_database, chatbot, monkeypatch):
+    monkeypatch.setattr(chat_service, "CHAT_REQUEST_TIMEOUT", 0.2)
+    install(tokens_per_second=50)
+
+    async def body():
+        thread_id, events = await answer(chatbot)
+        return events, await saved_answer(thread_id)
+
+    events, saved = run_with_database(body)
+
+    assert events[-1] == ("error", {"code": "timeout", "message": "Response timed out."})
+    assert 0 < len(text(events)) < len(REPLY)
+    assert saved["content"] == text(events) + "\n\n⚠️ Response timed out."
+
+
+def test_tokens_are_coalesced_into_fewer_frames(run_with_database, chatbot, monkeypatch):
+    monkeypatch.setattr(chat_service, "SSE_COALESCE_INTERVAL", 0.05)
+    monkeypatch.setattr(chat_service, "SSE_COALESCE_CHARS", 64)
+    install(tokens_per_second=1000)
+
+    async def body():
+        return (await answer(chatbot))[1]
+
+    events = run_with_database(body)
+    frames = [data["text"] for kind, data in events if kind == "token"]
+
+    assert text(events) == REPLY
+    assert len(frames) < 200 / 4
+    # A frame is sent once it reaches SSE_COALESCE_CHARS: at most one token past the cap
+    assert max(len(frame) for frame in frames) < 64 + len(" tok199")
+    assert events[-1] == ("done", {"cached": False, "tools": []})
+
+
+def test_failed_document_search_is_an_error_and_the_answer_is_not_cached(run_with_database, chatbot, monkeypatch):
+    install(ToolCallingChatModel, tokens_per_second=1000,
+            tool_calls=[{"name": "search_documents", "args": {"query": "what does the report say?"}}])
+    override_service("embeddings", FakeEmbedder(dim=16, call_latency=0, per_item_latency=0))
+    override_service("vector_store", UnavailableIndex())
+    stored = []
+
+    async def store(*args, **kwargs):
+        stored.append(args)
+
+    monkeypatch.setattr(response_cache.response_cache, "store", store)
+
+    async def body():
+        thread_id, events = await answer(chatbot)
+        state = await chatbot.aget_state({"configurable": {"thread_id": thread_id}})
+        return events, [m for m in state.values["messages"] if m.type == "tool"]
+
+    events, tool_messages = run_with_database(body)
+
+    assert [message.status for message in tool_messages] == ["error"]
+    assert "vector index unavailable" in tool_messages[0].content
+    assert events[-1] == ("done", {"cached": False, "tools": ["search_documents"]})
+    assert stored == []
@@ -0,0 +1,48 @@
+"""DeltaSqliteSaver pieces shared between workers: the compaction lease and cross-worker dirty threads."""
+import asyncio
+
+from app.graph.checkpointer import COMPACTION_LEASE, DeltaSqliteSaver
+
+
+async def two_workers(path, body):
+    async with DeltaSqliteSaver.from_conn_string(path) as first, DeltaSqliteSaver.from_conn_string(path) as second:
+        await first.setup()
+        await second.setup()
+        return await body(first, second)
+
+
+def test_compaction_lease_is_held_by_one_worker(tmp_path):
+    async def body(first, second):
+        assert await first.acquire_lease(COMPACTION_LEASE, "a", ttl=60)
+        assert not await second.acquire_lease(COMPACTION_LEASE, "b", ttl=60)
+        # The holder renews its own lease
+        assert await first.acquire_lease(COMPACTION_LEASE, "a", ttl=60)
+        # An expired lease is taken over
+        assert await first.acquire_lease(COMPACTION_LEASE, "a", ttl=-1)
+        assert await second.acquire_lease(COMPACTION_LEASE, "b", ttl=60)
+
+    asyncio.run(two_workers(str(tmp_path / "c.db"), body))
+
+
+def test_threads_written_after_sees_other_workers(tmp_path):
+    async def write(saver, thread_id, checkpoint_id):
+        async with saver.lock:
+            await saver.conn.execute(
+                "INSERT INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, type, checkpoint, metadata) "
+                "VALUES (?, '', ?, 'json', '{}', '{}')",
+                (thread_id, checkpoint_id),
+            )
+            await saver.conn.commit()
+
+    async def body(first, second):
+        await write(first, "t1", "0001")
+        threads, watermark = await first.threads_written_after(None)
+        assert (threads, watermark) == (["t1"], "0001")
+
+        # Nothing new: same watermark back
+        assert await first.threads_written_after(watermark) == ([], "0001")
+
+        await write(second, "t2", "0002")
+        assert await first.threads_written_after(watermark) == (["t2"], "0002")
+
+    asyncio.run(two_workers(str(tmp_path / "c.db"), body))
@@ -0,0 +1,248 @@
+"""ContextWindowManager.fit on synthetic histories (character-based token estimate: ~4 chars/token)."""
+import asyncio
+import threading
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from app.graph import context_manager
+from app.graph.context_manager import (
+    TRUNCATION_MARKER,
+    ContextBudget,
+    ContextWindowManager,
+    TokenCounter,
+)
+
+
+def offline_counter(**kwargs) -> TokenCounter:
+    """A TokenCounter that never loads tiktoken, so counts are deterministic."""
+    counter = TokenCounter(**kwargs)
+    counter._encoding_loaded = True
+    return counter
+
+
+def manager(max_prompt_tokens=1000, max_tool_output_tokens=100, min_message_tokens=20):
+    budget = ContextBudget(
+        max_prompt_tokens=max_prompt_tokens,
+        max_tool_output_tokens=max_tool_output_tokens,
+        min_message_tokens=min_message_tokens,
+    )
+    return ContextWindowManager(budget, offline_counter())
+
+
+def words(n: int, tag: str = "w") -> str:
+    # "w001 " is 5 characters, so n words are ~1.25n tokens
+    return " ".join(f"{tag}{i:03d}" for i in range(n))
+
+
+def tool_unit(call_ids, output_words=10):
+    calls = [{"name": "calculator", "args": {"expression": "1+1"}, "id": call_id} for call_id in call_ids]
+    return [AIMessage(content="", tool_calls=calls)] + [
+        ToolMessage(content=words(output_words, call_id), tool_call_id=call_id) for call_id in call_ids
+    ]
+
+
+def history(turns: int):
+    """Alternating turns; every third answer goes through two tool calls."""
+    messages = []
+    for t in range(turns):
+        messages.append(HumanMessage(content=f"question {t} " + words(20)))
+        if t % 3 == 0:
+            messages.extend(tool_unit([f"call{t}a", f"call{t}b"]))
+        messages.append(AIMessage(content=f"answer {t} " + words(30)))
+    return messages
+
+
+SYSTEM = SystemMessage(content="You are a helpful assistant.")
+CURRENT = HumanMessage(content="the current question")
+
+
+def test_system_prompt_and_current_turn_always_kept():
+    m = manager(max_prompt_tokens=60)
+    messages = [SYSTEM] + history(10) + [CURRENT]
+
+    fitted = m.fit(messages)
+
+    assert fitted[0] is SYSTEM
+    assert fitted[-1] is CURRENT
+    assert m.total(fitted) <= 60
+
+
+def test_everything_kept_when_it_fits():
+    m = manager(max_prompt_tokens=100_000, max_tool_output_tokens=10_000)
+    messages = [SYSTEM] + history(6) + [CURRENT]
+
+    assert m.fit(messages) == messages
+
+
+def test_tool_outputs_capped_before_history_is_dropped():
+    big_output = ToolMessage(content=words(2000), tool_call_id="big")
+    old_turn = [
+        HumanMessage(content="look it up"),
+        AIMessage(content="", tool_calls=[{"name": "duckduckgo_search", "args": {"query": "x"}, "id": "big"}]),
+        big_output,
+        AIMessage(content="found it"),
+    ]
+    m = manager(max_prompt_tokens=400, max_tool_output_tokens=100)
+    messages = [SYSTEM] + old_turn + [CURRENT]
+    # Uncapped, the tool output alone is far over budget
+    assert m.total([big_output]) > 400
+
+    fitted = m.fit(messages)
+
+    # Nothing dropped: capping the tool output was enough
+    assert len(fitted) == len(messages)
+    capped = fitted[3]
+    assert isinstance(capped, ToolMessage) and capped.tool_call_id == "big"
+    assert capped.content.endswith(TRUNCATION_MARKER)
+    assert m.counter.count(capped) <= 100
+
+
+@pytest.mark.parametrize("budget", range(40, 700, 15))
+def test_history_dropped_oldest_first_in_whole_units(budget):
+    m = manager(max_prompt_tokens=budget, max_tool_output_tokens=1000)
+    old = history(8)
+    messages = [SYSTEM] + old + [CURRENT]
+
+    fitted = m.fit(messages)
+    kept = fitted[1:-1]
+
+    # Kept history is the newest part of it, in order
+    assert kept == old[len(old) - len(kept):]
+    assert m.total(fitted) <= budget
+    # A tool call is never separated from its results
+    for i, message in enumerate(kept):
+        if isinstance(message, ToolMessage):
+            owner = next(m for m in reversed(kept[:i]) if not isinstance(m, ToolMessage))
+            assert any(call["id"] == message.tool_call_id for call in owner.tool_calls)
+        if isinstance(message, AIMessage) and message.tool_calls:
+            answered = {t.tool_call_id for t in kept if isinstance(t, ToolMessage)}
+            assert {call["id"] for call in message.tool_calls} <= answered
+
+
+def test_unit_that_does_not_fit_stops_filling():
+    # Newest unit (tool call + results) is too big: older, smaller messages are not used instead
+    old = [HumanMessage(content="short"), AIMessage(content="short")] + tool_unit(["c1", "c2"], output_words=60)
+    m = manager(max_prompt_tokens=100, max_tool_output_tokens=1000)
+
+    fitted = m.fit([SYSTEM] + old + [CURRENT])
+
+    assert fitted == [SYSTEM, CURRENT]
+
+
+def test_squeeze_truncates_tool_output_before_user_message():
+    call = [{"name": "get_weather", "args": {"city": "Paris"}, "id": "w1"}]
+    current = [
+        HumanMessage(content=words(40)),
+        AIMessage(content="", tool_calls=call),
+        ToolMessage(content=words(90), tool_call_id="w1"),
+    ]
+    m = manager(max_prompt_tokens=160, max_tool_output_tokens=1000, min_message_tokens=20)
+
+    fitted = m.fit([SYSTEM] + current)
+
+    assert fitted[1] is current[0]  # the user's message is untouched
+    assert fitted[3].content.endswith(TRUNCATION_MARKER)
+    assert m.total(fitted) <= 160
+
+
+def test_squeeze_respects_min_message_tokens():
+    huge = HumanMessage(content=words(2000))
+    m = manager(max_prompt_tokens=50, min_message_tokens=120)
+
+    fitted = m.fit([SYSTEM, huge])
+
+    squeezed = fitted[-1]
+    assert squeezed.content.endswith(TRUNCATION_MARKER)
+    # Truncated to the floor, even though the prompt is still over budget
+    assert m.counter.count(squeezed) >= 120 - 5
+    assert m.counter.count(squeezed) <= 120
+    assert m.total(fitted) > 50
+
+
+def test_token_counter_cache_hits_and_misses():
+    counter = offline_counter()
+    with_id = HumanMessage(content="hello there", id="m1")
+
+    first = counter.count(with_id)
+    assert (counter.hits, counter.misses) == (0, 1)
+    assert counter.count(with_id) == first
+    assert (counter.hits, counter.misses) == (1, 1)
+
+    # Same id but edited content: counted again
+    counter.count(with_id.model_copy(update={"content": "hello there, edited"}))
+    assert (counter.hits, counter.misses) == (1, 2)
+
+    # Without ids, equal text and type share an entry
+    counter.count(AIMessage(content="no id"))
+    counter.count(AIMessage(content="no id"))
+    assert (counter.hits, counter.misses) == (2, 3)
+    # ...but a different message type does not
+    counter.count(HumanMessage(content="no id"))
+    assert (counter.hits, counter.misses) == (2, 4)
+
+
+def test_token_counter_cache_is_lru_bounded():
+    counter = offline_counter(cache_size=2)
+    a, b, c = (HumanMessage(content=text, id=text) for text in ("a", "b", "c"))
+
+    counter.count(a)
+    counter.count(b)
+    counter.count(a)  # a is now the most recent
+    counter.count(c)  # evicts b
+    assert len(counter._cache) == 2
+
+    counter.count(a)
+    assert counter.hits == 2
+    counter.count(b)
+    assert counter.misses == 4
+
+
+def test_tool_call_arguments_are_counted():
+    counter = offline_counter()
+    plain = AIMessage(content="")
+    calling = AIMessage(content="", tool_calls=[{"name": "get_weather", "args": {"city": "Lahore"}, "id": "x"}])
+
+    assert counter.count(calling) > counter.count(plain)
+
+
+class WordEncoding:
+    """Stands in for a tiktoken encoding: one token per word."""
+
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+def test_encoding_is_loaded_off_the_event_loop(monkeypatch):
+    loaded_in = []
+
+    def load(name):
+        loaded_in.append(threading.current_thread())
+        return WordEncoding()
+
+    monkeypatch.setattr(context_manager, "_load_tiktoken_encoding", load)
+    counter = TokenCounter()
+    message = HumanMessage(content="one two three four five six seven eight", id="m1")
+
+    # Before loading: the estimate, without touching tiktoken
+    assert counter.count(message) == 10 and not loaded_in
+    asyncio.run(counter.load_encoding())
+
+    assert loaded_in and loaded_in[0] is not threading.main_thread()
+    # The cached estimate is dropped once real counts are available
+    assert counter.count(message) == 8
+
+
+def test_failed_encoding_load_keeps_the_estimate(monkeypatch):
+    def unreachable(name):
+        raise ConnectionError("openaipublic.blob.core.windows.net unreachable")
+
+    monkeypatch.setattr(context_manager, "_load_tiktoken_encoding", unreachable)
+    counter = TokenCounter()
+
+    asyncio.run(counter.load_encoding())
+
+    assert counter.count_text("x" * 40) == 10
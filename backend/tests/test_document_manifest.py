@@ -0,0 +1,60 @@
+"""delete_thread_vectors against the in-memory index stand-in: manifest ids, prefix listing, metadata filter."""
+import pytest
+
+from app.services.document_manifest import arecord_document, athread_documents, delete_thread_vectors
+from app.services.document_parser import chunk_id
+from benchmarks.fakes import FakeIndex
+
+# "thread-10_" starts with "thread-1": the neighbour must survive the prefix listing too
+TARGET, NEIGHBOUR = "thread-1", "thread-10"
+
+
+def fill(index, thread_id, filename, chunks):
+    index.upsert([
+        {"id": chunk_id(thread_id, filename, i), "values": [0.0] * 8,
+         "metadata": {"thread_id": thread_id, "source": filename, "chunk_index": i}}
+        for i in range(chunks)
+    ])
+
+
+def remaining(index, thread_id):
+    return sum(1 for v in index.vectors.values() if v["metadata"]["thread_id"] == thread_id)
+
+
+def make_index(**kwargs):
+    index = FakeIndex(upsert_latency=0, **kwargs)
+    fill(index, TARGET, "a.pdf", 1500)
+    fill(index, TARGET, "b.pdf", 700)
+    fill(index, NEIGHBOUR, "a.pdf", 300)
+    return index
+
+
+def test_ids_are_rebuilt_from_the_manifest(run_with_database):
+    index = make_index()
+
+    async def body():
+        await arecord_document(TARGET, "a.pdf", 1500)
+        await arecord_document(TARGET, "b.pdf", 700)
+        await arecord_document(NEIGHBOUR, "a.pdf", 300)
+        deleted = await delete_thread_vectors(TARGET, index)
+        return deleted, await athread_documents(TARGET), await athread_documents(NEIGHBOUR)
+
+    deleted, documents, neighbour_documents = run_with_database(body)
+
+    assert deleted == 2200
+    assert (remaining(index, TARGET), remaining(index, NEIGHBOUR)) == (0, 300)
+    assert (index.calls["list"], index.calls["query"]) == (0, 0)
+    assert documents == [] and neighbour_documents == [("a.pdf", 300)]
+
+
+@pytest.mark.parametrize("serverless, deleted", [(True, 2200), (False, None)])
+def test_threads_without_a_manifest_fall_back(run_with_database, serverless, deleted):
+    # Serverless indexes list the ids by prefix; pod-based ones delete by metadata filter
+    index = make_index(serverless=serverless)
+
+    async def body():
+        return await delete_thread_vectors(TARGET, index)
+
+    assert run_with_database(body) == deleted
+    assert (remaining(index, TARGET), remaining(index, NEIGHBOUR)) == (0, 300)
+    assert index.calls["list"] == (22 if serverless else 0)
@@ -0,0 +1,125 @@
+"""Memory held by PDF extraction and the query embedding cache stays within fixed bounds (tracemalloc)."""
+import asyncio
+import gc
+import random
+import tracemalloc
+from collections import OrderedDict
+
+import pytest
+
+from app.services import document_parser, retrieval
+from app.utils.tool_runtime import ToolCache
+from benchmarks.fakes import FakeEmbedder, write_pdf
+
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit".split()
+WINDOW = 4
+
+# Opening a PDF indexes its page tree (~3.5 KB per page) for the whole job; that
+# is the only part allowed to grow with the page count. Holding the extracted
+# chunks as well (whole-file loading) costs ~13 KB per page of 700 words.
+PAGE_TREE_BYTES_PER_PAGE = 5 * 1024
+
+
+def make_pdf(path, pages):
+    rng = random.Random(pages)
+    write_pdf(str(path), [f"Page {p}. " + " ".join(rng.choice(WORDS) for _ in range(700)) for p in range(pages)])
+    return str(path)
+
+
+def extraction_memory(path):
+    """
+    (held, retained) bytes while streaming every record of `path`: the most
+    memory reachable at any page boundary (pypdf objects are cyclic, so
+    garbage is collected first), and what is left once the stream is done.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        held, page = 0, None
+        for record in document_parser.iter_records(path, "doc.pdf", "thread", window=WINDOW):
+            if record["metadata"]["page"] != page:
+                page = record["metadata"]["page"]
+                gc.collect()
+                held = max(held, tracemalloc.get_traced_memory()[0] - base)
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+    return held, retained
+
+
+def test_pdf_extraction_memory_grows_only_by_the_page_tree(tmp_path):
+    extraction_memory(make_pdf(tmp_path / "warmup.pdf", 2))  # pypdf imports, splitter setup
+
+    small_held, _ = extraction_memory(make_pdf(tmp_path / "small.pdf", 16))
+    large_held, retained = extraction_memory(make_pdf(tmp_path / "large.pdf", 64))
+
+    assert large_held - small_held <= (64 - 16) * PAGE_TREE_BYTES_PER_PAGE
+    # The reader is closed after the last window; nothing is left behind
+    assert retained <= 64 * 1024
+    assert not document_parser._readers
+
+
+def test_open_pdf_readers_are_bounded(tmp_path, monkeypatch):
+    paths = [make_pdf(tmp_path / f"doc{i}.pdf", 2) for i in range(document_parser._MAX_OPEN_READERS + 2)]
+
+    for path in paths:
+        assert document_parser.pdf_page_count(path) == 2
+    assert len(document_parser._readers) == document_parser._MAX_OPEN_READERS
+
+    # Deleted uploads (jobs that stopped early) are dropped on the next open
+    (tmp_path / "doc5.pdf").unlink()
+    document_parser.pdf_page_count(paths[4])
+    assert {key[0] for key in document_parser._readers} == set(paths[2:5])
+
+    # So are readers left idle
+    monkeypatch.setattr(document_parser, "_READER_IDLE_SECONDS", -1)
+    document_parser.pdf_page_count(paths[0])
+    assert [key[0] for key in document_parser._readers] == [paths[0]]
+
+    document_parser._close_pdf(paths[0])
+    assert not document_parser._readers
+
+
+@pytest.fixture
+def query_cache(monkeypatch):
+    cache = ToolCache("query_embedding_test", ttl=3600, max_entries=64)
+    monkeypatch.setattr(retrieval, "query_embedding_cache", cache)
+    return cache
+
+
+def test_query_embedding_cache_is_bounded(query_cache):
+    embedder = FakeEmbedder(dim=768, call_latency=0, per_item_latency=0)
+
+    async def ask(questions):
+        for question in questions:
+            await retrieval.embed_query(embedder, question)
+
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        asyncio.run(ask(f"question number {i} from some thread" for i in range(640)))
+        gc.collect()
+        held = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+
+    assert len(query_cache._data) == 64
+    # float32 vectors (768 x 4 bytes) plus key, tuple and array headers; the
+    # same vectors as lists of Python floats would take ~25 KB each
+    assert held <= 64 * (768 * 4 + 1024)
+
+
+def test_query_embedding_cache_drops_expired_entries(query_cache):
+    embedder = FakeEmbedder(dim=8, call_latency=0, per_item_latency=0)
+
+    asyncio.run(retrieval.embed_query(embedder, "first"))
+    asyncio.run(retrieval.embed_query(embedder, "second"))
+    # Both entries expire...
+    query_cache._data = OrderedDict((key, (0.0, value)) for key, (_, value) in query_cache._data.items())
+    # ...and are dropped by the next insert, without being read again
+    vector = asyncio.run(retrieval.embed_query(embedder, "third"))
+
+    assert list(query_cache._data) == ["third"]
+    assert isinstance(vector, list) and len(vector) == 8
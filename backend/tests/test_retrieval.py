@@ -0,0 +1,60 @@
+"""hybrid_search: which queries pay for an embedding call (keyword index in SQLite, local vector store)."""
+import pytest
+
+from app.services import retrieval
+from app.services.keyword_index import aindex_chunks
+from app.services.vector_store import LocalVectorStore
+from app.utils.tool_runtime import ToolCache
+from benchmarks.fakes import FakeEmbedder
+
+CHUNKS = {
+    "t_0": "Run VACUUM to rebuild the database file and reclaim free pages.",
+    "t_1": "The orders table is joined on user_id with the users table.",
+    "t_2": "Backups are copied to cold storage every night.",
+}
+
+
+@pytest.fixture
+def embedder(monkeypatch):
+    monkeypatch.setattr(retrieval, "query_embedding_cache", ToolCache("query_embedding_test", ttl=60, max_entries=16))
+    return FakeEmbedder(dim=16, call_latency=0, per_item_latency=0)
+
+
+@pytest.fixture
+def search(run_with_database, embedder, tmp_path):
+    """Run hybrid_search for each query on a small indexed thread; results per query."""
+    index = LocalVectorStore(tmp_path / "vectors")
+    records = [
+        {"id": chunk_id, "text": text, "metadata": {"thread_id": "t", "source": "db.md", "page": 0, "text": text}}
+        for chunk_id, text in CHUNKS.items()
+    ]
+    index.upsert([{"id": r["id"], "values": embedder._vector(r["text"]), "metadata": r["metadata"]} for r in records])
+
+    def run(*queries):
+        async def body():
+            await aindex_chunks(records)
+            return [await retrieval.hybrid_search(query, "t", embedder, index, top_k=2) for query in queries]
+
+        return run_with_database(body)
+
+    return run
+
+
+@pytest.mark.parametrize("query", ["VACUUM", "user_id", '"cold storage"'])
+def test_keyword_query_with_hits_skips_the_embedding(search, embedder, query):
+    [results] = search(query)
+
+    assert results and embedder.calls == 0
+
+
+def test_keyword_query_without_hits_falls_back_to_vectors(search, embedder):
+    [results] = search("zz_missing_identifier")
+
+    assert results and embedder.calls == 1
+
+
+def test_question_fuses_keyword_and_vector_rankings(search, embedder):
+    [results] = search("how often are the backups copied to storage?")
+
+    assert embedder.calls == 1
+    assert results[0]["text"] == CHUNKS["t_2"]
@@ -0,0 +1,97 @@
+"""Chat runs and ingestion jobs seen from another worker: two managers sharing one database."""
+import asyncio
+
+import pytest
+
+from app.services import chat_runs
+from app.services.chat_runs import ChatRunManager, RemoteRun
+from app.services.ingestion_jobs import FileProgress, IngestionJob, IngestionManager
+from app.utils.sse import parse_last_event_id
+
+
+@pytest.fixture(autouse=True)
+def fast_run_state(monkeypatch):
+    monkeypatch.setattr(chat_runs, "RUN_STATE_FLUSH_INTERVAL", 0.01)
+    monkeypatch.setattr(chat_runs, "RUN_STATE_POLL_INTERVAL", 0.01)
+
+
+async def tokens(count, delay=0.01):
+    for i in range(count):
+        yield "token", {"text": str(i)}
+        await asyncio.sleep(delay)
+    yield "done", {"cached": False, "tools": []}
+
+
+def frame_ids(frames):
+    ids = [line[4:] for frame in frames for line in frame.splitlines() if line.startswith("id: ")]
+    return [parse_last_event_id(i) for i in ids]
+
+
+def test_run_is_followed_from_another_worker(run_with_database):
+    async def body():
+        owner, other = ChatRunManager(shared=True), ChatRunManager(shared=True)
+        run = owner.start("thread-1", tokens(10))
+        await asyncio.sleep(0.05)
+
+        remote = await other.aget(run.id)
+        assert isinstance(remote, RemoteRun) and remote.thread_id == "thread-1"
+        # Reconnect with Last-Event-ID 2: the rest, in order, until the final event
+        frames = [frame async for frame in other.subscribe(remote, 2)]
+        await owner.shutdown()
+        return run, frames
+
+    run, frames = run_with_database(body)
+
+    assert frame_ids(frames) == list(range(3, run.last_seq + 1))
+    assert "event: done" in frames[-1]
+
+
+def test_unknown_run_is_not_found(run_with_database):
+    async def body():
+        manager = ChatRunManager(shared=True)
+        return await manager.aget("no-such-run"), await ChatRunManager(shared=False).aget("no-such-run")
+
+    assert run_with_database(body) == (None, None)
+
+
+@pytest.mark.parametrize("followed", [True, False])
+def test_remote_client_keeps_run_alive(run_with_database, monkeypatch, followed):
+    monkeypatch.setattr(chat_runs, "SSE_RESUME_GRACE", 0.15)
+
+    async def body():
+        owner, other = ChatRunManager(shared=True), ChatRunManager(shared=True)
+        run = owner.start("thread-1", tokens(30, delay=0.02))
+        if followed:
+            await asyncio.sleep(0.05)
+            [frame async for frame in other.subscribe(await other.aget(run.id))]
+        else:
+            await asyncio.gather(run.task, return_exceptions=True)
+        await owner.shutdown()
+        return [event for _, event, _ in run.events]
+
+    events = run_with_database(body)
+
+    # Without any client the run is cancelled once the grace period is over
+    assert events[-1] == ("done" if followed else "error")
+
+
+def test_job_progress_is_read_from_another_worker(run_with_database):
+    async def body():
+        owner, other = IngestionManager(shared=True), IngestionManager(shared=True)
+        job = IngestionJob(id="job-1", thread_id="thread-1", files=[FileProgress(filename="a.pdf")])
+        owner.jobs[job.id] = job
+        await owner._flush()
+        queued = await other.aget_state(job.id)
+
+        job.status = job.files[0].status = "processing"
+        job.files[0].pages_parsed = 16
+        await owner._flush()
+        processing = await other.aget_state(job.id)
+
+        return job, queued, processing, await other.aget_state("no-such-job")
+
+    job, queued, processing, missing = run_with_database(body)
+
+    assert queued["status"] == "queued"
+    assert processing == job.to_dict() and processing["pages_parsed"] == 16
+    assert missing is None
@@ -0,0 +1,34 @@
+"""tool_calls_total outcomes from the events of real tool calls (as ToolNode makes them)."""
+import asyncio
+
+from app.services.chat_service import TOOL_CALLS, _tool_finished
+from app.utils.tools import calculator
+
+
+def count(outcome: str) -> float:
+    return TOOL_CALLS._values.get(TOOL_CALLS._key({"tool": "calculator", "outcome": outcome}), 0.0)
+
+
+def finish_calls(expressions) -> list:
+    async def run():
+        outcomes = []
+        for i, expression in enumerate(expressions):
+            call = {"name": "calculator", "args": {"expression": expression}, "id": f"call{i}", "type": "tool_call"}
+            tool_started = {}
+            async for event in calculator.astream_events(call, version="v2"):
+                if event["event"] == "on_tool_start":
+                    tool_started[event["run_id"]] = 0.0
+                elif event["event"] in ("on_tool_end", "on_tool_error"):
+                    outcomes.append(_tool_finished(tool_started, event))
+        return outcomes
+
+    return asyncio.run(run())
+
+
+def test_handled_tool_errors_are_counted_as_errors():
+    ok, error = count("ok"), count("error")
+
+    outcomes = finish_calls(["2 * (3 + 4)", "import os", "1 / 0"])
+
+    assert outcomes == ["ok", "error", "error"]
+    assert (count("ok") - ok, count("error") - error) == (1, 2)
@@ -0,0 +1,119 @@
+"""ToolCache against the local stub weather server: TTL, LRU eviction, coalescing, failures."""
+import asyncio
+
+import pytest
+
+from app.utils import tool_runtime, tools
+from app.utils.tool_runtime import ToolCache, ToolResultError, close_http_client
+from benchmarks.fakes import StubWeatherServer
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with StubWeatherServer(latency=0.05) as server:
+        monkeypatch.setattr(tools, "WEATHER_API_BASE", server.base_url)
+        yield server
+
+
+@pytest.fixture
+def make_cache(monkeypatch):
+    """ToolCache factory; the caches are left out of the process-wide metrics."""
+    monkeypatch.setattr(tool_runtime, "_all_caches", [])
+    return ToolCache
+
+
+def run(body):
+    async def main():
+        try:
+            return await body()
+        finally:
+            # The pooled client belongs to this test's event loop
+            await close_http_client()
+
+    return asyncio.run(main())
+
+
+def lookup(cache, city):
+    return cache.get_or_compute(city, lambda: tools._fetch_weather(city))
+
+
+def test_concurrent_identical_lookups_share_one_request(server, make_cache):
+    cache = make_cache("weather", ttl=60)
+
+    async def body():
+        return await asyncio.gather(*(lookup(cache, "London") for _ in range(20)))
+
+    results = run(body)
+
+    assert len(set(results)) == 1 and "Weather in London" in results[0]
+    assert server.requests == 1
+    assert (cache.misses, cache.coalesced) == (1, 19)
+
+
+def test_entries_expire_after_the_ttl(server, make_cache):
+    cache = make_cache("weather", ttl=0.2)
+
+    async def body():
+        await lookup(cache, "London")
+        await lookup(cache, "London")
+        fresh = server.requests
+        await asyncio.sleep(0.25)
+        await lookup(cache, "London")
+        return fresh
+
+    fresh = run(body)
+
+    assert fresh == 1
+    assert server.requests == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_least_recently_used_entry_is_evicted(server, make_cache):
+    cache = make_cache("weather", ttl=60, max_entries=2)
+
+    async def body():
+        for city in ("London", "Paris", "London", "Berlin"):
+            await lookup(cache, city)
+        before = server.requests
+        # Paris was the least recently used when Berlin came in
+        await lookup(cache, "London")
+        await lookup(cache, "Paris")
+        return before
+
+    before = run(body)
+
+    assert before == 3
+    assert server.requests == 4
+    assert cache.stats()["entries"] == 2
+
+
+def test_failures_are_not_cached(server, make_cache):
+    cache = make_cache("weather", ttl=60)
+
+    async def body():
+        failures = []
+        for _ in range(2):
+            with pytest.raises(ToolResultError) as raised:
+                await lookup(cache, "Nowhere")
+            failures.append(str(raised.value))
+        return failures
+
+    failures = run(body)
+
+    assert failures == ["Could not find weather for 'Nowhere'."] * 2
+    assert server.requests == 2
+    assert cache.errors == 2 and cache.stats()["entries"] == 0
+
+
+def test_get_weather_reports_failures_as_tool_errors(server, make_cache, monkeypatch):
+    cache = make_cache("get_weather", ttl=60)
+    monkeypatch.setattr(tool_runtime, "_caches", {"get_weather": cache})
+    call = {"name": "get_weather", "args": {"city": "Nowhere"}, "id": "call0", "type": "tool_call"}
+
+    async def body():
+        return [await tools.get_weather.ainvoke(call) for _ in range(2)]
+
+    messages = run(body)
+
+    assert [message.status for message in messages] == ["error", "error"]
+    assert server.requests == 2 and cache.stats()["entries"] == 0
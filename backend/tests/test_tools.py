@@ -0,0 +1,41 @@
+"""calculator input limits: everything it accepts is evaluated on the event loop."""
+import asyncio
+import time
+
+import pytest
+
+from app.utils.tools import calculator
+
+
+def calculate(expression: str):
+    call = {"name": "calculator", "args": {"expression": expression}, "id": "call", "type": "tool_call"}
+    return asyncio.run(calculator.ainvoke(call))
+
+
+@pytest.mark.parametrize("expression, result", [("2 * (3 + 4)", "14"), ("10 / 4", "2.5"), ("-(3) // 2", "-2")])
+def test_arithmetic(expression, result):
+    message = calculate(expression)
+
+    assert message.status == "success" and message.content == f"{expression} = {result}"
+
+
+@pytest.mark.parametrize("expression", [
+    "9**9**9",
+    "2 ** 3",
+    "1" * 40 + " * 2",
+    "(" * 150 + "1" + ")" * 150,
+])
+def test_expensive_expressions_are_rejected_at_once(expression):
+    started = time.perf_counter()
+    message = calculate(expression)
+
+    assert message.status == "error" and message.content.startswith("Error:")
+    assert time.perf_counter() - started < 0.5
+
+
+def test_largest_accepted_expression_is_cheap():
+    expression = " * ".join(["9" * 30] * 6)  # ~200 characters, the longest product allowed
+    started = time.perf_counter()
+
+    assert calculate(expression).status == "success"
+    assert time.perf_counter() - started < 0.5
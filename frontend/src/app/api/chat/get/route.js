@@ -10,13 +10,17 @@ export async function GET(req) {
 
     const { searchParams } = new URL(req.url);
     const chatId = searchParams.get("chatId");
+    // Keyset cursor from the previous page (older threads / older messages)
+    const cursor = searchParams.get("cursor");
+    const query = cursor ? `?before=${encodeURIComponent(cursor)}` : "";
 
     let data;
+    let nextCursor = null;
 
     // A. Get Single Chat Messages
     if (chatId) {
       // Note: Adjust path if your backend is /thread/thread/...
-      const res = await fetch(`${FASTAPI_BASE}/thread/thread/${chatId}/messages`, { cache: 'no-store' });
+      const res = await fetch(`${FASTAPI_BASE}/thread/thread/${chatId}/messages${query}`, { cache: 'no-store' });
       const threadData = await res.json();
       
       data = {
@@ -26,21 +30,28 @@ export async function GET(req) {
           content: m.content
         }))
       };
+      // Older history, if any
+      nextCursor = threadData.before_cursor;
 
     // B. Get All Chats (Sidebar)
     } else {
       // Note: Adjust path if needed
-      const res = await fetch(`${FASTAPI_BASE}/thread/all`, { cache: 'no-store' });
-      const threads = await res.json();
+      const res = await fetch(`${FASTAPI_BASE}/thread/all${query}`, { cache: 'no-store' });
+      const page = await res.json();
+      // Older threads, if any
+      nextCursor = page.next_cursor;
 
-      data = threads.map(t => ({
+      data = page.threads.map(t => ({
         _id: t.id,    // Map id -> _id for Frontend
         name: t.name,
+        preview: t.last_message_preview,
+        messageCount: t.message_count,
+        updatedAt: t.last_activity_at || t.created_at,
         userId: userId
       }));
     }
 
-    return NextResponse.json({ success: true, data });
+    return NextResponse.json({ success: true, data, nextCursor });
 
   } catch (error) {
     return NextResponse.json({ success: false, error: error.message });
@@ -1,6 +1,6 @@
 "use client";
 
-import React, { useEffect, useRef, useState } from "react";
+import React, { useEffect, useLayoutEffect, useRef, useState } from "react";
 import Image from "next/image";
 import { assets } from "@/assets/assets";
 import Sidebar from '@/components/Sidebar';
@@ -15,22 +15,32 @@ export default function ChatPage({ params }) {
   const [expand, setExpand] = useState(false);
   const [isGenerating, setIsGenerating] = useState(false); 
    
-  const { selectedChat, chats, setSelectedChat, fetchMessages, messages: contextMessages, isMessagesLoading } = useAppContext();
+  const {
+    selectedChat, chats, setSelectedChat, fetchMessages, messages: contextMessages, isMessagesLoading,
+    loadOlderMessages, hasOlderMessages,
+  } = useAppContext();
   
   // Local state for immediate UI updates during streaming
   const [messages, setMessages] = useState([]);
+  const [isLoadingOlder, setIsLoadingOlder] = useState(false);
 
   const containerRef = useRef(null);
+  // Scroll height before older messages were prepended (keeps the view in place)
+  const prependFromHeight = useRef(null);
 
   useEffect(() => {
     if (chats.length > 0) {
       const currentChat = chats.find(c => c._id === id);
       if (currentChat) setSelectedChat(currentChat);
     }
+  }, [id, chats, setSelectedChat]); 
+
+  // Latest page only; loading more chats in the sidebar must not reset the history
+  useEffect(() => {
     if (id) {
       fetchMessages(id);
     }
-  }, [id, chats, setSelectedChat]); 
+  }, [id]);
 
   // Sync local state when context messages finish loading
   useEffect(() => {
@@ -39,12 +49,38 @@ export default function ChatPage({ params }) {
     }
   }, [contextMessages]);
 
-  useEffect(() => {
-    if (containerRef.current) {
-      containerRef.current.scrollTo({ top: containerRef.current.scrollHeight, behavior: "smooth" });
+  useLayoutEffect(() => {
+    const container = containerRef.current;
+    if (!container) return;
+    if (prependFromHeight.current !== null) {
+      // Older messages went on top: stay where the reader was
+      container.scrollTop += container.scrollHeight - prependFromHeight.current;
+      prependFromHeight.current = null;
+      return;
     }
+    container.scrollTo({ top: container.scrollHeight, behavior: "smooth" });
   }, [messages, isMessagesLoading]);
 
+  // Fetch the page of messages before the oldest one shown
+  const loadOlder = async () => {
+    const container = containerRef.current;
+    if (!container || !hasOlderMessages || isLoadingOlder || isGenerating) return;
+    setIsLoadingOlder(true);
+    try {
+      const older = await loadOlderMessages(id);
+      if (older.length > 0) {
+        prependFromHeight.current = container.scrollHeight;
+        setMessages((prev) => [...older, ...prev]);
+      }
+    } finally {
+      setIsLoadingOlder(false);
+    }
+  };
+
+  const handleScroll = (e) => {
+    if (e.currentTarget.scrollTop <= 80) loadOlder();
+  };
+
   return (
     <div className="flex h-screen overflow-hidden"> 
       <Sidebar expand={expand} setExpand={setExpand} />
@@ -71,10 +107,20 @@ export default function ChatPage({ params }) {
         )}
 
         {/* --- SCROLLABLE CONTAINER --- */}
-        <div className="flex-1 w-full overflow-y-auto custom-scrollbar" ref={containerRef}>
+        <div className="flex-1 w-full overflow-y-auto custom-scrollbar" ref={containerRef} onScroll={handleScroll}>
             
             <div className="w-full max-w-3xl mx-auto flex flex-col gap-4 px-4 pt-24 pb-52">
                 
+                {hasOlderMessages && (
+                   <button
+                       onClick={loadOlder}
+                       disabled={isLoadingOlder}
+                       className="self-center text-gray-400 hover:text-white text-xs transition-colors"
+                   >
+                       {isLoadingOlder ? "Loading earlier messages..." : "Load earlier messages"}
+                   </button>
+                )}
+
                 {isMessagesLoading && messages.length === 0 && (
                    <div className="flex flex-col items-center justify-center h-40 gap-2">
                        <div className="w-6 h-6 border-2 border-blue-500 border-t-transparent rounded-full animate-spin"></div>
@@ -100,6 +146,7 @@ export default function ChatPage({ params }) {
                 isLoading={isGenerating} 
                 setIsLoading={setIsGenerating} 
                 threadId={id}
+                messages={messages}
                 setMessages={setMessages}
              />
              <p className="text-xs text-gray-500 mt-2">AI-generated, for reference only</p>
@@ -66,6 +66,7 @@ export default function Home() {
                 <PromptBox
                     isLoading={isLoading}
                     setIsLoading={setIsLoading}
+                    messages={messages}
                     setMessages={setMessages}
                     threadId={null}
                 />
@@ -108,6 +109,7 @@ export default function Home() {
               <PromptBox
                 isLoading={isLoading}
                 setIsLoading={setIsLoading}
+                messages={messages}
                 setMessages={setMessages}
                 threadId={null}
               />
@@ -6,7 +6,7 @@ import { useAppContext } from "@/context/AppContext";
 import toast from "react-hot-toast";
 import { useRouter } from "next/navigation";
 
-const PromptBox = ({ isLoading, setIsLoading, threadId, setMessages }) => {
+const PromptBox = ({ isLoading, setIsLoading, threadId, messages = [], setMessages }) => {
   const [prompt, setPrompt] = useState("");
   const [isUploading, setIsUploading] = useState(false);
   
@@ -20,7 +20,7 @@ const PromptBox = ({ isLoading, setIsLoading, threadId, setMessages }) => {
     agentic: false,
   });
 
-  const { user, createNewChat, FASTAPI_BASE } = useAppContext();
+  const { user, createNewChat, FASTAPI_BASE, setMessagesCursor } = useAppContext();
 
   const toggleFeature = (feature) => {
     setActiveFeatures((prev) => ({
@@ -60,7 +60,16 @@ const PromptBox = ({ isLoading, setIsLoading, threadId, setMessages }) => {
         
         // Only update if we have valid messages
         if (messagesArray.length >= 0) {
-          setMessages(messagesArray);
+          // This is the latest page: keep older pages already shown above it
+          const firstId = messagesArray[0]?.id;
+          const overlap = firstId === undefined ? -1 : messages.findIndex((m) => m.id === firstId);
+          if (overlap > 0) {
+            setMessages([...messages.slice(0, overlap), ...messagesArray]);
+          } else {
+            setMessages(messagesArray);
+            // Older history now starts before this page
+            if (data && !Array.isArray(data)) setMessagesCursor(data.before_cursor || null);
+          }
         }
       }
     } catch (error) {
@@ -80,7 +89,7 @@ const PromptBox = ({ isLoading, setIsLoading, threadId, setMessages }) => {
     if (fileInputRef.current) fileInputRef.current.value = "";
 
     setIsUploading(true);
-    const loadingToast = toast.loading("Uploading PDF to Knowledge Base...");
+    const loadingToast = toast.loading("Uploading document to Knowledge Base...");
 
     try {
       let activeThreadId = threadId;
@@ -108,6 +117,24 @@ const PromptBox = ({ isLoading, setIsLoading, threadId, setMessages }) => {
       }
 
       const result = await response.json();
+
+      // Indexing runs in the background - poll the job until it finishes
+      let job = null;
+      while (result.job_id) {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const jobResponse = await fetch(`${FASTAPI_BASE}/documents/jobs/${result.job_id}`);
+        if (!jobResponse.ok) throw new Error("Lost track of upload job");
+        job = await jobResponse.json();
+        if (job.status === "done" || job.status === "failed") break;
+        toast.loading(
+          `Indexing ${file.name}... ${job.vectors_upserted}/${job.chunks_total || "?"} chunks`,
+          { id: loadingToast }
+        );
+      }
+      if (job && job.status === "failed") {
+        throw new Error(job.files?.[0]?.message || "Indexing failed");
+      }
+
       toast.success(`✅ ${file.name} uploaded successfully!`, { id: loadingToast });
       
       // Refresh messages to show confirmation
@@ -148,7 +175,7 @@ const PromptBox = ({ isLoading, setIsLoading, threadId, setMessages }) => {
         isNewChat = true;
       }
 
-      const response = await fetch(`${FASTAPI_BASE}/chat/send`, {
+      let response = await fetch(`${FASTAPI_BASE}/chat/send`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
@@ -159,28 +186,74 @@ const PromptBox = ({ isLoading, setIsLoading, threadId, setMessages }) => {
       });
 
       if (!response.ok) throw new Error(`Server Error: ${response.statusText}`);
-      if (!response.body) throw new Error("No response body received");
+      const runId = response.headers.get("X-Run-ID");
 
-      const reader = response.body.getReader();
-      const decoder = new TextDecoder();
-      let done = false;
       let aiResponse = "";
-
-      while (!done) {
-        const { value, done: doneReading } = await reader.read();
-        done = doneReading;
-        if (value) {
-          const chunk = decoder.decode(value, { stream: true });
-          aiResponse += chunk;
-          setMessages((prev) => {
-            const newMessages = [...prev];
-            const lastMsgIndex = newMessages.length - 1;
-            if (lastMsgIndex >= 0) {
-              newMessages[lastMsgIndex] = { ...newMessages[lastMsgIndex], content: aiResponse };
+      let lastEventId = null;
+      let finished = false;
+
+      const showResponse = () => {
+        setMessages((prev) => {
+          const newMessages = [...prev];
+          const lastMsgIndex = newMessages.length - 1;
+          if (lastMsgIndex >= 0) {
+            newMessages[lastMsgIndex] = { ...newMessages[lastMsgIndex], content: aiResponse };
+          }
+          return newMessages;
+        });
+      };
+
+      // One SSE frame: "id:", "event:" and a JSON "data:" line (": ..." = keep-alive)
+      const handleFrame = (frame) => {
+        let id = null, event = "message", data = "";
+        for (const line of frame.split("\n")) {
+          if (line.startsWith("id: ")) id = line.slice(4);
+          else if (line.startsWith("event: ")) event = line.slice(7);
+          else if (line.startsWith("data: ")) data += line.slice(6);
+        }
+        if (id) lastEventId = id;
+        if (!data) return;
+        const payload = JSON.parse(data);
+        if (event === "token") {
+          aiResponse += payload.text;
+          showResponse();
+        } else if (event === "done") {
+          finished = true;
+        } else if (event === "error") {
+          finished = true;
+          throw new Error(payload.message || "Failed to get response");
+        }
+      };
+
+      // Read the stream; if the connection drops mid-answer, resume from the last event
+      for (let attempt = 0; ; attempt++) {
+        if (!response.body) throw new Error("No response body received");
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        try {
+          while (!finished) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+              const frame = buffer.slice(0, boundary);
+              buffer = buffer.slice(boundary + 2);
+              handleFrame(frame);
             }
-            return newMessages;
-          });
+          }
+        } catch (streamError) {
+          if (finished) throw streamError;
         }
+        if (finished) break;
+        if (!runId || attempt >= 3) throw new Error("Connection lost");
+
+        await new Promise((resolve) => setTimeout(resolve, 1000 * (attempt + 1)));
+        response = await fetch(`${FASTAPI_BASE}/chat/stream/${runId}`, {
+          headers: lastEventId ? { "Last-Event-ID": lastEventId } : {},
+        });
+        if (!response.ok) throw new Error("Connection lost");
       }
 
       if (isNewChat) router.push(`/chat/${activeThreadId}`);
@@ -226,7 +299,7 @@ const PromptBox = ({ isLoading, setIsLoading, threadId, setMessages }) => {
                ref={fileInputRef}
                onChange={handleFileUpload}
                className="hidden"
-               accept=".pdf,.txt,.docx" 
+               accept=".pdf,.docx,.txt,.md,.markdown,.html,.htm,.csv" 
              />
              <button
                type="button" 
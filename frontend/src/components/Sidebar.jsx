@@ -9,12 +9,15 @@ import { useRouter } from "next/navigation";
 
 const Sidebar = ({ expand, setExpand }) => {
   const { openSignIn } = useClerk();
-  const { user, chats, setSelectedChat } = useAppContext();
+  const { user, chats, setSelectedChat, loadMoreChats, hasMoreChats, isLoadingMoreChats } = useAppContext();
   const [openMenu, setOpenMenu] = useState({ id: 0, open: false });
   const router = useRouter();
 
-  const handleScroll = () => {
+  const handleScroll = (e) => {
     if (openMenu.open) setOpenMenu({ id: 0, open: false });
+    // Near the bottom of the list: fetch the next page of older chats
+    const { scrollTop, scrollHeight, clientHeight } = e.currentTarget;
+    if (hasMoreChats && scrollHeight - scrollTop - clientHeight < 80) loadMoreChats();
   };
 
   const handleNewChat = () => {
@@ -98,6 +101,15 @@ const Sidebar = ({ expand, setExpand }) => {
                     onSelect={() => { if(window.innerWidth < 768) setExpand(false); }}
                 />
               ))}
+            {hasMoreChats && (
+              <button
+                onClick={loadMoreChats}
+                disabled={isLoadingMoreChats}
+                className="w-full my-2 px-2 py-2 text-left text-xs hover:text-white/70 transition-colors"
+              >
+                {isLoadingMoreChats ? "Loading..." : "Show older chats"}
+              </button>
+            )}
           </div>
         </div>
 
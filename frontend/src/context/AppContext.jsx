@@ -21,6 +21,13 @@ export const AppContextProvider = ({ children }) => {
   const [loading, setLoading] = useState(false);
   const [messages, setMessages] = useState([]); 
   const [isMessagesLoading, setIsMessagesLoading] = useState(false);
+  // Keyset cursors: older threads for the sidebar, older messages of the open chat
+  const [chatsCursor, setChatsCursor] = useState(null);
+  const [messagesCursor, setMessagesCursor] = useState(null);
+  const [isLoadingMoreChats, setIsLoadingMoreChats] = useState(false);
+
+  const sortChats = (chatList) =>
+    [...chatList].sort((a, b) => new Date(b.updatedAt) - new Date(a.updatedAt));
 
   const fetchUsersChats = async () => {
     try {
@@ -36,9 +43,8 @@ export const AppContextProvider = ({ children }) => {
         return;
       }
 
-      const chatList = data.data || [];
-      chatList.sort((a, b) => new Date(b.updatedAt) - new Date(a.updatedAt));
-      setChats(chatList);
+      setChats(sortChats(data.data || []));
+      setChatsCursor(data.nextCursor || null);
     } catch (error) {
       toast.error("Failed to fetch chats");
     } finally {
@@ -46,6 +52,34 @@ export const AppContextProvider = ({ children }) => {
     }
   };
 
+  // Next page of older threads (sidebar scrolled to the bottom)
+  const loadMoreChats = async () => {
+    if (!user || !chatsCursor || isLoadingMoreChats) return;
+    try {
+      setIsLoadingMoreChats(true);
+      const token = await getToken();
+      const { data } = await axios.get(`/api/chat/get`, {
+        params: { cursor: chatsCursor },
+        headers: { Authorization: `Bearer ${token}` },
+      });
+
+      if (!data.success) {
+        toast.error(data.message);
+        return;
+      }
+
+      setChats((prev) => {
+        const known = new Set(prev.map((chat) => chat._id));
+        return sortChats([...prev, ...(data.data || []).filter((chat) => !known.has(chat._id))]);
+      });
+      setChatsCursor(data.nextCursor || null);
+    } catch (error) {
+      toast.error("Failed to fetch more chats");
+    } finally {
+      setIsLoadingMoreChats(false);
+    }
+  };
+
   // --- MODIFIED: Added 'redirect' parameter ---
   const createNewChat = async (redirect = true) => {
     try {
@@ -81,10 +115,12 @@ export const AppContextProvider = ({ children }) => {
     try {
       setIsMessagesLoading(true);
       console.log(FASTAPI_BASE)
+      // Latest page only; older history is loaded by loadOlderMessages
       const { data } = await axios.get(`${FASTAPI_BASE}/thread/${threadId}/messages`);
 
       if (data && data.messages) {
         setMessages(data.messages);
+        setMessagesCursor(data.before_cursor || null);
       }
     } catch (error) {
       console.error(error);
@@ -94,6 +130,22 @@ export const AppContextProvider = ({ children }) => {
     }
   };
 
+  // Page of messages before the oldest one loaded; returns them (chronological)
+  const loadOlderMessages = async (threadId) => {
+    if (!messagesCursor) return [];
+    try {
+      const { data } = await axios.get(`${FASTAPI_BASE}/thread/${threadId}/messages`, {
+        params: { before: messagesCursor },
+      });
+      setMessagesCursor(data.before_cursor || null);
+      return data.messages || [];
+    } catch (error) {
+      console.error(error);
+      toast.error("Failed to load earlier messages");
+      return [];
+    }
+  };
+
   useEffect(() => {
     console.log(FASTAPI_BASE)
     if (user) fetchUsersChats();
@@ -108,12 +160,18 @@ export const AppContextProvider = ({ children }) => {
         selectedChat,
         setSelectedChat,
         fetchUsersChats,
+        loadMoreChats,
+        hasMoreChats: Boolean(chatsCursor),
+        isLoadingMoreChats,
         createNewChat,
         loading,
         FASTAPI_BASE,
         messages, 
         setMessages,
         fetchMessages,
+        loadOlderMessages,
+        hasOlderMessages: Boolean(messagesCursor),
+        setMessagesCursor,
         isMessagesLoading
       }}
     >